@@ -0,0 +1,151 @@
+import logging
+import re
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from aiogram import Router, types
+
+from app.handlers.schedule_buttons import render_day
+from app.services import metrics
+from app.services.config import cfg
+from app.services.csv_cache import search_group
+from app.services.schedule_store import ScheduleStore, get_store
+from app.services.timetable import (
+    DAYS, DayTable, resolve_day, seconds_until_midnight, seconds_until_next_refresh, week_type,
+)
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+_INLINE_SECONDS = metrics.HANDLER_SECONDS.labels("inline_query")
+
+_WORD_RE = re.compile(r'[а-яё]+')
+
+MAX_CANDIDATES = 10
+
+
+class InlineArticles:
+    """Готовые наборы inline-результатов по группам.
+
+    Набор на группу: «сегодня», «завтра» и дни текущей недели. Ключ —
+    (группа, отпечаток расписания, дата), поэтому после обновления данных
+    или в полночь набор просто собирается заново.
+    """
+
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+        self._items: "OrderedDict[Tuple[str, str, date], List[types.InlineQueryResultArticle]]" = OrderedDict()
+
+    def get(self, store: ScheduleStore, group: str, today: date) -> Optional[List[types.InlineQueryResultArticle]]:
+        table = store.table(group)
+        if table is None:
+            return None
+        key = (group, store.fingerprint(group), today)
+        articles = self._items.get(key)
+        if articles is not None:
+            self._items.move_to_end(key)
+            metrics.INLINE_HIT.inc()
+            return articles
+        metrics.INLINE_MISS.inc()
+
+        articles = _build_articles(group, table, key[1], today)
+        self._items[key] = articles
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return articles
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+def _article(group: str, table: DayTable, fingerprint: str, title: str, day: date, art_id: str):
+    day_name = DAYS[day.weekday()]
+    text = render_day(group, table, day_name, target_date=day, fingerprint=fingerprint)
+    lessons = table.day(day_name, week_type(target_date=day))
+    if lessons:
+        description = f"{day_name}, {day:%d.%m}: пар {len(lessons)}, с {lessons[0].time}"
+    else:
+        description = f"{day_name}, {day:%d.%m}: занятий нет"
+    return types.InlineQueryResultArticle(
+        id=art_id,
+        title=title,
+        description=description,
+        input_message_content=types.InputTextMessageContent(
+            message_text=text, parse_mode="HTML", disable_web_page_preview=True,
+        ),
+    )
+
+
+def _build_articles(group: str, table: DayTable, fingerprint: str, today: date) -> List[types.InlineQueryResultArticle]:
+    monday = today - timedelta(days=today.weekday())
+    articles = [
+        _article(group, table, fingerprint, f"{group}: сегодня", today, f"{group}:{fingerprint}:d0"),
+        _article(group, table, fingerprint, f"{group}: завтра", today + timedelta(days=1), f"{group}:{fingerprint}:d1"),
+    ]
+    for i, name in enumerate(DAYS[:6]):
+        day = monday + timedelta(days=i)
+        if day < today:
+            day += timedelta(days=7)
+        articles.append(_article(group, table, fingerprint, f"{group}: {name.lower()}", day, f"{group}:{fingerprint}:w{i}"))
+    return articles
+
+
+ARTICLES = InlineArticles()
+
+
+def _pick(articles: List[types.InlineQueryResultArticle], words: List[str], today: date) -> List[types.InlineQueryResultArticle]:
+    """Статьи под слово дня из запроса; без слова — весь набор."""
+    for word in words:
+        day = resolve_day(word, today)
+        if day is None:
+            continue
+        if day == today:
+            return [articles[0]]
+        if day == today + timedelta(days=1):
+            return [articles[1]]
+        # Дни недели в наборе — ближайшие начиная с сегодня, как и у resolve_day
+        return [articles[2 + day.weekday()]] if day.weekday() < 6 else []
+    return articles
+
+
+def _today() -> date:
+    # «Сегодня» по часовому поясу расписания, а не сервера
+    return datetime.now(ZoneInfo(cfg.tz)).date()
+
+
+def _cache_time() -> int:
+    # Ответ верен до ближайшего обновления CSV, а «сегодня» — до полуночи
+    return max(1, int(min(seconds_until_next_refresh(), seconds_until_midnight())))
+
+
+@router.inline_query()
+async def inline_schedule(query: types.InlineQuery) -> None:
+    with _INLINE_SECONDS.time():
+        await _inline_schedule(query)
+
+
+async def _inline_schedule(query: types.InlineQuery) -> None:
+    text = (query.query or "").strip().lower()
+    words = _WORD_RE.findall(text)
+    match = search_group(text) if any(ch.isdigit() for ch in text) else None
+    if match is None or not (match.exact or match.candidates):
+        await query.answer([], cache_time=60, is_personal=False)
+        return
+
+    store = get_store()
+    today = _today()
+    results: List[types.InlineQueryResultArticle] = []
+    if match.exact:
+        articles = ARTICLES.get(store, match.exact, today)
+        if articles:
+            results = _pick(articles, words, today)
+    else:
+        # Неполный номер: первая статья («сегодня» или названный день) каждой подходящей группы
+        for group in match.candidates[:MAX_CANDIDATES]:
+            articles = ARTICLES.get(store, group, today)
+            if articles:
+                results.extend(_pick(articles, words, today)[:1])
+
+    await query.answer(results, cache_time=_cache_time(), is_personal=False)
@@ -0,0 +1,226 @@
+import html
+import logging
+import re
+from datetime import datetime
+from typing import Dict, List, Tuple
+from zoneinfo import ZoneInfo
+
+from aiogram import Router, types
+from aiogram.filters import Command
+from aiogram.utils.keyboard import ReplyKeyboardBuilder
+
+from app.services import metrics
+from app.services.config import cfg
+from app.services.lessons import Lesson, split_teachers
+from app.services.lookup import get_lookup
+from app.services.sender import answer
+from app.services.timetable import (
+    DAYS, PAIR_MINUTES, SLOT_STARTS, resolve_day, slot_at, time_to_minutes, week_type,
+)
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+_TEACHER_SECONDS = metrics.HANDLER_SECONDS.labels("cmd_teacher")
+_ROOM_SECONDS = metrics.HANDLER_SECONDS.labels("cmd_room")
+_FREEROOMS_SECONDS = metrics.HANDLER_SECONDS.labels("cmd_freerooms")
+
+HHMM_RE = re.compile(r'^([01]?\d|2[0-3]):([0-5]\d)$')
+
+# Сколько номеров аудиторий выводить в одном ответе /freerooms
+MAX_FREE_SHOWN = 300
+
+
+def _choices_keyboard(commands: List[str]):
+    builder = ReplyKeyboardBuilder()
+    for command in commands:
+        builder.add(types.KeyboardButton(text=command))
+    builder.adjust(1)
+    return builder.as_markup(resize_keyboard=True, one_time_keyboard=True)
+
+
+def _merge(lessons: Tuple[Lesson, ...]) -> List[Tuple[Lesson, List[str]]]:
+    """Занятие потока стоит в листе у каждой группы — показываем его один раз со списком групп."""
+    merged: Dict[tuple, Tuple[Lesson, List[str]]] = {}
+    for lesson in lessons:
+        key = lesson[1:]
+        if key in merged:
+            merged[key][1].append(lesson.group)
+        else:
+            merged[key] = (lesson, [lesson.group])
+    return list(merged.values())
+
+
+def format_lookup_day(title: str, lessons: Tuple[Lesson, ...], now_minutes: int, by_room: bool) -> str:
+    """Занятия преподавателя (by_room=False) или аудитории за день; текущее и следующее отмечены."""
+    if not lessons:
+        return f"{title}\n\nСегодня занятий нет"
+
+    sep = "—" * 20
+    out = [title, sep]
+    next_marked = False
+    for lesson, groups in _merge(lessons):
+        start = time_to_minutes(lesson.time)
+        mark = ""
+        if start <= now_minutes < start + PAIR_MINUTES:
+            mark = " — ▶️ <b>идёт сейчас</b>"
+        elif start > now_minutes and not next_marked:
+            mark = " — ⏭ следующее"
+            next_marked = True
+
+        line_subject = html.escape(lesson.subject) + (f" ({html.escape(lesson.type)})" if lesson.type else "")
+        if by_room:
+            line_place = html.escape(", ".join(split_teachers(lesson.teacher)))
+        else:
+            rooms = ", ".join(r for r in (lesson.room1, lesson.room2) if r)
+            line_place = ", ".join(
+                ([html.escape(lesson.building)] if lesson.building else [])
+                + ([f"<i>ауд. {html.escape(rooms)}</i>"] if rooms else [])
+            )
+        line_groups = "Группы: " + ", ".join(sorted(groups))
+        out.append("\n".join(x for x in (f"⏰ {lesson.time}{mark}", line_subject, line_place, line_groups) if x))
+        out.append(sep)
+    return "\n".join(out)
+
+
+def _now() -> datetime:
+    return datetime.now(ZoneInfo(cfg.tz))
+
+
+def _today() -> Tuple[str, str, int]:
+    now = _now()
+    return DAYS[now.weekday()], week_type(target_date=now.date()), now.hour * 60 + now.minute
+
+
+@router.message(Command("teacher"))
+async def cmd_teacher(message: types.Message) -> None:
+    with _TEACHER_SECONDS.time():
+        await _cmd_teacher(message)
+
+
+async def _cmd_teacher(message: types.Message) -> None:
+    args = (message.text or "").split(maxsplit=1)[1:]
+    if not args:
+        await answer(message, "Использование: /teacher Фамилия\nПример: /teacher Иванов")
+        return
+    logger.info("Пользователь %s ищет преподавателя: %s", message.from_user.id, args[0])
+
+    index = get_lookup()
+    keys = index.find_teachers(args[0])
+    if not keys:
+        await answer(message, f"Преподаватель «{html.escape(args[0])}» не найден.", parse_mode="HTML")
+        return
+    if len(keys) > 1:
+        await answer(
+            message,
+            "🔎 Нашлось несколько преподавателей, выберите:",
+            reply_markup=_choices_keyboard([f"/teacher {index.teacher_name(k)}" for k in keys]),
+        )
+        return
+
+    day_name, wt, now_minutes = _today()
+    name = index.teacher_name(keys[0])
+    title = f"👤 <b>{html.escape(name)}</b> — {day_name} [{wt}]"
+    lessons = index.teacher_table(keys[0]).day(day_name, wt)
+    await answer(message, format_lookup_day(title, lessons, now_minutes, by_room=False), parse_mode="HTML")
+
+
+@router.message(Command("room"))
+async def cmd_room(message: types.Message) -> None:
+    with _ROOM_SECONDS.time():
+        await _cmd_room(message)
+
+
+async def _cmd_room(message: types.Message) -> None:
+    args = (message.text or "").split(maxsplit=2)[1:]
+    if not args:
+        await answer(message, "Использование: /room Аудитория [Здание]\nПример: /room 1108")
+        return
+    logger.info("Пользователь %s ищет аудиторию: %s", message.from_user.id, " ".join(args))
+
+    index = get_lookup()
+    rooms = index.find_rooms(args[0], args[1] if len(args) > 1 else "")
+    if not rooms:
+        await answer(message, f"Аудитория «{html.escape(' '.join(args))}» не найдена.", parse_mode="HTML")
+        return
+    if len(rooms) > 1:
+        await answer(
+            message,
+            "🔎 Аудитория с таким номером есть в нескольких зданиях, выберите:",
+            reply_markup=_choices_keyboard([f"/room {number} {building}" for building, number in rooms]),
+        )
+        return
+
+    day_name, wt, now_minutes = _today()
+    building, number = rooms[0]
+    title = f"🚪 <b>{html.escape(building)}, ауд. {html.escape(number)}</b> — {day_name} [{wt}]"
+    lessons = index.room_table(rooms[0]).day(day_name, wt)
+    await answer(message, format_lookup_day(title, lessons, now_minutes, by_room=True), parse_mode="HTML")
+
+
+@router.message(Command("freerooms"))
+async def cmd_freerooms(message: types.Message) -> None:
+    with _FREEROOMS_SECONDS.time():
+        await _cmd_freerooms(message)
+
+
+async def _cmd_freerooms(message: types.Message) -> None:
+    index = get_lookup()
+    words = (message.text or "").split()[1:]
+    now = _now()
+    day = now.date()
+    minutes = None
+    tail: List[str] = []
+
+    # Разбор с конца: [время] [день], всё остальное — здание
+    if words and HHMM_RE.match(words[-1]):
+        tail.insert(0, words.pop())
+        minutes = time_to_minutes(tail[0])
+    if words and resolve_day(words[-1], day) is not None:
+        tail.insert(0, words.pop())
+        day = resolve_day(tail[0], day)
+    if not words:
+        buildings = index.find_buildings("")
+        await answer(
+            message,
+            "Использование: /freerooms Здание [день] [ЧЧ:ММ]\nПример: /freerooms УНИКС завтра 10:10"
+            + ("\n\nЗдания: " + ", ".join(buildings) if buildings else ""),
+        )
+        return
+    logger.info("Пользователь %s ищет свободные аудитории: %s", message.from_user.id, " ".join(words))
+
+    buildings = index.find_buildings(" ".join(words))
+    if not buildings:
+        await answer(message, f"Здание «{html.escape(' '.join(words))}» не найдено.", parse_mode="HTML")
+        return
+    if len(buildings) > 1:
+        await answer(
+            message,
+            "🔎 Подходит несколько зданий, выберите:",
+            reply_markup=_choices_keyboard([" ".join(["/freerooms", b, *tail]) for b in buildings]),
+        )
+        return
+
+    if minutes is None:
+        # Без времени: сегодня — текущая или ближайшая пара, в другой день — первая
+        minutes = now.hour * 60 + now.minute if day == now.date() else 0
+    slot = slot_at(minutes)
+    if day.weekday() == 6 or slot is None:
+        await answer(message, "В это время пар нет — свободны все аудитории.")
+        return
+
+    building = buildings[0]
+    wt = week_type(target_date=day)
+    free = index.free_rooms(building, day.weekday(), slot, wt)
+    start = time_to_minutes(SLOT_STARTS[slot])
+    end = start + PAIR_MINUTES
+    header = (
+        f"🟢 <b>Свободные аудитории — {html.escape(building)}</b>\n"
+        f"{DAYS[day.weekday()]}, {day:%d.%m} [{wt}], пара {SLOT_STARTS[slot]}–{end // 60:02d}:{end % 60:02d}"
+    )
+    if not free:
+        await answer(message, f"{header}\n\nВсе известные аудитории заняты.", parse_mode="HTML")
+        return
+    shown = ", ".join(html.escape(n) for n in free[:MAX_FREE_SHOWN])
+    more = f" и ещё {len(free) - MAX_FREE_SHOWN}" if len(free) > MAX_FREE_SHOWN else ""
+    await answer(message, f"{header}\n\n{shown}{more}\n\nВсего: {len(free)}", parse_mode="HTML")
@@ -2,29 +2,47 @@ import html
 import logging
 from aiogram import Router, types
 from aiogram.filters import Command
+from aiogram.utils.keyboard import ReplyKeyboardBuilder
 
+from app.services import metrics
 from app.services.config import cfg
-from app.handlers.schedule_buttons import get_schedule_keyboard, USER_SCHEDULE_CACHE
-from app.services.csv_cache import find_group_schedule_local
-from app.services.parser import parse_schedule
+from app.handlers.schedule_buttons import get_schedule_keyboard, remember_user_group
+from app.services.csv_cache import search_group
+from app.services.schedule_store import get_store
+from app.services.sender import answer
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+_CMD_SCHEDULE_SECONDS = metrics.HANDLER_SECONDS.labels("cmd_schedule")
+
 
 def _norm_group(s: str) -> str:
     return "".join(ch for ch in (s or "") if ch.isdigit())
 
 
+def get_candidates_keyboard(groups: list[str]):
+    builder = ReplyKeyboardBuilder()
+    for group in groups:
+        builder.add(types.KeyboardButton(text=group))
+    builder.adjust(3)
+    return builder.as_markup(resize_keyboard=True, one_time_keyboard=True)
+
+
 @router.message(Command("schedule"))
 @router.message(lambda message: message.text and not message.text.startswith("/"))
 async def cmd_schedule(message: types.Message) -> None:
+    with _CMD_SCHEDULE_SECONDS.time():
+        await _cmd_schedule(message)
+
+
+async def _cmd_schedule(message: types.Message) -> None:
     logger.info("Пользователь %s запросил расписание: %s", message.from_user.id, message.text)
 
     if message.text.startswith("/"):
         args = (message.text or "").split(maxsplit=1)[1:]
         if not args:
-            await message.answer("Использование: /schedule <Группа>\nПример: /schedule 09-825")
+            await answer(message, "Использование: /schedule <Группа>\nПример: /schedule 09-825")
             return
         group_input = args[0]
     else:
@@ -32,53 +50,55 @@ async def cmd_schedule(message: types.Message) -> None:
 
     group = _norm_group(group_input)
     if not group:
-        await message.answer(
+        await answer(
+            message,
             "Не распознал номер группы. Пример: 8251160\n"
             "Попробуйте еще раз:"
         )
         return
 
-    if len(group) != 7:
-        await message.answer(
+    match = search_group(group_input)
+    if match.exact:
+        group = match.exact
+    elif match.candidates:
+        await answer(
+            message,
+            "🔎 Точного совпадения нет. Возможно, вы имели в виду:",
+            reply_markup=get_candidates_keyboard(match.candidates),
+        )
+        return
+    elif len(group) != 7:
+        await answer(
+            message,
             "❗Номер группы должен содержать ровно 7 цифр.\n"
             "Попробуйте снова:"
         )
         return
 
-    status_msg = await message.answer(f"🔍 Ищу группу {group}...")
-
-    csv_text = find_group_schedule_local(group)
-    if not csv_text:
-        await status_msg.edit_text(
+    # Поиск в ScheduleStore мгновенный — промежуточное «Ищу группу...» не нужно
+    lessons = get_store().get(group)
+    if lessons is None:
+        await answer(
+            message,
             f"❌ Группа <b>{html.escape(group)}</b> не найдена.\n"
             "Проверьте правильность написания номера группы.",
             parse_mode="HTML",
         )
         return
 
-    try:
-        lessons = parse_schedule(csv_text, group)
-    except Exception as e:
-        logger.exception("Ошибка парсинга для группы %s", group)
-        await status_msg.edit_text(
-            f"▲ Ошибка обработки: <code>{html.escape(str(e))}</code>",
-            parse_mode="HTML",
-        )
-        return
-
-    await USER_SCHEDULE_CACHE.set(f"schedule:{message.from_user.id}", (group, lessons))
+    await remember_user_group(message.from_user.id, group)
 
     if not lessons:
-        await status_msg.edit_text(
+        await answer(
+            message,
             f"ℹ️ Группа <b>{html.escape(group)}</b> найдена, но расписание пустое.\n"
             "Возможно, на этой неделе нет занятий.",
             parse_mode="HTML",
         )
         return
 
-    await status_msg.delete()
-
-    await message.answer(
+    await answer(
+            message,
         f"✅ Группа <b>{html.escape(group)}</b> найдена!\n"
         "Выберите период для просмотра:",
         parse_mode="HTML",
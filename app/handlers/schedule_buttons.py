@@ -1,11 +1,21 @@
+import html
 import logging
 from datetime import datetime, timedelta, date
 from typing import Dict, List, Tuple
-import re
 from aiogram import Router, types
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
 from aiocache import Cache
 
+from app.services import metrics
+from app.services.changes import GroupChange
+from app.services.config import cfg
+from app.services.lessons import Lesson, split_teachers
+from app.services.timetable import DAYS, DayTable, time_to_minutes, week_type
+from app.services.render_cache import RENDER_CACHE
+from app.services.schedule_store import ScheduleStore, get_store
+from app.services.sender import BULK, SENDER, answer
+from app.services.state_backend import get_backend
+
 router = Router()
 logger = logging.getLogger(__name__)
 
@@ -14,9 +24,41 @@ logger = logging.getLogger(__name__)
 # 3 дня   = 259_200 сек
 # 7 дней  = 604_800 сек
 
+# schedule:<user_id> -> код группы; сами занятия берутся из ScheduleStore
 USER_SCHEDULE_CACHE = Cache(Cache.MEMORY, ttl=259_200)
 
 
+async def remember_user_group(user_id: int, group: str) -> None:
+    backend = get_backend()
+    if not backend.shared:
+        await USER_SCHEDULE_CACHE.set(f"schedule:{user_id}", group)
+    await backend.set_user_group(user_id, group)
+    # Подписка на рассылку следует за выбранной группой
+    await backend.subscriptions.set_group(user_id, group)
+
+
+async def get_user_group(user_id: int) -> str | None:
+    """Группа пользователя: из памяти, иначе из StateBackend (SQLite или Redis).
+
+    С общим StateBackend (Redis) локальный кэш не используется: группу могли
+    сменить через другую реплику, и устаревшая копия жила бы до истечения TTL.
+    """
+    backend = get_backend()
+    if not backend.shared:
+        cached = await USER_SCHEDULE_CACHE.get(f"schedule:{user_id}")
+        if cached is not None:
+            metrics.USER_CACHE_HIT.inc()
+            return cached
+
+    group = await backend.get_user_group(user_id)
+    if group:
+        metrics.USER_CACHE_DB.inc()
+        if not backend.shared:
+            await USER_SCHEDULE_CACHE.set(f"schedule:{user_id}", group)
+    else:
+        metrics.USER_CACHE_MISS.inc()
+    return group
+
 
 def get_schedule_keyboard():
     builder = ReplyKeyboardBuilder()
@@ -38,55 +80,24 @@ def get_week_menu_keyboard():
     return builder.as_markup(resize_keyboard=True)
 
 def get_day_name(day_offset: int = 0) -> str:
-    days = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
     today = datetime.now() + timedelta(days=day_offset)
-    return days[today.weekday()]
-
-def filter_lessons_by_day(lessons: List[dict], day_name: str):
-    target_day = day_name.strip().lower()
-    return [
-        lesson for lesson in lessons 
-        if lesson.get("day", "").strip().lower() == target_day
-    ]
-
-def _time_to_minutes(time_str: str | float | None) -> int:
-    if not time_str or not isinstance(time_str, str):
-        time_str = str(time_str or "").strip()
-    if not time_str or time_str.lower() in ("nan", "none", ""):
-        return 0
-    try:
-        hours, minutes = map(int, time_str.split(":"))
-        return hours * 60 + minutes
-    except (ValueError, AttributeError):
-        return 0
-
-
-def get_current_week_type(start_date: date = date(2025, 9, 1),target_date: date | None = None,):
-    d = target_date or date.today()
-    weeks_passed = (d - start_date).days // 7
-    return "в" if weeks_passed % 2 == 0 else "н"
-
-
-def _norm_week(x: str) -> str:
-    x = (x or "").strip().lower()
-    return "в" if x.startswith("в") else ("н" if x.startswith("н") else x)
+    return DAYS[today.weekday()]
 
+def get_current_week_type(start_date: date | None = None, target_date: date | None = None):
+    """Чётность недели; начало семестра по умолчанию — SEMESTER_START."""
+    return week_type(target_date=target_date, start_date=start_date)
 
-def filter_by_week(lessons: list[dict], target_date: date | None = None) -> list[dict]:
-    wt = get_current_week_type(target_date=target_date)
-    return [l for l in lessons if not l.get("week_type") or _norm_week(l.get("week_type")) == wt]
 
-
-def format_day_schedule(lessons: List[dict], day_name: str, show_week_per_lesson: bool = False):
+def format_day_schedule(lessons: List[Lesson], day_name: str, show_week_per_lesson: bool = False):
     if not lessons:
         return f"<b>{day_name}</b>\n\nЗанятий нет\n"
 
-    lessons.sort(key=lambda l: _time_to_minutes(l.get("time", "")))
+    lessons = sorted(lessons, key=lambda l: time_to_minutes(l.time))
 
     if show_week_per_lesson:
         header = f"<b>{day_name}</b>"
     else:
-        week = (lessons[0].get("week_type") or "").strip()
+        week = lessons[0].week_type.strip()
         header = f"<b>{day_name} [{week}]</b>" if week else f"<b>{day_name}</b>"
 
     sep = "—" * 20
@@ -98,14 +109,14 @@ def format_day_schedule(lessons: List[dict], day_name: str, show_week_per_lesson
         return "" if s.lower() in ("nan", "none", "", "null") else s
 
     for les in lessons:
-        time = _safe_str(les.get("time", ""))
-        week = _safe_str(les.get("week_type", ""))
-        subj = _safe_str(les.get("subject", ""))
-        ltype = _safe_str(les.get("type", ""))
-        building = _safe_str(les.get("building", ""))
-        room1 = _safe_str(les.get("room1", ""))
-        room2 = _safe_str(les.get("room2", ""))
-        traw = _safe_str(les.get("teacher", ""))
+        time = _safe_str(les.time)
+        week = _safe_str(les.week_type)
+        subj = _safe_str(les.subject)
+        ltype = _safe_str(les.type)
+        building = _safe_str(les.building)
+        room1 = _safe_str(les.room1)
+        room2 = _safe_str(les.room2)
+        traw = _safe_str(les.teacher)
 
         line_time = f"⏰ {time}" + (f" [{week}]" if show_week_per_lesson and week else "")
         line_subject = f"{subj}" if subj else ""
@@ -115,9 +126,7 @@ def format_day_schedule(lessons: List[dict], day_name: str, show_week_per_lesson
         loc_parts = ([building] if building else []) + ([f"<i>ауд. {rooms}</i>"] if rooms else [])
         loc = ", ".join(loc_parts)
 
-        clean_t = re.sub(r'[\u00A0\u2000-\u200B]', ' ', traw)
-        teachers = [s.strip() for s in re.split(r'[;,]|\s{2,}|\t+', clean_t) if s.strip()]
-        teach = ", ".join(teachers)
+        teach = ", ".join(split_teachers(traw))
 
         line_place = " — ".join([loc, teach]) if (loc and teach) else (loc or teach)
 
@@ -128,92 +137,190 @@ def format_day_schedule(lessons: List[dict], day_name: str, show_week_per_lesson
     return "\n".join(out)
 
 
-@router.message(lambda m: m.text in [
-    "📅 Сегодня", "📅 Завтра", "📋 Вся неделя", "🔍 Другая группа",
-    "🔎 Текущая неделя", "➡️ Следующая неделя", "📚 Вся без фильтров", "⬅️ Назад"
-])
+def render_day(
+        group: str,
+        table: DayTable,
+        day_name: str,
+        target_date: date | None = None,
+        show_week_per_lesson: bool = False,
+        fingerprint: str | None = None,
+) -> str:
+    """Текст расписания на день с кэшированием по отпечатку расписания группы.
+
+    target_date=None — без фильтра по чётности недели.
+    fingerprint=None — данные не из ScheduleStore, результат не кэшируется.
+    """
+    wt = get_current_week_type(target_date=target_date) if target_date else None
+    key = (group, fingerprint, day_name, wt, show_week_per_lesson)
+    if fingerprint is not None:
+        text = RENDER_CACHE.get(key)
+        if text is not None:
+            metrics.RENDER_HIT.inc()
+            return text
+        metrics.RENDER_MISS.inc()
+
+    day_lessons = table.day(day_name, wt)
+    with metrics.FORMAT_SECONDS.time():
+        text = format_day_schedule(day_lessons, day_name, show_week_per_lesson=show_week_per_lesson)
+
+    if fingerprint is not None:
+        RENDER_CACHE.put(key, text)
+    return text
+
+
+def on_schedule_changes(version: int, changes: List[GroupChange]) -> None:
+    """Выбрасывает из кэша отрисовки только изменившиеся группы."""
+    if changes:
+        dropped = RENDER_CACHE.invalidate_groups(c.group for c in changes)
+        logger.info("Кэш отрисовки: удалено %d записей изменившихся групп", dropped)
+
+
+async def notify_changed_groups(changes: List[GroupChange]) -> None:
+    """Сообщает пользователям, выбравшим изменившуюся группу."""
+    by_group = {c.group: c for c in changes}
+    users = await get_backend().users_in_groups(by_group)
+    notified = 0
+    for group, user_ids in users.items():
+        change = by_group[group]
+        text = (
+            f"ℹ️ Расписание группы <b>{html.escape(group)}</b> изменилось "
+            f"(добавлено: {len(change.added)}, удалено: {len(change.removed)}, "
+            f"изменено: {len(change.changed)}).\nНажмите «📅 Сегодня» или «📋 Вся неделя»."
+        )
+        for user_id in user_ids:
+            SENDER.submit(user_id, text, priority=BULK, parse_mode="HTML")
+            notified += 1
+    if notified:
+        logger.info("Уведомления об изменениях поставлены в очередь: %d", notified)
+
+
+def on_store_published(store: ScheduleStore) -> None:
+    """Прогревает сегодня/завтра для популярных групп (уже готовые записи не трогаются)."""
+    if cfg.prewarm_groups <= 0:
+        return
+
+    warmed = 0
+    for group in RENDER_CACHE.top_groups(cfg.prewarm_groups):
+        table = store.table(group)
+        if table is None:
+            continue
+        for offset in (0, 1):
+            render_day(
+                group, table, get_day_name(offset),
+                target_date=date.today() + timedelta(days=offset),
+                fingerprint=store.fingerprint(group),
+            )
+        warmed += 1
+    if warmed:
+        logger.info("Прогрет кэш отрисовки для %d групп", warmed)
+
+
+WEEK_DAYS = DAYS[:6]
+
+BUTTON_ROUTES = {
+    "📅 Сегодня": "today",
+    "📅 Завтра": "tomorrow",
+    "📋 Вся неделя": "week_menu",
+    "🔍 Другая группа": "other_group",
+    "🔎 Текущая неделя": "week_current",
+    "➡️ Следующая неделя": "week_next",
+    "📚 Вся без фильтров": "week_all",
+    "⬅️ Назад": "back",
+}
+_BUTTON_TIMERS = {text: metrics.HANDLER_SECONDS.labels(route) for text, route in BUTTON_ROUTES.items()}
+
+
+@router.message(lambda m: m.text in BUTTON_ROUTES)
 async def handle_schedule_buttons(message: types.Message) -> None:
+    with _BUTTON_TIMERS[message.text].time():
+        await _handle_schedule_buttons(message)
+
+
+async def _handle_schedule_buttons(message: types.Message) -> None:
     user_id = message.from_user.id
 
     if message.text == "🔍 Другая группа":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer(
-            "Введите номер группы:\nПример: 09-825, 8251160, 8251",
+        await answer(
+            message, "Введите номер группы:\nПример: 09-825, 8251160, 8251",
             reply_markup=types.ReplyKeyboardRemove(),
         )
         return
 
     if message.text == "⬅️ Назад":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer("Выберите действие:", reply_markup=get_schedule_keyboard())
+        await answer(message, "Выберите действие:", reply_markup=get_schedule_keyboard())
         return
 
-    cached = await USER_SCHEDULE_CACHE.get(f"schedule:{user_id}")
-    if cached is None:
-        await message.answer("Расписание не найдено или устарело. Введите группу снова:")
+    group = await get_user_group(user_id)
+    store = get_store()
+    table = store.table(group) if group else None
+    if table is None:
+        await answer(message, "Расписание не найдено или устарело. Введите группу снова:")
         return
 
-    group, lessons = cached
-    
+    fingerprint = store.fingerprint(group)
+    RENDER_CACHE.note_group(group)
+
     if message.text == "📅 Сегодня":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
         day_name = get_day_name(0)
-        day_lessons = filter_lessons_by_day(lessons, day_name)
-        day_lessons = filter_by_week(day_lessons, target_date=date.today())
-        await message.answer(
-            format_day_schedule(day_lessons, day_name),
+        await answer(
+            message, render_day(group, table, day_name, target_date=date.today(), fingerprint=fingerprint),
             parse_mode="HTML", disable_web_page_preview=True
         )
 
     elif message.text == "📅 Завтра":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
         day_name = get_day_name(1)
-        day_lessons = filter_lessons_by_day(lessons, day_name)
-        day_lessons = filter_by_week(day_lessons, target_date=date.today() + timedelta(days=1))
-        await message.answer(
-            format_day_schedule(day_lessons, day_name),
+        await answer(
+            message, render_day(
+                group, table, day_name,
+                target_date=date.today() + timedelta(days=1), fingerprint=fingerprint,
+            ),
             parse_mode="HTML", disable_web_page_preview=True
         )
 
     elif message.text == "📋 Вся неделя":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer("Выберите фильтр:", reply_markup=get_week_menu_keyboard())
+        await answer(message, "Выберите фильтр:", reply_markup=get_week_menu_keyboard())
 
     elif message.text == "🔎 Текущая неделя":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer(
-            f"📆 <b>Расписание на текущую неделю</b>\nГруппа: <b>{group}</b>",
-            parse_mode="HTML", reply_markup=get_week_menu_keyboard()
+        await answer(
+            message, f"📆 <b>Расписание на текущую неделю</b>\nГруппа: <b>{group}</b>",
+            parse_mode="HTML", reply_markup=get_week_menu_keyboard(), wait=False,
         )
-        days_order = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
-        for day in days_order:
-            day_lessons = filter_lessons_by_day(lessons, day)
-            day_lessons = filter_by_week(day_lessons, target_date=date.today())
-            day_text = format_day_schedule(day_lessons, day)
-            await message.answer(day_text, parse_mode="HTML", disable_web_page_preview=True)
+        for day in WEEK_DAYS:
+            day_text = render_day(group, table, day, target_date=date.today(), fingerprint=fingerprint)
+            await answer(
+                message, day_text, coalesce=True, wait=False,
+                parse_mode="HTML", disable_web_page_preview=True,
+            )
 
     elif message.text == "➡️ Следующая неделя":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer(
-            f"📆 <b>Расписание на следующую неделю</b>\nГруппа: <b>{group}</b>",
-            parse_mode="HTML", reply_markup=get_week_menu_keyboard()
+        await answer(
+            message, f"📆 <b>Расписание на следующую неделю</b>\nГруппа: <b>{group}</b>",
+            parse_mode="HTML", reply_markup=get_week_menu_keyboard(), wait=False,
         )
-        days_order = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
         target = date.today() + timedelta(days=7)
-        for day in days_order:
-            day_lessons = filter_lessons_by_day(lessons, day)
-            day_lessons = filter_by_week(day_lessons, target_date=target)
-            day_text = day_text = format_day_schedule(day_lessons, day)
-            await message.answer(day_text, parse_mode="HTML", disable_web_page_preview=True)
+        for day in WEEK_DAYS:
+            day_text = render_day(group, table, day, target_date=target, fingerprint=fingerprint)
+            await answer(
+                message, day_text, coalesce=True, wait=False,
+                parse_mode="HTML", disable_web_page_preview=True,
+            )
 
     elif message.text == "📚 Вся без фильтров":
         logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-        await message.answer(
-            f"📆 <b>Расписание на неделю (без фильтра)</b>\nГруппа: <b>{group}</b>",
-            parse_mode="HTML", reply_markup=get_week_menu_keyboard()
+        await answer(
+            message, f"📆 <b>Расписание на неделю (без фильтра)</b>\nГруппа: <b>{group}</b>",
+            parse_mode="HTML", reply_markup=get_week_menu_keyboard(), wait=False,
         )
-        days_order = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
-        for day in days_order:
-            day_lessons = filter_lessons_by_day(lessons, day)
-            day_text = format_day_schedule(day_lessons, day, show_week_per_lesson=True)
-            await message.answer(day_text, parse_mode="HTML", disable_web_page_preview=True)
+        for day in WEEK_DAYS:
+            day_text = render_day(group, table, day, show_week_per_lesson=True, fingerprint=fingerprint)
+            await answer(
+                message, day_text, coalesce=True, wait=False,
+                parse_mode="HTML", disable_web_page_preview=True,
+            )
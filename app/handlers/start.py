@@ -3,6 +3,8 @@ from aiogram import Router, types
 from aiogram.filters import Command
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
 
+from app.services.sender import answer
+
 router = Router()
 logger = logging.getLogger(__name__)
 
@@ -16,7 +18,8 @@ async def cmd_start(message: types.Message):
     )
 
     logger.info("Пользователь %s: %s", message.from_user.id, message.text)
-    await message.answer(
+    await answer(
+        message,
         "👋 Добро пожаловать в бот расписания КФУ!\n"
         "Сейчас бот в режиме разработки, поэтому возможны перебои в работе.\n"
         "Нажмите кнопку ниже, чтобы посмотреть расписание.",
@@ -27,7 +30,8 @@ async def cmd_start(message: types.Message):
 @router.message(lambda message: message.text == "📅 Расписание")
 async def handle_schedule_button(message: types.Message):
     logger.info("Пользователь %s запросил расписание", message.from_user.id)
-    await message.answer(
+    await answer(
+        message,
         "Введите номер группы:\nПример: 8251160",
         reply_markup=types.ReplyKeyboardRemove(),
     )
@@ -0,0 +1,202 @@
+import asyncio
+import html
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from aiogram import Router, types
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.filters import Command
+
+from app.handlers.schedule_buttons import get_user_group, render_day
+from app.services.config import cfg
+from app.services.schedule_store import get_store
+from app.services.sender import BULK, SENDER, answer
+from app.services.state_backend import get_backend
+from app.services.subscriptions import QUEUED, RETRY, SENT
+from app.services.timetable import DAYS
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+HHMM_RE = re.compile(r'^([01]?\d|2[0-3]):([0-5]\d)$')
+
+# Сколько сообщений рассылки держать в очереди SENDER одновременно
+FANOUT_WINDOW = 200
+# Насколько назад новый лидер догоняет рассылки, пропущенные при смене лидера
+CATCHUP_MINUTES = 30
+
+
+@router.message(Command("subscribe"))
+async def cmd_subscribe(message: types.Message) -> None:
+    args = (message.text or "").split(maxsplit=1)[1:]
+    send_at = args[0].strip() if args else cfg.subscribe_default_at
+    m = HHMM_RE.match(send_at)
+    if not m:
+        await answer(message, "Использование: /subscribe ЧЧ:ММ\nПример: /subscribe 07:30")
+        return
+    send_at = f"{int(m.group(1)):02d}:{m.group(2)}"
+
+    group = await get_user_group(message.from_user.id)
+    if not group:
+        await answer(message, "Сначала введите номер группы, затем повторите /subscribe.")
+        return
+
+    await get_backend().subscriptions.subscribe(message.from_user.id, group, send_at)
+    logger.info("Пользователь %s подписался: группа %s в %s", message.from_user.id, group, send_at)
+    await answer(
+        message,
+        f"🔔 Каждый день в <b>{send_at}</b> буду присылать расписание группы <b>{html.escape(group)}</b>.\n"
+        "Отписаться: /unsubscribe",
+        parse_mode="HTML",
+    )
+
+
+@router.message(Command("unsubscribe"))
+async def cmd_unsubscribe(message: types.Message) -> None:
+    if await get_backend().subscriptions.unsubscribe(message.from_user.id):
+        logger.info("Пользователь %s отписался", message.from_user.id)
+        await answer(message, "🔕 Подписка отключена.")
+    else:
+        await answer(message, "У вас нет подписки. Подписаться: /subscribe ЧЧ:ММ")
+
+
+async def fan_out(run_date: date, send_at: str, resend: Tuple[int, ...] = ()) -> int:
+    """Рассылает расписание на run_date подписчикам со временем send_at.
+
+    Подписчики группируются по группе: текст дня отрисовывается один раз
+    на группу. Сообщения идут через SENDER с приоритетом BULK, в очереди
+    одновременно не больше FANOUT_WINDOW. resend — статусы журнала,
+    которые отправляются повторно (RETRY, а при старте и QUEUED).
+    Возвращает число отправленных.
+    """
+    day = run_date.isoformat()
+    subs = get_backend().subscriptions
+    pending = await subs.pending(day, send_at, resend)
+    if not pending:
+        return 0
+
+    store = get_store()
+    day_name = DAYS[run_date.weekday()]
+    total = sum(len(users) for users in pending.values())
+    logger.info("Рассылка %s %s: %d подписчиков, %d групп", day, send_at, total, len(pending))
+
+    sent = 0
+    in_flight: Set[asyncio.Future] = set()
+    owners: Dict[asyncio.Future, int] = {}
+
+    async def _settle(return_when) -> None:
+        nonlocal sent
+        done, _ = await asyncio.wait(in_flight, return_when=return_when)
+        ok: List[int] = []
+        failed: List[int] = []
+        for fut in done:
+            in_flight.discard(fut)
+            user_id = owners.pop(fut)
+            exc = fut.exception()
+            if exc is None:
+                ok.append(user_id)
+            elif isinstance(exc, TelegramForbiddenError):
+                # Бот заблокирован — подписка больше не нужна
+                await subs.unsubscribe(user_id)
+                ok.append(user_id)
+            else:
+                failed.append(user_id)
+        await subs.mark(day, send_at, ok, SENT)
+        await subs.release(day, send_at, failed)
+        sent += len(ok)
+
+    for group, users in pending.items():
+        table = store.table(group)
+        if table is None or not table.day(day_name, None):
+            # Группа пропала из таблицы или в этот день занятий нет — отмечаем без отправки
+            await subs.mark(day, send_at, users, SENT)
+            continue
+
+        text = render_day(group, table, day_name, target_date=run_date, fingerprint=store.fingerprint(group))
+        for i in range(0, len(users), FANOUT_WINDOW):
+            batch = users[i:i + FANOUT_WINDOW]
+            # Сначала отметка в журнале, потом очередь: после падения эти записи повторит старт
+            await subs.mark(day, send_at, batch, QUEUED)
+            for user_id in batch:
+                fut = SENDER.submit(user_id, text, priority=BULK, parse_mode="HTML", disable_web_page_preview=True)
+                in_flight.add(fut)
+                owners[fut] = user_id
+            while len(in_flight) >= FANOUT_WINDOW:
+                await _settle(asyncio.FIRST_COMPLETED)
+
+    while in_flight:
+        await _settle(asyncio.ALL_COMPLETED)
+
+    logger.info("Рассылка %s %s завершена: отправлено %d из %d", day, send_at, sent, total)
+    return sent
+
+
+async def run_due(now: datetime, resume: bool = False) -> None:
+    """Один шаг рассылки на лидере для момента now.
+
+    resume — реплика только что стала лидером: продолжаются сегодняшние
+    рассылки, прерванные падением прежнего лидера, с повтором сообщений,
+    оставшихся в очереди (QUEUED) — они могли уйти, так что возможен дубль.
+    Иначе повторяются неудачные отправки (RETRY), пока не исчерпан
+    MAX_ATTEMPTS. Затем запускаются рассылки после отметки последнего шага
+    (не дальше CATCHUP_MINUTES назад), и отметка сдвигается на now.
+    Отметка лежит в StateBackend, так что после смены лидера новый
+    продолжает с того же места.
+    """
+    subs = get_backend().subscriptions
+    today = now.date()
+    day = today.isoformat()
+    current = now.strftime("%H:%M")
+
+    if resume:
+        await subs.prune((today - timedelta(days=2)).isoformat())
+        for send_at in await subs.started_runs(day, current):
+            await fan_out(today, send_at, resend=(QUEUED, RETRY))
+    else:
+        # Повторы — до новых рассылок, чтобы свежие ошибки ждали следующей минуты
+        for send_at in await subs.retry_runs(day, current):
+            await fan_out(today, send_at, resend=(RETRY,))
+
+    marker = await subs.last_run()
+    if marker is None:
+        after = current
+    else:
+        floor = now - timedelta(minutes=CATCHUP_MINUTES)
+        after = floor.strftime("%H:%M") if floor.date() == today else ""
+        last_day, last_time = marker.split()
+        if last_day == day:
+            after = max(after, last_time)
+    for send_at in await subs.due_times(after, current):
+        await fan_out(today, send_at)
+    await subs.set_last_run(f"{day} {current}")
+
+
+async def subscription_task(shutdown_event: asyncio.Event, is_leader: asyncio.Event) -> None:
+    """Раз в минуту запускает рассылки, время которых наступило.
+
+    Рассылает только лидер; подписки, журнал и отметка последнего шага
+    общие для всех реплик (StateBackend), см. run_due.
+    """
+    tz = ZoneInfo(cfg.tz)
+    leading = False
+
+    while not shutdown_event.is_set():
+        try:
+            if is_leader.is_set():
+                await run_due(datetime.now(tz), resume=not leading)
+                leading = True
+            else:
+                leading = False
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            logger.exception("Ошибка рассылки подписок: %s", e)
+
+        now = datetime.now(tz)
+        try:
+            await asyncio.wait_for(shutdown_event.wait(), timeout=60 - now.second - now.microsecond / 1e6 + 0.5)
+        except asyncio.TimeoutError:
+            pass
@@ -1,44 +1,51 @@
 import asyncio
 import logging
-from logging.handlers import RotatingFileHandler
-from datetime import datetime, time, timedelta
-from zoneinfo import ZoneInfo
+import queue
+import signal
+import time
+from contextlib import contextmanager, suppress
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from app.middlewares.antiflood import AntiFloodMiddleware
 from app.middlewares.singleflight import SingleFlightMiddleware
 from app.services.config import cfg
-from app.handlers import start, schedule, schedule_buttons
-from app.services.csv_cache import ensure_startup_cache, refresh_all
+from app.handlers import start, schedule, schedule_buttons, subscriptions, inline, lookup
+from app.services.csv_cache import ensure_startup_cache, refresh_all, publish_sheets, sync_snapshot
+from app.services import schedule_store, http_client, metrics, state_backend, executors
+from app.services.lookup import on_store_published as rebuild_lookup
+from app.services.user_store import USER_GROUPS
+from app.services.subscriptions import SUBSCRIPTIONS
+from app.services.changes import CHANGE_FEED
+from app.services.timetable import seconds_until_next_refresh
+from app.services.sender import SENDER
+from app.services import web as web_server
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
-from aiohttp import web
-import threading
 
 logger = logging.getLogger(__name__)
 
 
-def setup_logging():
+def setup_logging() -> QueueListener:
+    """Логи пишутся в файл отдельным потоком: в цикле событий — только put в очередь."""
     import os
     os.makedirs("logs", exist_ok=True)
     handler = RotatingFileHandler(cfg.log_file, maxBytes=1_000_000, backupCount=3, encoding="utf-8")
     fmt = logging.Formatter("%(asctime)s | %(levelname)-8s | %(name)s | %(message)s")
     handler.setFormatter(fmt)
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
     root = logging.getLogger()
     root.setLevel(getattr(logging, cfg.log_level.upper(), logging.INFO))
-    root.addHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    return listener
 
 
 async def _seconds_until_next_run() -> float:
-    tz = ZoneInfo(cfg.tz)
-    now = datetime.now(tz)
-    targets = []
-    for hhmm in cfg.refresh_at:
-        h, m = map(int, hhmm.split(":"))
-        targets.append(datetime.combine(now.date(), time(h, m), tzinfo=tz))
-        targets.append(datetime.combine(now.date() + timedelta(days=1), time(h, m), tzinfo=tz))
-    future = min(t for t in targets if t > now)
-    return (future - now).total_seconds()
+    return seconds_until_next_refresh()
 
 
 async def _cron_refresh_task(shutdown_event: asyncio.Event):
@@ -56,7 +63,8 @@ async def _cron_refresh_task(shutdown_event: asyncio.Event):
             except asyncio.TimeoutError:
                 pass
             
-            await refresh_all()
+            if _IS_LEADER.is_set():
+                await refresh_all()
             
         except asyncio.CancelledError:
             break
@@ -65,62 +73,235 @@ async def _cron_refresh_task(shutdown_event: asyncio.Event):
             await asyncio.sleep(60)
 
 
-async def health_check(request):
-    return web.Response(text="OK")
+_IS_LEADER = asyncio.Event()
 
 
-def start_health_server():
-    """Запускает HTTP-сервер для health-check в отдельном потоке"""
-    app = web.Application()
-    app.router.add_get('/health', health_check)
-    runner = web.AppRunner(app)
-    
-    def run():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(runner.setup())
-        site = web.TCPSite(runner, '0.0.0.0', 8000)
-        loop.run_until_complete(site.start())
-        loop.run_forever()
-    
-    thread = threading.Thread(target=run, daemon=True)
-    thread.start()
+async def _leader_task(shutdown_event: asyncio.Event):
+    """Выбор лидера среди реплик. Лидер обновляет CSV, остальные берут снимок."""
+    backend = state_backend.get_backend()
+    renew_every = max(1.0, cfg.leader_ttl / 3)
+    next_renew = 0.0
+    loop = asyncio.get_running_loop()
+    while not shutdown_event.is_set():
+        try:
+            if loop.time() >= next_renew:
+                next_renew = loop.time() + renew_every
+                leader = await backend.acquire_leadership()
+                if leader and not _IS_LEADER.is_set():
+                    logger.info("Реплика стала лидером")
+                    _IS_LEADER.set()
+                    await publish_sheets()
+                elif not leader and _IS_LEADER.is_set():
+                    logger.warning("Реплика потеряла лидерство")
+                    _IS_LEADER.clear()
+            if not _IS_LEADER.is_set():
+                await sync_snapshot()
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            logger.exception("Ошибка синхронизации реплик: %s", e)
+
+        if not backend.shared:
+            break
+        try:
+            await asyncio.wait_for(shutdown_event.wait(), timeout=min(renew_every, cfg.snapshot_poll))
+        except asyncio.TimeoutError:
+            pass
+
+
+_BACKGROUND: set = set()
+
+
+class _StartupTimer:
+    """Длительность фаз запуска: в лог и в метрику bot_startup_phase_seconds."""
+
+    def __init__(self, started_at: float | None = None):
+        self.started_at = started_at or time.perf_counter()
+        self.phases: list = []
+        if started_at is not None:
+            # Фаза импорта: от старта run.py до входа в main()
+            self._record("imports", time.perf_counter() - started_at)
+
+    def _record(self, name: str, seconds: float) -> None:
+        self.phases.append((name, seconds))
+        metrics.STARTUP_SECONDS.labels(name).set(seconds)
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - t0)
+
+    def report(self) -> None:
+        total = time.perf_counter() - self.started_at
+        logger.info(
+            "Запуск за %.0f мс: %s", total * 1000,
+            ", ".join(f"{name} {sec * 1000:.0f}" for name, sec in self.phases),
+        )
+        self._record("total", total)
+
+
+def _notify_changes(version: int, changes) -> None:
+    # Уведомляет только лидер, иначе каждая реплика разослала бы то же самое
+    if not (cfg.notify_changes and changes and _IS_LEADER.is_set() and SENDER.running):
+        return
+    task = asyncio.get_running_loop().create_task(schedule_buttons.notify_changed_groups(changes))
+    _BACKGROUND.add(task)
+    task.add_done_callback(_BACKGROUND.discard)
 
 
-async def main() -> None:
-    setup_logging()
-    start_health_server()
+async def _wait_for_signal() -> None:
+    """Ждёт SIGTERM/SIGINT (docker stop, Ctrl+C) в режиме webhook.
+
+    В режиме polling сигналы обрабатывает aiogram; здесь без обработчика
+    процесс завершился бы, не выполнив очистку в finally.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    signals = (signal.SIGTERM, signal.SIGINT)
+    for sig in signals:
+        with suppress(NotImplementedError):  # Windows
+            loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+        logger.info("Получен сигнал остановки")
+    finally:
+        for sig in signals:
+            with suppress(NotImplementedError):
+                loop.remove_signal_handler(sig)
+
+
+async def _prepare_polling(bot: Bot) -> bool:
+    """Проверяет, что у токена нет webhook, иначе getUpdates вернёт конфликт.
+
+    Webhook снимается только при DELETE_WEBHOOK=1: он общий для всех реплик
+    с этим токеном.
+    """
+    info = await bot.get_webhook_info()
+    if not info.url:
+        return True
+    if cfg.delete_webhook:
+        logger.warning("Снимаем webhook %s для режима polling (DELETE_WEBHOOK=1)", info.url)
+        await bot.delete_webhook()
+        return True
+    logger.error(
+        "У бота установлен webhook %s — polling невозможен. "
+        "Задайте WEBHOOK_URL или DELETE_WEBHOOK=1, чтобы снять его.", info.url,
+    )
+    return False
+
+
+async def main(started_at: float | None = None) -> None:
+    """started_at — time.perf_counter() до импорта приложения, для замера фазы импорта."""
+    log_listener = setup_logging()
     logger.info("Запуск бота...")
+    timer = _StartupTimer(started_at)
+    with timer.phase("executors"):
+        executors.start_executors()
+    lag_monitor = executors.LoopLagMonitor(cfg.loop_lag_interval, cfg.loop_lag_warn_ms)
+    lag_monitor.start()
 
-    await ensure_startup_cache()
-    
-    shutdown_event = asyncio.Event()
-    
-    refresh_task = asyncio.create_task(_cron_refresh_task(shutdown_event))
+    session = None
+    if cfg.telegram_api_url:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(cfg.telegram_api_url))
+        logger.info("Bot API: %s", cfg.telegram_api_url)
 
     bot = Bot(
         token=cfg.bot_token,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
     dp = Dispatcher()
 
-    dp.message.middleware(SingleFlightMiddleware())
-    dp.callback_query.middleware(SingleFlightMiddleware())
+    with timer.phase("backend"):
+        backend = await state_backend.init_backend()
+    if isinstance(backend, state_backend.MemoryBackend):
+        metrics.TRACKED_USERS.set_function(lambda: len(backend.state))
 
-    dp.message.middleware(AntiFloodMiddleware(cooldown_sec=1.2))
-    dp.callback_query.middleware(AntiFloodMiddleware(cooldown_sec=0.7))
+    dp.message.middleware(SingleFlightMiddleware(backend=backend))
+    dp.callback_query.middleware(SingleFlightMiddleware(backend=backend))
+
+    dp.message.middleware(AntiFloodMiddleware(
+        cooldown_sec=1.2, burst=cfg.antiflood_burst, backend=backend, name="message",
+    ))
+    dp.callback_query.middleware(AntiFloodMiddleware(
+        cooldown_sec=0.7, burst=cfg.antiflood_burst, backend=backend, name="callback",
+    ))
 
     dp.include_router(start.router)
     dp.include_router(schedule_buttons.router)
+    dp.include_router(subscriptions.router)
+    dp.include_router(inline.router)
+    dp.include_router(lookup.router)
     dp.include_router(schedule.router)
 
+    # /health, webhook и прочие эндпоинты — одно приложение в основном цикле событий
+    app = web_server.create_app()
+    webhook = None
+    if cfg.webhook_url:
+        webhook = web_server.WebhookProcessor(
+            dp, bot,
+            secret=cfg.webhook_secret,
+            workers=cfg.webhook_workers,
+            queue_size=cfg.webhook_queue_size,
+        )
+        webhook.register(app, cfg.webhook_path)
+    with timer.phase("web"):
+        runner = await web_server.start_app(app, cfg.web_host, cfg.web_port)
+
+    schedule_store.subscribe(schedule_buttons.on_store_published)
+    schedule_store.subscribe(rebuild_lookup)
+    CHANGE_FEED.subscribe(schedule_buttons.on_schedule_changes)
+    CHANGE_FEED.subscribe(_notify_changes)
+    await http_client.start_client()
+    with timer.phase("data"):
+        # FAST_START: данные с диска сразу, загрузки листов — в фоне; /ready покажет их возраст
+        download_task = await ensure_startup_cache(background=cfg.fast_start, leader=_IS_LEADER)
+    if download_task is not None:
+        _BACKGROUND.add(download_task)
+        download_task.add_done_callback(_BACKGROUND.discard)
+
+    shutdown_event = asyncio.Event()
+    
+    # С MemoryBackend реплика всегда лидер: задача выставит флаг и завершится
+    leader_task = asyncio.create_task(_leader_task(shutdown_event))
+    refresh_task = asyncio.create_task(_cron_refresh_task(shutdown_event))
+    SENDER.start(bot)
+    subscription_task = asyncio.create_task(subscriptions.subscription_task(shutdown_event, _IS_LEADER))
+    timer.report()
+
     try:
-        await dp.start_polling(bot)
+        if webhook is not None:
+            await webhook.start()
+            await _wait_for_signal()
+        else:
+            if not await _prepare_polling(bot):
+                return
+            await dp.start_polling(bot)
     except asyncio.CancelledError:
-        logger.warning("Polling остановлен")
+        logger.warning("Приём обновлений остановлен")
     finally:
         shutdown_event.set()
         await refresh_task
+        await leader_task
+        # Рассылка может ждать очередь SENDER — прерываем, оставшиеся QUEUED повторит следующий старт
+        subscription_task.cancel()
+        if download_task is not None:
+            download_task.cancel()
+        await asyncio.gather(subscription_task, *filter(None, [download_task]), return_exceptions=True)
         
+        if webhook is not None:
+            await webhook.stop()
+        await runner.cleanup()
+        await SENDER.stop()
+        await http_client.close_client()
+        await state_backend.close_backend()
+        USER_GROUPS.close()
+        SUBSCRIPTIONS.close()
         await bot.session.close()
-        logger.info("Бот завершил работу.")
\ No newline at end of file
+        await lag_monitor.stop()
+        executors.shutdown_executors()
+        logger.info("Бот завершил работу.")
+        log_listener.stop()
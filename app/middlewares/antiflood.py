@@ -1,13 +1,30 @@
-import time
 from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware, types
 
+from app.services.metrics import ANTIFLOOD_REJECTED
+from app.services.state_backend import StateBackend, get_backend
+
 
 class AntiFloodMiddleware(BaseMiddleware):
-    def __init__(self, cooldown_sec: float = 1.5):
+    """Ограничение частоты запросов пользователя корзиной токенов.
+
+    В среднем один запрос в cooldown_sec, но допускается серия до burst
+    запросов подряд. Корзины хранятся в StateBackend (память или Redis).
+    """
+
+    def __init__(
+            self,
+            cooldown_sec: float = 1.5,
+            burst: int = 3,
+            backend: Optional[StateBackend] = None,
+            name: Optional[str] = None,
+    ):
         self.cooldown = cooldown_sec
-        self._last_by_user: Dict[int, float] = {}
+        self.rate = 1.0 / cooldown_sec
+        self.burst = float(burst)
+        self.backend = backend or get_backend()
+        self.name = name or f"antiflood:{id(self)}"
 
     async def __call__(
             self,
@@ -19,13 +36,11 @@ class AntiFloodMiddleware(BaseMiddleware):
         if not user_id:
             return await handler(event, data)
 
-        now = time.monotonic()
-        last = self._last_by_user.get(user_id, 0.0)
-        if now - last < self.cooldown:
+        if not await self.backend.take_token(user_id, self.name, self.rate, self.burst):
+            ANTIFLOOD_REJECTED.inc()
             if isinstance(event, types.Message):
                 await event.answer("⏳ Пожалуйста, не нажимайте так часто.")
             elif isinstance(event, types.CallbackQuery):
                 await event.answer("⏳ Подождите…", show_alert=False)
             return
-        self._last_by_user[user_id] = now
         return await handler(event, data)
@@ -1,19 +1,14 @@
-import asyncio
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware, types
 
+from app.services.metrics import SINGLEFLIGHT_REJECTED
+from app.services.state_backend import StateBackend, get_backend
 
-class SingleFlightMiddleware(BaseMiddleware):
-    def __init__(self):
-        self._locks: Dict[int, asyncio.Lock] = {}
 
-    def _get_lock(self, user_id: int):
-        lock = self._locks.get(user_id)
-        if lock is None:
-            lock = asyncio.Lock()
-            self._locks[user_id] = lock
-        return lock
+class SingleFlightMiddleware(BaseMiddleware):
+    def __init__(self, backend: Optional[StateBackend] = None):
+        self.backend = backend or get_backend()
 
     async def __call__(
             self,
@@ -25,13 +20,16 @@ class SingleFlightMiddleware(BaseMiddleware):
         if not user:
             return await handler(event, data)
 
-        lock = self._get_lock(user.id)
-        if lock.locked():
+        token = await self.backend.try_lock(user.id)
+        if token is None:
+            SINGLEFLIGHT_REJECTED.inc()
             if isinstance(event, types.Message):
                 await event.answer("⏳ Обрабатываю предыдущий запрос…")
             elif isinstance(event, types.CallbackQuery):
                 await event.answer("⏳ Обрабатываю предыдущий запрос…", show_alert=False)
             return
 
-        async with lock:
+        try:
             return await handler(event, data)
+        finally:
+            await self.backend.unlock(user.id, token)
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше burst подряд."""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, rate: float, burst: float, now: float) -> bool:
+        tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if tokens >= 1.0:
+            self.tokens = tokens - 1.0
+            return True
+        self.tokens = tokens
+        return False
+
+
+class UserSlot:
+    """Состояние одного пользователя, общее для всех middleware."""
+
+    __slots__ = ("seen", "buckets", "_lock")
+
+    def __init__(self, now: float):
+        self.seen = now
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    @property
+    def busy(self) -> bool:
+        return self._lock is not None and self._lock.locked()
+
+    def bucket(self, name: str, burst: float, now: float) -> TokenBucket:
+        b = self.buckets.get(name)
+        if b is None:
+            b = self.buckets[name] = TokenBucket(burst, now)
+        return b
+
+
+class UserStateTable:
+    """Ограниченная таблица состояний пользователей (LRU с истечением по времени).
+
+    Каждое обращение — O(1): запись переносится в конец OrderedDict, а с
+    начала вытесняются записи старше ttl или сверх max_users. Записи с
+    захваченной блокировкой не вытесняются, а переносятся в конец.
+    """
+
+    def __init__(self, max_users: int = 100_000, ttl: float = 600.0):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._slots: "OrderedDict[int, UserSlot]" = OrderedDict()
+
+    def get(self, user_id: int, now: Optional[float] = None) -> UserSlot:
+        now = time.monotonic() if now is None else now
+        slot = self._slots.get(user_id)
+        if slot is None:
+            slot = self._slots[user_id] = UserSlot(now)
+            self._evict(now)
+        else:
+            self._slots.move_to_end(user_id)
+            slot.seen = now
+        return slot
+
+    def _evict(self, now: float) -> None:
+        # Просматриваем не больше нескольких записей за вызов, чтобы оставаться O(1)
+        for _ in range(4):
+            if not self._slots:
+                return
+            user_id, slot = next(iter(self._slots.items()))
+            if len(self._slots) <= self.max_users and now - slot.seen < self.ttl:
+                return
+            if slot.busy:
+                self._slots.move_to_end(user_id)
+                continue
+            del self._slots[user_id]
+
+    def __len__(self) -> int:
+        return len(self._slots)
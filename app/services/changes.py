@@ -0,0 +1,105 @@
+"""Отпечатки расписаний групп и лента изменений между версиями данных."""
+import hashlib
+import logging
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.services.lessons import Lesson
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(lessons: Iterable[Lesson]) -> str:
+    """Отпечаток содержимого группы, не зависящий от порядка строк в листе."""
+    h = hashlib.blake2b(digest_size=8)
+    for lesson in sorted(lessons):
+        h.update("\x1f".join(lesson).encode("utf-8"))
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+@dataclass
+class GroupChange:
+    group: str
+    added: List[Lesson] = field(default_factory=list)
+    removed: List[Lesson] = field(default_factory=list)
+    # (было, стало) для занятий в том же слоте: день, время, неделя
+    changed: List[Tuple[Lesson, Lesson]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return f"+{len(self.added)} −{len(self.removed)} ~{len(self.changed)}"
+
+
+def _slot(lesson: Lesson) -> Tuple[str, str, str]:
+    return lesson.day, lesson.time, lesson.week_type
+
+
+def diff_group(group: str, old: Sequence[Lesson], new: Sequence[Lesson]) -> GroupChange:
+    gone = Counter(old)
+    gone.subtract(new)
+    came = Counter(new)
+    came.subtract(old)
+    removed = [l for l, n in gone.items() for _ in range(n) if n > 0]
+    added = [l for l, n in came.items() for _ in range(n) if n > 0]
+
+    # Удалённое и добавленное в одном слоте считаем изменением занятия
+    by_slot: Dict[Tuple[str, str, str], List[Lesson]] = {}
+    for lesson in removed:
+        by_slot.setdefault(_slot(lesson), []).append(lesson)
+    change = GroupChange(group)
+    for lesson in added:
+        same_slot = by_slot.get(_slot(lesson))
+        if same_slot:
+            change.changed.append((same_slot.pop(0), lesson))
+        else:
+            change.added.append(lesson)
+    change.removed = [l for lessons in by_slot.values() for l in lessons]
+    return change
+
+
+def diff_stores(
+        old_groups: Dict[str, List[Lesson]],
+        old_prints: Dict[str, str],
+        new_groups: Dict[str, List[Lesson]],
+        new_prints: Dict[str, str],
+) -> List[GroupChange]:
+    """Изменения по группам; сравниваются только группы с разными отпечатками."""
+    changes = []
+    for group in sorted(old_prints.keys() | new_prints.keys()):
+        if old_prints.get(group) == new_prints.get(group):
+            continue
+        changes.append(diff_group(group, old_groups.get(group, ()), new_groups.get(group, ())))
+    return changes
+
+
+ChangeCallback = Callable[[int, List[GroupChange]], None]
+
+
+class ChangeFeed:
+    """Лента изменений внутри процесса: подписчики и последние записи."""
+
+    def __init__(self, history: int = 20):
+        self._subscribers: List[ChangeCallback] = []
+        self.recent: Deque[Tuple[int, List[GroupChange]]] = deque(maxlen=history)
+
+    def subscribe(self, callback: ChangeCallback) -> None:
+        self._subscribers.append(callback)
+
+    def emit(self, version: int, changes: List[GroupChange]) -> None:
+        self.recent.append((version, changes))
+        if changes:
+            shown = ", ".join(f"{c.group} ({c.summary()})" for c in changes[:10])
+            more = f" и ещё {len(changes) - 10}" if len(changes) > 10 else ""
+            logger.info("Изменения v%d: %d групп: %s%s", version, len(changes), shown, more)
+        for callback in self._subscribers:
+            try:
+                callback(version, changes)
+            except Exception as e:
+                logger.exception("Ошибка подписчика ленты изменений: %s", e)
+
+    def last(self) -> Optional[Tuple[int, List[GroupChange]]]:
+        return self.recent[-1] if self.recent else None
+
+
+CHANGE_FEED = ChangeFeed()
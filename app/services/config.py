@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from dataclasses import dataclass, field
+from datetime import date
 from typing import List
 from dotenv import load_dotenv
 
@@ -30,8 +31,80 @@ class Config:
     gids: List[int] = field(default_factory=_parse_gids)
 
     cache_dir: str = os.getenv("CACHE_DIR", "data/csv")
+    users_db: str = os.getenv("USERS_DB", "data/users.sqlite3")
     refresh_at: List[str] = field(default_factory=_parse_times)
     tz: str = os.getenv("TZ", "Europe/Moscow")
+    # Понедельник первой (верхней) недели семестра
+    semester_start: date = date.fromisoformat(os.getenv("SEMESTER_START", "2025-09-01"))
+    # Время рассылки по умолчанию для /subscribe без аргумента
+    subscribe_default_at: str = os.getenv("SUBSCRIBE_DEFAULT_AT", "07:00")
+    # Сообщать пользователям об изменениях в расписании их группы после обновления
+    notify_changes: bool = os.getenv("NOTIFY_CHANGES", "0").lower() in ("1", "true", "yes")
+
+    # Быстрый старт: бот поднимается на листах с диска, недостающие и устаревшие качаются в фоне
+    fast_start: bool = os.getenv("FAST_START", "1").lower() in ("1", "true", "yes")
+    # Возраст листа (часы с последней сверки с Google), после которого он считается устаревшим
+    sheet_max_age_hours: float = float(os.getenv("SHEET_MAX_AGE_HOURS", "24"))
+
+    # Скомпилированный снимок разобранных листов; пусто — schedule.snap в CACHE_DIR
+    schedule_snapshot: str = os.getenv("SCHEDULE_SNAPSHOT", "")
+
+    # Движок разбора CSV: "csv" (stdlib, без pandas) или "pandas"
+    parser_engine: str = os.getenv("PARSER_ENGINE", "csv").strip().lower()
+
+    # Кэш отрисованных сообщений и число популярных групп для прогрева
+    render_cache_size: int = int(os.getenv("RENDER_CACHE_SIZE", "4096"))
+    prewarm_groups: int = int(os.getenv("PREWARM_GROUPS", "50"))
+
+    # HTTP-клиент для загрузки листов
+    http_limit: int = int(os.getenv("HTTP_LIMIT", "20"))
+    http_per_host: int = int(os.getenv("HTTP_PER_HOST", "4"))
+    http_dns_ttl: int = int(os.getenv("HTTP_DNS_TTL", "300"))
+    http_connect_timeout: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    http_read_timeout: float = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+    http_retries: int = int(os.getenv("HTTP_RETRIES", "3"))
+    http_backoff: float = float(os.getenv("HTTP_BACKOFF", "0.5"))
+    max_sheet_bytes: int = int(os.getenv("MAX_SHEET_BYTES", str(50 * 1024 * 1024)))
+
+    # Состояние пользователей в middleware (антифлуд, single-flight)
+    user_state_max: int = int(os.getenv("USER_STATE_MAX", "100000"))
+    user_state_ttl: float = float(os.getenv("USER_STATE_TTL", "600"))
+    antiflood_burst: int = int(os.getenv("ANTIFLOOD_BURST", "3"))
+
+    # Исходящие сообщения: лимиты Telegram
+    send_global_rate: float = float(os.getenv("SEND_GLOBAL_RATE", "25"))
+    send_per_chat_rate: float = float(os.getenv("SEND_PER_CHAT_RATE", "1"))
+    send_per_chat_burst: float = float(os.getenv("SEND_PER_CHAT_BURST", "3"))
+    send_workers: int = int(os.getenv("SEND_WORKERS", "8"))
+
+    # Свой сервер Bot API (локальный telegram-bot-api или Fake Bot API для нагрузочных тестов)
+    telegram_api_url: str = os.getenv("TELEGRAM_API_URL", "")
+
+    # HTTP-сервер (/health, webhook). Webhook включается, если задан WEBHOOK_URL
+    web_host: str = os.getenv("WEB_HOST", "0.0.0.0")
+    web_port: int = int(os.getenv("WEB_PORT", "8000"))
+    webhook_url: str = os.getenv("WEBHOOK_URL", "")
+    webhook_path: str = os.getenv("WEBHOOK_PATH", "/webhook")
+    webhook_secret: str = os.getenv("WEBHOOK_SECRET", "")
+    webhook_max_connections: int = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    webhook_workers: int = int(os.getenv("WEBHOOK_WORKERS", "16"))
+    webhook_queue_size: int = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+    # Снимать webhook при запуске в режиме polling. Выключено: webhook общий для
+    # токена, и polling-реплика иначе отключила бы все webhook-реплики
+    delete_webhook: bool = os.getenv("DELETE_WEBHOOK", "0").lower() in ("1", "true", "yes")
+
+    # Общее состояние реплик: memory (один процесс) или redis
+    state_backend: str = os.getenv("STATE_BACKEND", "memory").lower()
+    redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    redis_prefix: str = os.getenv("REDIS_PREFIX", "kpfu:")
+    leader_ttl: float = float(os.getenv("LEADER_TTL", "60"))
+    snapshot_poll: float = float(os.getenv("SNAPSHOT_POLL", "30"))
+
+    # Пулы исполнения: процессы для разбора CSV (0 — разбор в потоке), потоки для I/O
+    cpu_workers: int = int(os.getenv("CPU_WORKERS", str(min(2, os.cpu_count() or 1))))
+    io_workers: int = int(os.getenv("IO_WORKERS", "8"))
+    loop_lag_warn_ms: float = float(os.getenv("LOOP_LAG_WARN_MS", "100"))
+    loop_lag_interval: float = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
 
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
     log_file: str = os.getenv("LOG_FILE", "logs/bot.log")
@@ -1,16 +1,43 @@
 import asyncio
+import hashlib
+import json
 import logging
 import os
 import re
+import time
+from dataclasses import replace
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 
+from app.services import metrics
 from app.services.config import cfg
-from app.services.google_csv import fetch_csv_text
+from app.services.executors import run_cpu, run_io
+from app.services.google_csv import download_csv
+from app.services.group_search import GroupMatch, GroupSearchIndex
+from app.services.lessons import Lesson, LessonColumns
+from app.services.parser import parse_sheet, parser_tag
+from app.services.state_backend import get_backend
+from app.services import schedule_store
+from app.services.schedule_snapshot import (
+    SheetEntry, SnapshotError, file_fingerprint, is_fresh, read_snapshot, write_snapshot,
+)
 
 logger = logging.getLogger(__name__)
 
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
 GROUP_INDEX: Dict[str, str] = {} # group_code: gid_id,csv
+GROUP_SEARCH = GroupSearchIndex()
+_SHEET_GROUPS: Dict[str, List[str]] = {}  # gid_id.csv: группы из заголовка
+_SHEET_LESSONS: Dict[str, Dict[str, List[Lesson]]] = {}  # gid_id.csv: группа -> занятия
+_COMPILED: Dict[str, SheetEntry] = {}  # листы снимка на диске; columns=None — колонки строятся при записи
+_SNAPSHOT_VERSION = 0  # последняя применённая версия общего снимка (для реплик)
+_SHEET_CHECKED: Dict[int, float] = {}  # gid: время последней успешной сверки листа с Google
+# refresh_all и sync_snapshot пишут одни и те же <gid>.csv.tmp и индекс — только по очереди
+_DATA_LOCK = asyncio.Lock()
+
 
 def _cache_dir():
     d = Path(os.getenv("CACHE_DIR", getattr(cfg, "cache_dir", "data/csv")))
@@ -22,43 +49,227 @@ def _gid_path(gid: int):
     return _cache_dir() / f"gid_{gid}.csv"
 
 
+def snapshot_path() -> Path:
+    return Path(cfg.schedule_snapshot) if cfg.schedule_snapshot else _cache_dir() / "schedule.snap"
+
+
 def list_cached_files():
     d = _cache_dir()
     return sorted([p for p in d.glob("gid_*.csv") if p.is_file()])
 
 
-async def download_gid(gid: int):
-    csv_text = await fetch_csv_text(cfg.spreadsheet_id, gid)
-    if not csv_text:
-        logger.warning("Не удалось скачать CSV для GID=%s", gid)
-        return None
+def _meta_path(gid: int):
+    return _gid_path(gid).with_suffix(".meta.json")
+
+
+def _load_meta(gid: int) -> Dict:
+    if not _gid_path(gid).exists():
+        return {}
+    try:
+        return json.loads(_meta_path(gid).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning("Повреждены метаданные GID=%s: %s", gid, e)
+        return {}
+
+
+def _save_meta(gid: int, meta: Dict):
+    tmp = _meta_path(gid).with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(_meta_path(gid))
 
+
+async def download_gid(gid: int) -> str:
+    """Скачивает лист и заменяет его, только если содержимое изменилось.
+
+    Загрузка идёт потоково во временный .csv.tmp, хэш считается на лету.
+    Возвращает CHANGED, UNCHANGED или FAILED.
+    """
+    meta = await run_io(_load_meta, gid)
     tmp = _gid_path(gid).with_suffix(".csv.tmp")
-    tmp.write_text(csv_text, encoding="utf-8")
-    tmp.replace(_gid_path(gid))
-    logger.info("CSV сохранён: %s", _gid_path(gid))
-    return _gid_path(gid)
+    with metrics.DOWNLOAD_SECONDS.labels(str(gid)).time():
+        result = await download_csv(
+            cfg.spreadsheet_id, gid, tmp,
+            etag=meta.get("etag"), last_modified=meta.get("last_modified"),
+            max_bytes=cfg.max_sheet_bytes,
+        )
+    if result.ok:
+        metrics.DOWNLOAD_BYTES.labels(str(gid)).observe(result.size)
+    if not result.ok and not result.not_modified:
+        logger.warning("Не удалось скачать CSV для GID=%s", gid)
+        return FAILED
+
+    checked_at = time.time()
+    _SHEET_CHECKED[gid] = checked_at
+    if result.not_modified:
+        await run_io(_save_meta, gid, {**meta, "checked_at": checked_at})
+        return UNCHANGED
+
+    new_meta = {
+        "sha256": result.sha256, "etag": result.etag, "last_modified": result.last_modified,
+        "checked_at": checked_at,
+    }
+    if meta.get("sha256") == result.sha256:
+        await run_io(tmp.unlink, True)
+        await run_io(_save_meta, gid, new_meta)
+        logger.info("CSV не изменился: GID=%s", gid)
+        return UNCHANGED
+
+    await run_io(tmp.replace, _gid_path(gid))
+    await run_io(_save_meta, gid, new_meta)
+    logger.info("CSV сохранён: %s (%d байт)", _gid_path(gid), result.size)
+    return CHANGED
 
 
-async def download_all(gids: Optional[List[int]] = None):
+async def download_all(gids: Optional[List[int]] = None) -> Dict[int, str]:
     gids = gids or cfg.gids
-    sem = asyncio.Semaphore(4)
-    saved: List[Path] = []
+    results: Dict[int, str] = {}
 
+    # Параллелизм ограничивает HttpClient (HTTP_PER_HOST)
     async def _one(g):
-        async with sem:
-            p = await download_gid(g)
-            if p:
-                saved.append(p)
+        results[g] = await download_gid(g)
 
     await asyncio.gather(*[_one(g) for g in gids])
-    return saved
+    return results
+
+
+def _load_checked() -> Dict[int, float]:
+    """Время последней сверки листов с диска: из метаданных, иначе mtime файла."""
+    checked = {}
+    for gid in cfg.gids:
+        path = _gid_path(gid)
+        if not path.exists():
+            continue
+        meta = _load_meta(gid)
+        checked[gid] = meta.get("checked_at") or path.stat().st_mtime
+    return checked
+
+
+def sheet_ages(now: Optional[float] = None) -> Dict[int, Optional[float]]:
+    """Возраст данных по GID в секундах; None — листа на диске нет."""
+    now = now or time.time()
+    return {gid: (now - _SHEET_CHECKED[gid]) if gid in _SHEET_CHECKED else None for gid in cfg.gids}
+
 
+def stale_gids() -> List[int]:
+    """Листы, которых нет на диске или которые давно не сверялись с Google."""
+    max_age = cfg.sheet_max_age_hours * 3600
+    return [gid for gid, age in sheet_ages().items() if age is None or age > max_age]
 
-async def ensure_startup_cache():
-    existing = {int(p.stem.split("_")[1]) for p in list_cached_files()}
+
+def _load_compiled(names: List[str]) -> Dict[str, Tuple[SheetEntry, Dict[str, List[Lesson]]]]:
+    """Листы из скомпилированного снимка, совпадающие с CSV на диске."""
+    try:
+        snapshot = read_snapshot(snapshot_path(), parser=parser_tag())
+    except SnapshotError as e:
+        logger.info("Скомпилированный снимок не используется: %s", e)
+        return {}
+    fresh = {}
+    for name in names:
+        entry = snapshot.sheets.get(name)
+        if entry is not None and is_fresh(entry, _cache_dir() / name):
+            # В памяти остаются только списки Lesson — колонки снимка не храним
+            fresh[name] = (replace(entry, columns=None), entry.columns.to_groups())
+    return fresh
+
+
+async def load_cached():
+    """Строит индекс групп и ScheduleStore из листов на диске, без сети.
+
+    Листы, не изменившиеся с последнего скомпилированного снимка, берутся из
+    него; CSV разбираются только для остальных, после чего снимок обновляется.
+    """
+    _SHEET_CHECKED.update(await run_io(_load_checked))
+    names = [p.name for p in await run_io(list_cached_files)]
+    compiled = await run_io(_load_compiled, names)
+
+    for registry in (_SHEET_GROUPS, _SHEET_LESSONS, _COMPILED):
+        registry.clear()
+    for name, (entry, lessons) in compiled.items():
+        _SHEET_GROUPS[name] = entry.groups
+        _SHEET_LESSONS[name] = lessons
+        _COMPILED[name] = entry
+
+    rest = [name for name in names if name not in compiled]
+    if compiled:
+        logger.info("Из скомпилированного снимка: %d лист(ов), разбор CSV: %d", len(compiled), len(rest))
+    await _update_group_index(rest)
+    await _rebuild_store(rest)
+    if rest:
+        await save_compiled(rest)
+
+
+def _fingerprints(names: List[str]) -> Dict[str, tuple]:
+    prints = {}
+    for name in names:
+        try:
+            prints[name] = file_fingerprint(_cache_dir() / name)
+        except FileNotFoundError:
+            pass
+    return prints
+
+
+def _write_compiled(entries: Dict[str, SheetEntry], sheets: Dict[str, Dict[str, List[Lesson]]]) -> int:
+    # Колоночная форма живёт только на время записи
+    columns = {name: replace(entry, columns=LessonColumns.from_groups(sheets[name])) for name, entry in entries.items()}
+    return write_snapshot(snapshot_path(), columns, parser_tag())
+
+
+async def save_compiled(names: Optional[List[str]] = None) -> None:
+    """Обновляет скомпилированный снимок после разбора листов names (по умолчанию всех)."""
+    names = list(_SHEET_LESSONS) if names is None else [n for n in names if n in _SHEET_LESSONS]
+    for name, (sha, size, mtime_ns) in (await run_io(_fingerprints, names)).items():
+        _COMPILED[name] = SheetEntry(sha, size, mtime_ns, _SHEET_GROUPS.get(name, []), None)
+    for name in _COMPILED.keys() - _SHEET_LESSONS.keys():
+        del _COMPILED[name]
+    try:
+        size = await run_io(
+            _write_compiled, dict(_COMPILED), {name: _SHEET_LESSONS[name] for name in _COMPILED},
+        )
+    except OSError as e:
+        logger.warning("Не удалось записать скомпилированный снимок: %s", e)
+        return
+    logger.info("Скомпилированный снимок: %d лист(ов), %d КБ", len(_COMPILED), size // 1024)
+
+
+async def _refresh_as_leader(leader: asyncio.Event) -> Dict[int, str]:
+    """Фоновая загрузка на общем StateBackend: ждёт лидерства, затем докачивает устаревшие листы."""
+    await leader.wait()
+    stale = stale_gids()
+    return await refresh_all(stale) if stale else {}
+
+
+async def ensure_startup_cache(
+        background: bool = False,
+        leader: Optional[asyncio.Event] = None,
+) -> Optional[asyncio.Task]:
+    """Готовит данные к старту.
+
+    background=False — сначала докачивает недостающие листы, затем строит индекс.
+    background=True — сразу поднимает то, что есть на диске, а недостающие и
+    устаревшие листы качает фоновой задачей (её и возвращает). С общим
+    StateBackend качает только лидер (флаг leader), остальные реплики
+    получат листы из его снимка.
+    """
+    existing = {int(p.stem.split("_")[1]) for p in await run_io(list_cached_files)}
     missing = [g for g in cfg.gids if g not in existing]
 
+    if background:
+        if existing:
+            await load_cached()
+            logger.info("Загружено с диска: %d лист(ов), %d групп.", len(existing), len(GROUP_INDEX))
+        stale = stale_gids() if existing else list(cfg.gids)
+        if not stale:
+            return None
+        if get_backend().shared:
+            if leader is None:
+                return None
+            logger.info("Фоновая загрузка %d лист(ов) после выбора лидера: %s", len(stale), stale)
+            return asyncio.create_task(_refresh_as_leader(leader))
+        logger.info("Фоновая загрузка %d лист(ов): %s", len(stale), stale)
+        return asyncio.create_task(refresh_all(stale))
+
     if not existing:
         logger.info("Кэш пуст — первичная загрузка CSV (%d листов)...", len(cfg.gids))
         await download_all()
@@ -67,55 +278,225 @@ async def ensure_startup_cache():
         await download_all(missing)
     else:
         logger.info("CSV уже есть в кэше (%d файлов).", len(existing))
-    
-    _build_group_index()
 
+    await load_cached()
+    return None
+
+
+async def refresh_all(gids: Optional[List[int]] = None) -> Dict[int, str]:
+    """Обновляет листы (по умолчанию все); переразбирает и переиндексирует только изменившиеся.
 
-async def refresh_all():
+    Возвращает статус по каждому GID: CHANGED / UNCHANGED / FAILED.
+    """
+    async with _DATA_LOCK:
+        return await _refresh_all(gids)
+
+
+async def _refresh_all(gids: Optional[List[int]]) -> Dict[int, str]:
     logger.info("Обновление CSV: скачиваю новые версии и заменяю старые...")
-    saved = await download_all()
-    _build_group_index()
-    logger.info("Готово. Обновлено файлов: %d", len(saved))
-    
+    results = await download_all(gids)
+    for gid, status in sorted(results.items()):
+        logger.info("GID=%s: %s", gid, status)
+        metrics.REFRESH_SHEETS.labels(status).inc()
+
+    changed = [_gid_path(g).name for g, status in results.items() if status == CHANGED]
+    if changed:
+        await _update_group_index(changed)
+        await _rebuild_store(changed)
+        await save_compiled(changed)
+        await publish_sheets(changed)
+
+    logger.info(
+        "Готово. Изменено: %d, без изменений: %d, ошибок: %d",
+        len(changed),
+        sum(1 for s in results.values() if s == UNCHANGED),
+        sum(1 for s in results.values() if s == FAILED),
+    )
+    return results
+
+
+def _read_header_groups(path: Path) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        header = f.readline()
 
+    # groups = re.findall(r'\b\d{7}\b', header)
+    all_digits = re.findall(r'\d+', header)
+    groups = [digits for digits in all_digits if len(digits) == 7]
+    logger.debug("Найдены группы в %s: %s", path.name, groups)
+    return groups
 
-def _build_group_index():
-    """Сканирует все CSV и строит индекс групп."""
-    global GROUP_INDEX
+
+def _merge_group_index():
+    """Собирает GROUP_INDEX из заголовков листов; первый по имени файла лист побеждает."""
+    global GROUP_SEARCH
     GROUP_INDEX.clear()
-    
-    for path in list_cached_files():
+    for name in sorted(_SHEET_GROUPS):
+        for group in _SHEET_GROUPS[name]:
+            if group not in GROUP_INDEX:
+                GROUP_INDEX[group] = name
+    GROUP_SEARCH = GroupSearchIndex(GROUP_INDEX)
+    metrics.GROUP_INDEX_SIZE.set(len(GROUP_INDEX))
+
+
+def search_group(text: str) -> GroupMatch:
+    """Ищет группу по полному коду, префиксу («8251») или с опечаткой."""
+    match = GROUP_SEARCH.search(text)
+    (metrics.GROUP_INDEX_HIT if match.exact else metrics.GROUP_INDEX_MISS).inc()
+    return match
+
+
+def _read_headers(names: List[str]) -> Dict[str, Optional[List[str]]]:
+    """Группы из заголовков листов; None — файла больше нет."""
+    headers: Dict[str, Optional[List[str]]] = {}
+    for name in names:
+        path = _cache_dir() / name
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                header = f.readline()
-            
-            # groups = re.findall(r'\b\d{7}\b', header)
-            all_digits = re.findall(r'\d+', header)
-            groups = [digits for digits in all_digits if len(digits) == 7]
-            logger.debug("Найдены группы в %s: %s", path.name, groups)
-            for group in groups:
-                if group not in GROUP_INDEX:
-                    GROUP_INDEX[group] = path.name
-                    
+            headers[name] = _read_header_groups(path)
+        except FileNotFoundError:
+            headers[name] = None
         except Exception as e:
             logger.warning("Не удалось проиндексировать %s: %s", path, e)
-    
+    return headers
+
+
+async def _update_group_index(names: List[str]):
+    """Перечитывает заголовки только указанных листов и пересобирает индекс."""
+    for name, groups in (await run_io(_read_headers, names)).items():
+        if groups is None:
+            _SHEET_GROUPS.pop(name, None)
+        else:
+            _SHEET_GROUPS[name] = groups
+
+    _merge_group_index()
     logger.info("Построен индекс для %d групп", len(GROUP_INDEX))
 
 
-def find_group_schedule_local(group_code: str):
-    clean_code = "".join(ch for ch in (group_code or "") if ch.isdigit())
-    if len(clean_code) != 7:
-        return None
-    
-    filename = GROUP_INDEX.get(clean_code)
-    if not filename:
-        logger.warning("Группа %s не найдена в индексе", clean_code)
-        return None
-    
-    path = _cache_dir() / filename
+def _parse_file(path: Path, engine: str) -> Tuple[LessonColumns, float]:
+    # Выполняется в пуле процессов: читает и разбирает лист целиком.
+    # Колоночная форма заметно дешевле в pickle, чем списки Lesson.
+    # Время разбора меряется здесь, чтобы не включать ожидание свободного процесса.
+    started = time.perf_counter()
+    columns = LessonColumns.from_groups(parse_sheet(path.read_text(encoding="utf-8"), engine=engine))
+    return columns, time.perf_counter() - started
+
+
+async def _parse_one(name: str) -> Optional[LessonColumns]:
+    path = _cache_dir() / name
+    started = time.perf_counter()
     try:
-        return path.read_text(encoding="utf-8")
+        columns, seconds = await run_cpu(_parse_file, path, cfg.parser_engine)
     except Exception as e:
-        logger.error("Ошибка чтения %s: %s", path, e)
-        return None
\ No newline at end of file
+        logger.warning("Не удалось разобрать %s: %s", path, e)
+        return None
+    metrics.PARSE_SECONDS.labels(cfg.parser_engine).observe(seconds)
+    metrics.CPU_WAIT_SECONDS.observe(max(0.0, time.perf_counter() - started - seconds))
+    return columns
+
+
+async def _parse_sheets(names: List[str]) -> Dict[str, LessonColumns]:
+    """Разбирает листы параллельно в пуле процессов."""
+    results = await asyncio.gather(*[_parse_one(name) for name in names])
+    return {name: parsed for name, parsed in zip(names, results) if parsed is not None}
+
+
+async def _rebuild_store(names: Optional[List[str]] = None):
+    """Переразбирает указанные листы (по умолчанию все) и публикует новое хранилище."""
+    if names is None:
+        _SHEET_LESSONS.clear()
+        names = [p.name for p in await run_io(list_cached_files)]
+
+    for name, columns in (await _parse_sheets(names)).items():
+        _SHEET_LESSONS[name] = columns.to_groups()
+
+    groups: Dict[str, List[Lesson]] = {}
+    for name in sorted(_SHEET_LESSONS):
+        for group, lessons in _SHEET_LESSONS[name].items():
+            groups.setdefault(group, lessons)
+    schedule_store.publish(groups)
+
+
+def build_compiled_sync(engine: Optional[str] = None) -> Tuple[Path, int, int]:
+    """Разбирает все CSV и записывает скомпилированный снимок без цикла событий.
+
+    Для snapshot.py build. Возвращает (путь, число листов, размер в байтах).
+    """
+    entries = {}
+    for path in list_cached_files():
+        sha, size, mtime_ns = file_fingerprint(path)
+        columns, _ = _parse_file(path, engine or cfg.parser_engine)
+        entries[path.name] = SheetEntry(sha, size, mtime_ns, _read_header_groups(path), columns)
+    target = snapshot_path()
+    return target, len(entries), write_snapshot(target, entries, parser_tag(engine))
+
+
+def _read_sheets(names: List[str]) -> Dict[str, Tuple[str, bytes]]:
+    sheets = {}
+    for name in names:
+        try:
+            data = (_cache_dir() / name).read_bytes()
+        except FileNotFoundError:
+            continue
+        sheets[name] = (hashlib.sha256(data).hexdigest(), data)
+    return sheets
+
+
+def _local_hashes() -> Dict[str, str]:
+    return {name: sha for name, (sha, _) in _read_sheets([p.name for p in list_cached_files()]).items()}
+
+
+async def publish_sheets(names: Optional[List[str]] = None) -> None:
+    """Публикует листы (по умолчанию все) для других реплик через StateBackend."""
+    global _SNAPSHOT_VERSION
+    backend = get_backend()
+    if not backend.shared:
+        return
+    if names is None:
+        names = [p.name for p in await run_io(list_cached_files)]
+    sheets = await run_io(_read_sheets, names)
+    if sheets:
+        _SNAPSHOT_VERSION = await backend.publish_snapshot(sheets)
+        logger.info("Опубликован снимок v%d: %d лист(ов)", _SNAPSHOT_VERSION, len(sheets))
+
+
+def _write_sheets(sheets: Dict[str, Tuple[str, bytes]]) -> None:
+    for name, (_, data) in sheets.items():
+        path = _cache_dir() / name
+        tmp = path.with_suffix(".csv.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+
+
+async def sync_snapshot() -> bool:
+    """Подтягивает снимок, опубликованный лидером. True — данные обновились."""
+    async with _DATA_LOCK:
+        return await _sync_snapshot()
+
+
+async def _sync_snapshot() -> bool:
+    global _SNAPSHOT_VERSION
+    backend = get_backend()
+    if not backend.shared:
+        return False
+    # Дешёвая проверка версии до хэширования всех листов на диске
+    if await backend.snapshot_version() <= _SNAPSHOT_VERSION:
+        return False
+    known = await run_io(_local_hashes)
+    snapshot = await backend.fetch_snapshot(_SNAPSHOT_VERSION, known)
+    if snapshot is None:
+        return False
+
+    version, sheets = snapshot
+    _SNAPSHOT_VERSION = version
+    if not sheets:
+        return False
+
+    await run_io(_write_sheets, sheets)
+    names = list(sheets)
+    now = time.time()
+    for name in names:
+        _SHEET_CHECKED[int(Path(name).stem.split("_")[1])] = now
+    await _update_group_index(names)
+    await _rebuild_store(names)
+    await save_compiled(names)
+    logger.info("Применён снимок v%d: %d лист(ов)", version, len(names))
+    return True
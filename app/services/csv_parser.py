@@ -0,0 +1,152 @@
+"""Разбор листа расписания без pandas.
+
+Повторяет поведение parse_schedule (pandas.read_csv с header=[0, 1]):
+пустые/NA-ячейки, приведение числовых колонок (101 -> "101.0" при пропусках),
+протягивание дня вниз. Лист читается целиком: приведение типа колонки
+зависит от всех её значений, поэтому построчная выдача не экономит память.
+"""
+import csv
+import logging
+import re
+from io import StringIO
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from app.services.lessons import Lesson
+
+logger = logging.getLogger(__name__)
+
+# Значения, которые pandas по умолчанию считает пропуском (na_values)
+NA_VALUES = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+})
+
+_INT_RE = re.compile(r'^[+-]?\d+$')
+_FLOAT_RE = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+_DOT_ZERO_RE = re.compile(r'^(\d+)\.0$')
+_DIGITS_RE = re.compile(r'\d+')
+
+# Смещения колонок группы относительно колонки с предметом
+_GROUP_OFFSETS = (0, 1, 2, 3, 4, 7)
+_GROUP_WIDTH = 8
+
+
+def _clean_value(val: Optional[str]) -> str:
+    if val is None:
+        return ""
+    s = val.strip()
+    return "" if s.lower() in ("nan", "none", "") else s
+
+
+def _header_names(row: Sequence[str], width: int) -> List[str]:
+    names = []
+    for i in range(width):
+        name = row[i] if i < len(row) else ""
+        names.append(name if name else f"Unnamed: {i}_level_0")
+    return names
+
+
+def _coerce_column(values: List[Optional[str]]) -> List[Optional[str]]:
+    """Строковое представление колонки так, как его даёт pandas после astype(str)."""
+    present = [v for v in values if v is not None]
+    if not present:
+        return values
+    if all(_INT_RE.match(v.strip()) for v in present):
+        if len(present) == len(values):
+            return [str(int(v)) for v in values]
+        return [None if v is None else str(float(int(v))) for v in values]
+    if all(_FLOAT_RE.match(v.strip()) for v in present):
+        return [None if v is None else str(float(v)) for v in values]
+    return values
+
+
+def _series(values: List[Optional[str]]) -> List[str]:
+    """Аналог parser._clean_series: strip и замена "nan" на пустую строку."""
+    out = []
+    for v in values:
+        s = "" if v is None else v.strip()
+        out.append("" if s == "nan" else s)
+    return out
+
+
+def _read_rows(lines: Iterable[str]) -> Iterator[List[str]]:
+    for row in csv.reader(lines):
+        if row:
+            yield row
+
+
+def _lessons_from_slices(slices: List[List[Optional[str]]], group_code: str) -> List[Lesson]:
+    if not slices:
+        return []
+
+    columns = [_coerce_column(list(col)) for col in zip(*slices)]
+    raw_days, raw_times, raw_weeks, subj, build, room1, room2, type_, teach = columns
+
+    days: List[Optional[str]] = []
+    last = None
+    for d in raw_days:
+        if d is not None:
+            last = d
+        days.append(last)
+
+    times = _series(raw_times)
+    weeks = _series(raw_weeks)
+    room1 = [_DOT_ZERO_RE.sub(r'\1', r) for r in _series(room1)]
+    room2 = [_DOT_ZERO_RE.sub(r'\1', r) for r in _series(room2)]
+
+    out = []
+    for d, t, w, s, b, r1, r2, ty, te in zip(
+            days, times, weeks, _series(subj), _series(build), room1, room2,
+            _series(type_), _series(teach)
+    ):
+        if s and t:
+            out.append(Lesson.make(
+                group_code,
+                _clean_value(d).capitalize(),
+                _clean_value(t),
+                _clean_value(w),
+                _clean_value(s),
+                _clean_value(b),
+                _clean_value(r1),
+                _clean_value(r2),
+                _clean_value(ty),
+                _clean_value(te),
+            ))
+    return out
+
+
+def parse_sheet_csv(csv_text: str) -> Dict[str, List[Lesson]]:
+    """Аналог parser.parse_sheet: один проход токенизатора на весь лист."""
+    if not csv_text:
+        return {}
+
+    try:
+        rows = list(_read_rows(StringIO(csv_text)))
+    except csv.Error as e:
+        logger.error("Ошибка при чтении CSV: %s", e)
+        return {}
+    if len(rows) < 2:
+        return {}
+
+    width = max(len(rows[0]), len(rows[1]))
+    if any(len(r) > width for r in rows[2:]):
+        logger.error("Ошибка при чтении CSV: строки длиннее заголовка")
+        return {}
+
+    names = _header_names(rows[0], width)
+    body = [r + [""] * (width - len(r)) for r in rows[2:]]
+
+    out: Dict[str, List[Lesson]] = {}
+    for name in names:
+        for code in _DIGITS_RE.findall(name):
+            if len(code) != 7 or code in out:
+                continue
+            start = next(i for i, n in enumerate(names) if code in n)
+            if start + _GROUP_WIDTH > width:
+                out[code] = []
+                continue
+            wanted = (0, 1, 2) + tuple(start + off for off in _GROUP_OFFSETS)
+            slices = [[None if r[i] in NA_VALUES else r[i] for i in wanted] for r in body]
+            out[code] = _lessons_from_slices(slices, code)
+    return out
@@ -0,0 +1,114 @@
+"""Пулы исполнения: разбор CSV и блокирующий ввод-вывод вне цикла событий.
+
+- CPU-пул (процессы, CPU_WORKERS) — разбор листов; при CPU_WORKERS=0
+  разбор идёт в потоке I/O-пула;
+- I/O-пул (потоки, IO_WORKERS) — чтение и запись файлов, SQLite;
+- LoopLagMonitor — предупреждает, если цикл событий был занят дольше
+  LOOP_LAG_WARN_MS.
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+from app.services import metrics
+from app.services.config import cfg
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_CPU_POOL: Optional[Executor] = None
+_IO_POOL: Optional[ThreadPoolExecutor] = None
+
+
+def _io_pool() -> ThreadPoolExecutor:
+    global _IO_POOL
+    if _IO_POOL is None:
+        _IO_POOL = ThreadPoolExecutor(max_workers=cfg.io_workers, thread_name_prefix="io")
+    return _IO_POOL
+
+
+def _new_cpu_pool() -> ProcessPoolExecutor:
+    # spawn: fork процесса с потоками (aiohttp, I/O-пул) небезопасен
+    return ProcessPoolExecutor(
+        max_workers=cfg.cpu_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def start_executors() -> None:
+    """Создаёт пулы (вызывается из main до первой загрузки данных)."""
+    global _CPU_POOL
+    _io_pool()
+    if _CPU_POOL is None and cfg.cpu_workers > 0:
+        _CPU_POOL = _new_cpu_pool()
+    logger.info("Пулы исполнения: CPU=%d процесс(ов), I/O=%d поток(ов)", cfg.cpu_workers, cfg.io_workers)
+
+
+def shutdown_executors() -> None:
+    global _CPU_POOL, _IO_POOL
+    if _CPU_POOL is not None:
+        _CPU_POOL.shutdown(wait=True, cancel_futures=True)
+        _CPU_POOL = None
+    if _IO_POOL is not None:
+        _IO_POOL.shutdown(wait=True)
+        _IO_POOL = None
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Выполняет блокирующий ввод-вывод в I/O-пуле."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_pool(), functools.partial(fn, *args, **kwargs))
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any) -> T:
+    """Выполняет CPU-задачу в пуле процессов (или в I/O-пуле, если он отключён).
+
+    fn и аргументы должны сериализоваться pickle: функция уровня модуля.
+    Если рабочий процесс упал, пул пересоздаётся и задача повторяется один раз.
+    """
+    global _CPU_POOL
+    loop = asyncio.get_running_loop()
+    if _CPU_POOL is None:
+        return await loop.run_in_executor(_io_pool(), functools.partial(fn, *args))
+    pool = _CPU_POOL
+    try:
+        return await loop.run_in_executor(pool, functools.partial(fn, *args))
+    except BrokenProcessPool:
+        if _CPU_POOL is pool:
+            logger.error("Пул процессов сломан — пересоздаю")
+            pool.shutdown(wait=False, cancel_futures=True)
+            _CPU_POOL = _new_cpu_pool()
+        return await loop.run_in_executor(_CPU_POOL, functools.partial(fn, *args))
+
+
+class LoopLagMonitor:
+    """Замеряет задержку цикла событий: насколько позже срабатывает sleep(interval)."""
+
+    def __init__(self, interval: float = 0.5, warn_ms: float = 100.0):
+        self.interval = interval
+        self.warn = warn_ms / 1000
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            metrics.LOOP_LAG_SECONDS.observe(lag)
+            if lag > self.warn:
+                logger.warning("Цикл событий был заблокирован %.0f мс", lag * 1000)
@@ -1,53 +1,118 @@
+import hashlib
 import logging
-from typing import Optional, List
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
 
 import aiohttp
 
+from app.services.executors import run_io
+from app.services.http_client import HttpClient, get_client
+
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://docs.google.com/spreadsheets/d/{id}/export?format=csv&gid={gid}"
 
+T = TypeVar("T")
 
-async def fetch_csv_text(spreadsheet_id: str, gid: int, session: Optional[aiohttp.ClientSession] = None):
-    url = BASE_URL.format(id=spreadsheet_id, gid=gid)
-    logger.info("Загрузка CSV: GID=%s", gid)
-    logger.debug("URL: %s", url)
 
-    try:
-        close_session = False
-        if session is None:
-            session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
-            close_session = True
+@dataclass
+class DownloadResult:
+    """Результат потоковой загрузки листа в файл.
 
-        async with session.get(url) as resp:
-            if resp.status == 200:
-                text = await resp.text()
-                return text
+    ok=True — файл dest записан, sha256/size посчитаны по потоку.
+    not_modified=True — сервер ответил 304, файл не создавался.
+    """
+    ok: bool = False
+    not_modified: bool = False
+    sha256: Optional[str] = None
+    size: int = 0
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
 
-            logger.error("Ошибка загрузки CSV: GID=%s, статус=%s", gid, resp.status)
-            return None
 
-    except Exception as e:
-        logger.exception("Ошибка при загрузке GID=%s: %s", gid, e)
-        return None
+CHUNK_SIZE = 64 * 1024
+
 
+def _conditional_headers(etag: Optional[str], last_modified: Optional[str]) -> Dict[str, str]:
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+async def _shared_fetch(url: str, headers: Dict[str, str], read: Callable[[aiohttp.ClientResponse], Awaitable[T]]) -> T:
+    """GET через общий HttpClient; вне приложения — через временный."""
+    client = get_client()
+    owned = client is None
+    if owned:
+        client = HttpClient.from_config()
+    try:
+        return await client.fetch(url, read, headers=headers)
     finally:
-        if close_session:
-            await session.close()
+        if owned:
+            await client.close()
 
 
-async def find_group_schedule(spreadsheet_id: str, gids: List[int], group_code: str):
-    logger.info("Поиск группы %s в листах: %s", group_code, gids)
+async def download_csv(
+        spreadsheet_id: str,
+        gid: int,
+        dest: Path,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+) -> DownloadResult:
+    """Потоково пишет лист в dest, считая sha256 на лету.
 
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
-        for gid in gids:
-            csv_text = await fetch_csv_text(spreadsheet_id, gid, session=session)
-            if csv_text and group_code in csv_text:
-                logger.info("Группа %s найдена в GID=%s", group_code, gid)
-                return csv_text
+    Запись на диск идёт в пуле потоков, в памяти держится один чанк.
+    Обрыв посреди тела повторяется HttpClient: файл пишется заново.
+    При превышении max_bytes загрузка прерывается, dest удаляется.
+    """
+    url = BASE_URL.format(id=spreadsheet_id, gid=gid)
+    logger.info("Загрузка CSV: GID=%s", gid)
+    logger.debug("URL: %s", url)
 
-            if csv_text:
-                logger.debug("Группа %s не найдена в GID=%s", group_code, gid)
+    headers = _conditional_headers(etag, last_modified)
+
+    async def _read(resp: aiohttp.ClientResponse) -> DownloadResult:
+        if resp.status == 304:
+            logger.info("CSV не изменился (304): GID=%s", gid)
+            return DownloadResult(not_modified=True, etag=etag, last_modified=last_modified)
+
+        if resp.status != 200:
+            logger.error("Ошибка загрузки CSV: GID=%s, статус=%s", gid, resp.status)
+            return DownloadResult()
 
-    logger.warning("Группа %s не найдена ни в одном листе", group_code)
-    return None
+        digest = hashlib.sha256()
+        size = 0
+        complete = False
+        f = await run_io(open, dest, "wb")
+        try:
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    logger.error("CSV GID=%s больше лимита %d байт — загрузка прервана", gid, max_bytes)
+                    return DownloadResult()
+                digest.update(chunk)
+                await run_io(f.write, chunk)
+            complete = True
+        finally:
+            await run_io(f.close)
+            if not complete:
+                await run_io(dest.unlink, True)
+
+        return DownloadResult(
+            ok=True,
+            sha256=digest.hexdigest(),
+            size=size,
+            etag=resp.headers.get("ETag"),
+            last_modified=resp.headers.get("Last-Modified"),
+        )
+
+    try:
+        return await _shared_fetch(url, headers, _read)
+    except Exception as e:
+        logger.exception("Ошибка при загрузке GID=%s: %s", gid, e)
+        return DownloadResult()
@@ -0,0 +1,95 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+GROUP_CODE_LEN = 7
+DIGITS = "0123456789"
+
+
+@dataclass
+class GroupMatch:
+    """Результат поиска группы.
+
+    exact — найден ровно один код; candidates — варианты для выбора.
+    """
+    exact: Optional[str] = None
+    candidates: List[str] = field(default_factory=list)
+
+
+def query_digits(text: str) -> str:
+    """Цифры запроса. Для формата «09-825» берётся часть после дефиса."""
+    text = text or ""
+    if "-" in text:
+        tail = "".join(ch for ch in text.rsplit("-", 1)[1] if ch.isdigit())
+        if tail:
+            return tail
+    return "".join(ch for ch in text if ch.isdigit())
+
+
+def _edits1(s: str) -> Iterable[str]:
+    """Все строки на расстоянии Дамерау-Левенштейна 1 от s (цифровой алфавит)."""
+    for i in range(len(s) + 1):
+        left, right = s[:i], s[i:]
+        if right:
+            yield left + right[1:]  # удаление
+            for d in DIGITS:
+                if d != right[0]:
+                    yield left + d + right[1:]  # замена
+            if len(right) > 1:
+                yield left + right[1] + right[0] + right[2:]  # перестановка соседних
+        for d in DIGITS:
+            yield left + d + right  # вставка
+
+
+class GroupSearchIndex:
+    """Отсортированный массив кодов групп: точный, префиксный и нечёткий поиск.
+
+    Префиксный поиск — бинарный поиск начала диапазона и проход по нему,
+    т.е. O(log n + k). Нечёткий — перебор соседей запроса на расстоянии 1
+    (а при пустом результате — 2) с проверкой по множеству, что не зависит
+    от числа групп.
+    """
+
+    def __init__(self, codes: Iterable[str] = ()):
+        self._codes: List[str] = sorted(set(codes))
+        self._set = frozenset(self._codes)
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._set
+
+    def prefix(self, prefix: str, limit: int = 12) -> List[str]:
+        out = []
+        i = bisect_left(self._codes, prefix)
+        while i < len(self._codes) and len(out) < limit and self._codes[i].startswith(prefix):
+            out.append(self._codes[i])
+            i += 1
+        return out
+
+    def nearest(self, query: str, limit: int = 6) -> List[str]:
+        found = sorted({c for c in _edits1(query) if c in self._set})
+        if not found and len(query) == GROUP_CODE_LEN:
+            found = sorted({
+                c2 for c1 in _edits1(query) if len(c1) == GROUP_CODE_LEN
+                for c2 in _edits1(c1) if c2 in self._set
+            })
+        return found[:limit]
+
+    def search(self, text: str, limit: int = 12) -> GroupMatch:
+        digits = query_digits(text)
+        if not digits:
+            return GroupMatch()
+        if digits in self._set:
+            return GroupMatch(exact=digits)
+
+        candidates: List[str] = []
+        if len(digits) < GROUP_CODE_LEN:
+            candidates = self.prefix(digits, limit)
+        if not candidates and GROUP_CODE_LEN - 1 <= len(digits) <= GROUP_CODE_LEN + 1:
+            candidates = self.nearest(digits, limit)
+
+        if len(candidates) == 1 and len(digits) < GROUP_CODE_LEN:
+            return GroupMatch(exact=candidates[0])
+        return GroupMatch(candidates=candidates)
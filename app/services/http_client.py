@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from app.services.config import cfg
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+T = TypeVar("T")
+
+
+class HttpClient:
+    """Долгоживущая aiohttp-сессия с пулом соединений и повторами.
+
+    - один TCPConnector на всё приложение (keep-alive, DNS-кэш);
+    - отдельные таймауты на соединение и чтение;
+    - повтор при 429/5xx, обрывах и таймаутах (в том числе посреди тела)
+      с экспоненциальной задержкой и джиттером (Retry-After учитывается,
+      если сервер его прислал);
+    - не более per_host одновременных запросов к одному хосту.
+    """
+
+    def __init__(
+            self,
+            limit: int = 20,
+            per_host: int = 4,
+            dns_ttl: int = 300,
+            connect_timeout: float = 5.0,
+            read_timeout: float = 30.0,
+            retries: int = 3,
+            backoff: float = 0.5,
+            backoff_max: float = 30.0,
+    ):
+        self.limit = limit
+        self.per_host = per_host
+        self.dns_ttl = dns_ttl
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._host_sems: Dict[str, asyncio.Semaphore] = {}
+
+    @classmethod
+    def from_config(cls) -> "HttpClient":
+        return cls(
+            limit=cfg.http_limit,
+            per_host=cfg.http_per_host,
+            dns_ttl=cfg.http_dns_ttl,
+            connect_timeout=cfg.http_connect_timeout,
+            read_timeout=cfg.http_read_timeout,
+            retries=cfg.http_retries,
+            backoff=cfg.http_backoff,
+        )
+
+    async def start(self) -> None:
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.per_host,
+            ttl_dns_cache=self.dns_ttl,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=self.connect_timeout,
+            sock_read=self.read_timeout,
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _host_sem(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        sem = self._host_sems.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(self.per_host)
+            self._host_sems[host] = sem
+        return sem
+
+    def _delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # «Full jitter»: равномерно от 0 до экспоненциальной границы
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    async def fetch(
+            self,
+            url: str,
+            read: Callable[[aiohttp.ClientResponse], Awaitable[T]],
+            headers: Optional[Dict[str, str]] = None,
+    ) -> T:
+        """GET с повторами, включая чтение тела: возвращает read(resp).
+
+        read вызывается заново на каждой попытке, поэтому обрыв или таймаут
+        посреди тела повторяется так же, как ошибка соединения, — read должен
+        начинать запись результата с нуля. После исчерпания попыток read
+        получает последний ответ (или пробрасывается последнее исключение).
+        """
+        if self._session is None:
+            await self.start()
+
+        sem = self._host_sem(url)
+        attempt = 0
+        while True:
+            async with sem:
+                try:
+                    async with self._session.get(url, headers=headers) as resp:
+                        if resp.status not in RETRY_STATUSES or attempt >= self.retries:
+                            return await read(resp)
+                        delay = self._delay(attempt, resp.headers.get("Retry-After"))
+                        logger.warning("HTTP %s: статус %s — повтор через %.1f с", url, resp.status, delay)
+                except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                    if attempt >= self.retries:
+                        raise
+                    delay = self._delay(attempt)
+                    logger.warning("HTTP %s: %r — повтор через %.1f с", url, e, delay)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+_CLIENT: Optional[HttpClient] = None
+
+
+def get_client() -> Optional[HttpClient]:
+    return _CLIENT
+
+
+async def start_client() -> HttpClient:
+    """Создаёт общий клиент приложения (вызывается из main)."""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = HttpClient.from_config()
+        await _CLIENT.start()
+    return _CLIENT
+
+
+async def close_client() -> None:
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.close()
+        _CLIENT = None
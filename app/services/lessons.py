@@ -0,0 +1,120 @@
+"""Компактное представление занятий.
+
+Lesson — NamedTuple вместо словаря из 10 ключей: без хэш-таблицы на каждое
+занятие, а повторяющиеся строки (дни, недели, здания, преподаватели)
+интернируются и хранятся в одном экземпляре.
+
+LessonColumns — колоночная форма листа: общий словарь строк и массив
+малых целых кодов (по 10 на занятие) плюс диапазоны строк по группам.
+В таком виде результат разбора передаётся из пула процессов и сохраняется
+в снимках: pickle массива кодов в разы меньше списка кортежей.
+"""
+import re
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+
+class Lesson(NamedTuple):
+    group: str
+    day: str
+    time: str
+    week_type: str
+    subject: str
+    building: str
+    room1: str
+    room2: str
+    type: str
+    teacher: str
+
+    @classmethod
+    def make(cls, *fields: str) -> "Lesson":
+        """Lesson с интернированными строками."""
+        return cls._make(sys.intern(f) for f in fields)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, str]) -> "Lesson":
+        return cls.make(*(d.get(name, "") for name in cls._fields))
+
+
+FIELD_COUNT = len(Lesson._fields)
+
+_ODD_SPACES_RE = re.compile(r'[\u00A0\u2000-\u200B]')
+_TEACHER_SEP_RE = re.compile(r'[;,]|\s{2,}|\t+')
+
+
+def split_teachers(raw: str) -> List[str]:
+    """Преподаватели из ячейки листа.
+
+    Неразрывные и «тонкие» пробелы заменяются обычными; преподаватели
+    разделены «;», «,», двумя и более пробелами или табуляцией.
+    """
+    clean = _ODD_SPACES_RE.sub(" ", raw or "")
+    return [s.strip() for s in _TEACHER_SEP_RE.split(clean) if s.strip()]
+
+
+def teacher_key(name: str) -> str:
+    """Ключ для поиска: регистр, «ё» и пробелы между инициалами не важны."""
+    key = " ".join(name.lower().replace("ё", "е").split())
+    return re.sub(r'\.\s+(?=\S)', '.', key)
+
+
+class LessonColumns:
+    """Занятия нескольких групп в колоночном виде со словарным кодированием."""
+
+    __slots__ = ("strings", "codes", "groups")
+
+    def __init__(self, strings: List[str], codes: array, groups: Dict[str, Tuple[int, int]]):
+        self.strings = strings  # код -> строка
+        self.codes = codes  # FIELD_COUNT кодов на занятие подряд
+        self.groups = groups  # группа -> (первое занятие, после последнего)
+
+    @classmethod
+    def from_groups(cls, groups: Dict[str, Iterable[Lesson]]) -> "LessonColumns":
+        strings: List[str] = []
+        index: Dict[str, int] = {}
+        codes = array("I")
+        ranges: Dict[str, Tuple[int, int]] = {}
+        n = 0
+        for group, lessons in groups.items():
+            start = n
+            for lesson in lessons:
+                for value in lesson:
+                    code = index.get(value)
+                    if code is None:
+                        code = index[value] = len(strings)
+                        strings.append(value)
+                    codes.append(code)
+                n += 1
+            ranges[group] = (start, n)
+        # Для типичного листа словарь меньше 65536 строк — хватает 2 байт на код
+        if len(strings) <= 0xFFFF:
+            codes = array("H", codes)
+        return cls(strings, codes, ranges)
+
+    def __len__(self) -> int:
+        return len(self.codes) // FIELD_COUNT
+
+    def lessons(self, group: str) -> List[Lesson]:
+        start, stop = self.groups[group]
+        return list(self._rows(start, stop, [sys.intern(s) for s in self.strings]))
+
+    def to_groups(self) -> Dict[str, List[Lesson]]:
+        """Обратно в {группа: [Lesson]}; строки интернируются один раз на словарь."""
+        strings = [sys.intern(s) for s in self.strings]
+        return {
+            group: list(self._rows(start, stop, strings))
+            for group, (start, stop) in self.groups.items()
+        }
+
+    def _rows(self, start: int, stop: int, strings: List[str]) -> Iterator[Lesson]:
+        codes = self.codes
+        make = Lesson._make
+        for i in range(start * FIELD_COUNT, stop * FIELD_COUNT, FIELD_COUNT):
+            yield make([strings[c] for c in codes[i:i + FIELD_COUNT]])
+
+    def __getstate__(self):
+        return self.strings, self.codes, self.groups
+
+    def __setstate__(self, state):
+        self.strings, self.codes, self.groups = state
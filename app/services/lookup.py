@@ -0,0 +1,170 @@
+"""Обратные индексы по всем листам: преподаватель и аудитория -> занятия.
+
+Строятся заново при каждой публикации ScheduleStore, поэтому /teacher,
+/room и /freerooms отвечают без разбора CSV. Занятия ключа раскладываются
+в DayTable лениво — при первом запросе к этому преподавателю или аудитории.
+
+Занятость аудитории — битовая маска (int) по день × пара × чётность:
+бит (day * len(SLOT_STARTS) + slot) * 2 + parity, parity 0 — верхняя
+неделя, 1 — нижняя. Занятие без указания недели занимает оба бита.
+Свободные аудитории — одна проверка маски на аудиторию.
+"""
+import logging
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.lessons import Lesson, split_teachers, teacher_key
+from app.services.schedule_store import ScheduleStore
+from app.services.timetable import DAY_INDEX, LOWER, SLOT_STARTS, UPPER, DayTable, lesson_slots, norm_week
+
+logger = logging.getLogger(__name__)
+
+Room = Tuple[str, str]  # (здание, аудитория)
+
+_PARITY_BITS = {UPPER: 0b01, LOWER: 0b10}
+
+
+def slot_bit(day: int, slot: int, parity: str) -> int:
+    """Маска одной ячейки: день (0 — понедельник), пара, чётность "в"/"н"."""
+    return _PARITY_BITS[parity] << (day * len(SLOT_STARTS) + slot) * 2
+
+
+def _lesson_mask(lesson: Lesson) -> int:
+    day = DAY_INDEX.get(lesson.day.strip().lower())
+    if day is None:
+        return 0
+    parities = _PARITY_BITS.get(norm_week(lesson.week_type), 0b11)
+    mask = 0
+    for slot in lesson_slots(lesson.time):
+        mask |= parities << (day * len(SLOT_STARTS) + slot) * 2
+    return mask
+
+
+class LookupIndex:
+    """Преподаватели и аудитории по одной версии расписания."""
+
+    def __init__(self, groups: Optional[Dict[str, List[Lesson]]] = None, version: int = 0):
+        self.version = version
+        self._teachers: Dict[str, List[Lesson]] = {}
+        self._names: Dict[str, str] = {}  # ключ -> имя для показа (первое встреченное написание)
+        self._rooms: Dict[Room, List[Lesson]] = {}
+        self._by_number: Dict[str, List[Room]] = {}
+        self._occupancy: Dict[Room, int] = {}
+        self._by_building: Dict[str, List[Room]] = {}
+        self._tables: Dict[object, DayTable] = {}
+
+        for lessons in (groups or {}).values():
+            for lesson in lessons:
+                for name in split_teachers(lesson.teacher):
+                    key = teacher_key(name)
+                    self._teachers.setdefault(key, []).append(lesson)
+                    self._names.setdefault(key, name)
+                mask = None
+                for number in {lesson.room1, lesson.room2}:
+                    if number:
+                        room = (lesson.building, number)
+                        postings = self._rooms.get(room)
+                        if postings is None:
+                            postings = self._rooms[room] = []
+                            self._by_number.setdefault(number.lower(), []).append(room)
+                            self._by_building.setdefault(lesson.building, []).append(room)
+                            self._occupancy[room] = 0
+                        postings.append(lesson)
+                        if mask is None:
+                            mask = _lesson_mask(lesson)
+                        self._occupancy[room] |= mask
+
+        self._keys: List[str] = sorted(self._teachers)
+        for rooms in self._by_building.values():
+            rooms.sort(key=lambda room: _room_order(room[1]))
+
+    @property
+    def teachers_count(self) -> int:
+        return len(self._teachers)
+
+    @property
+    def rooms_count(self) -> int:
+        return len(self._rooms)
+
+    def find_teachers(self, query: str, limit: int = 10) -> List[str]:
+        """Ключи преподавателей: точное совпадение или префикс фамилии («иван» -> «иванов и.и.»)."""
+        q = teacher_key(query)
+        if not q:
+            return []
+        if q in self._teachers:
+            return [q]
+        out = []
+        i = bisect_left(self._keys, q)
+        while i < len(self._keys) and len(out) < limit and self._keys[i].startswith(q):
+            out.append(self._keys[i])
+            i += 1
+        return out
+
+    def teacher_name(self, key: str) -> str:
+        return self._names.get(key, key)
+
+    def teacher_table(self, key: str) -> Optional[DayTable]:
+        return self._table(key, self._teachers.get(key))
+
+    def find_rooms(self, number: str, building: str = "") -> List[Room]:
+        """Аудитории с таким номером; building — подстрока названия здания для уточнения."""
+        rooms = self._by_number.get(number.strip().lower(), [])
+        if building:
+            b = building.strip().lower()
+            rooms = [r for r in rooms if b in r[0].lower()]
+        return sorted(rooms)
+
+    def room_table(self, room: Room) -> Optional[DayTable]:
+        return self._table(room, self._rooms.get(room))
+
+    def rooms(self) -> Iterable[Room]:
+        return self._rooms.keys()
+
+    def find_buildings(self, query: str) -> List[str]:
+        """Здания по подстроке названия; точное совпадение (без регистра) — единственный ответ."""
+        q = " ".join(query.lower().split())
+        names = sorted(b for b in self._by_building if b)
+        exact = [b for b in names if b.lower() == q]
+        return exact or [b for b in names if q in b.lower()]
+
+    def free_rooms(self, building: str, day: int, slot: int, parity: str) -> List[str]:
+        """Аудитории здания без занятий в ячейке (день, пара, чётность), по возрастанию номера.
+
+        Учитываются только аудитории, встречающиеся в расписании хоть раз.
+        """
+        bit = slot_bit(day, slot, parity)
+        occupancy = self._occupancy
+        return [room[1] for room in self._by_building.get(building, ()) if not occupancy[room] & bit]
+
+    def occupancy(self, room: Room) -> int:
+        return self._occupancy.get(room, 0)
+
+    def _table(self, key, lessons: Optional[List[Lesson]]) -> Optional[DayTable]:
+        if lessons is None:
+            return None
+        table = self._tables.get(key)
+        if table is None:
+            table = self._tables[key] = DayTable(lessons)
+        return table
+
+
+def _room_order(number: str):
+    digits = "".join(ch for ch in number if ch.isdigit())
+    return int(digits) if digits else 0, number
+
+
+_INDEX = LookupIndex()
+
+
+def get_lookup() -> LookupIndex:
+    return _INDEX
+
+
+def on_store_published(store: ScheduleStore) -> None:
+    """Подписчик ScheduleStore: пересобирает индексы под новую версию."""
+    global _INDEX
+    _INDEX = LookupIndex(store.groups, store.version)
+    logger.info(
+        "Индексы поиска v%d: %d преподавателей, %d аудиторий",
+        store.version, _INDEX.teachers_count, _INDEX.rooms_count,
+    )
@@ -0,0 +1,69 @@
+"""Метрики Prometheus. Экспортируются HTTP-сервером на /metrics."""
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+_SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_BYTES_BUCKETS = (64e3, 256e3, 1e6, 4e6, 16e6, 64e6)
+
+HANDLER_SECONDS = Histogram(
+    "bot_handler_seconds", "Время обработки обновления по маршрутам", ["route"],
+    buckets=_FAST_BUCKETS,
+)
+PARSE_SECONDS = Histogram(
+    "bot_parse_sheet_seconds", "Время разбора одного листа CSV (внутри рабочего процесса)", ["engine"],
+    buckets=_SLOW_BUCKETS,
+)
+CPU_WAIT_SECONDS = Histogram(
+    "bot_cpu_pool_wait_seconds", "Ожидание свободного процесса CPU-пула и передача данных при разборе листа",
+    buckets=_SLOW_BUCKETS,
+)
+FORMAT_SECONDS = Histogram(
+    "bot_format_day_seconds", "Время format_day_schedule (промахи кэша отрисовки)",
+    buckets=_FAST_BUCKETS,
+)
+DOWNLOAD_SECONDS = Histogram(
+    "bot_sheet_download_seconds", "Время загрузки листа", ["gid"],
+    buckets=_SLOW_BUCKETS,
+)
+LOOP_LAG_SECONDS = Histogram(
+    "bot_event_loop_lag_seconds", "Задержка цикла событий",
+    buckets=_FAST_BUCKETS,
+)
+DOWNLOAD_BYTES = Histogram(
+    "bot_sheet_download_bytes", "Размер загруженного листа", ["gid"],
+    buckets=_BYTES_BUCKETS,
+)
+
+CACHE_REQUESTS = Counter(
+    "bot_cache_requests_total", "Обращения к кэшам", ["cache", "result"],
+)
+REJECTIONS = Counter(
+    "bot_middleware_rejections_total", "Обновления, отклонённые middleware", ["middleware"],
+)
+REFRESH_SHEETS = Counter(
+    "bot_refresh_sheets_total", "Итоги обновления листов", ["status"],
+)
+
+STARTUP_SECONDS = Gauge(
+    "bot_startup_phase_seconds", "Длительность фаз запуска", ["phase"],
+)
+GROUP_INDEX_SIZE = Gauge("bot_group_index_size", "Число групп в индексе")
+TRACKED_USERS = Gauge("bot_tracked_users", "Пользователи в таблице состояний middleware")
+
+# Заранее созданные дочерние метрики для горячего пути (без поиска по меткам)
+USER_CACHE_HIT = CACHE_REQUESTS.labels("user_schedule", "hit")
+USER_CACHE_DB = CACHE_REQUESTS.labels("user_schedule", "sqlite")
+USER_CACHE_MISS = CACHE_REQUESTS.labels("user_schedule", "miss")
+GROUP_INDEX_HIT = CACHE_REQUESTS.labels("group_index", "hit")
+GROUP_INDEX_MISS = CACHE_REQUESTS.labels("group_index", "miss")
+RENDER_HIT = CACHE_REQUESTS.labels("render", "hit")
+RENDER_MISS = CACHE_REQUESTS.labels("render", "miss")
+INLINE_HIT = CACHE_REQUESTS.labels("inline", "hit")
+INLINE_MISS = CACHE_REQUESTS.labels("inline", "miss")
+ANTIFLOOD_REJECTED = REJECTIONS.labels("antiflood")
+SINGLEFLIGHT_REJECTED = REJECTIONS.labels("singleflight")
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
@@ -1,53 +1,74 @@
 import logging
+from importlib import metadata
 from io import StringIO
-from typing import List, Dict
+from typing import List, Dict, TYPE_CHECKING
 import re
 
-import pandas as pd
+from app.services.config import cfg
+from app.services.csv_parser import parse_sheet_csv
+from app.services.lessons import Lesson
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+GROUP_CODE_RE = re.compile(r'\d+')
+
+# Версия результата разбора: увеличивать при любом изменении parser/csv_parser/Lesson,
+# меняющем занятия, — иначе старт подхватит скомпилированный снимок старого разбора
+PARSER_VERSION = 1
+
 
-def _clean_series(series: pd.Series):
-    return series.astype(str).str.strip().replace("nan", "")
+def parser_tag(engine: str | None = None) -> str:
+    """Отпечаток разборщика для скомпилированного снимка: движок, версии и поля Lesson."""
+    engine = engine or cfg.parser_engine
+    parts = [engine, str(PARSER_VERSION), ",".join(Lesson._fields)]
+    if engine == "pandas":
+        # Поведение read_csv/astype меняется между версиями pandas
+        try:
+            parts.append("pandas-" + metadata.version("pandas"))
+        except metadata.PackageNotFoundError:
+            parts.append("pandas-?")
+    return ":".join(parts)
 
 
-def _strip_dot_zero(series: pd.Series):
+def _clean_series(series: "pd.Series"):
+    # В pandas 3 astype(str) оставляет NaN пропуском, а не строкой "nan"
+    return series.astype(str).str.strip().replace("nan", "").fillna("")
+
+
+def _strip_dot_zero(series: "pd.Series"):
     return series.apply(
         lambda s: re.sub(r'^(\d+)\.0$', r'\1', s) if isinstance(s, str) else s
     )
 
 def _clean_value(val) -> str:
     """Преобразует любое значение в чистую строку, удаляя nan/None"""
+    import pandas as pd
     if pd.isna(val) or val is None:
         return ""
     s = str(val).strip()
     return "" if s.lower() in ("nan", "none", "") else s
 
-def parse_schedule(csv_text: str, group_code: str) -> List[Dict]:
-    if not csv_text:
-        logger.warning("Получен пустой CSV для группы %s", group_code)
-        return []
 
+def _read_frame(csv_text: str, group_code: str):
+    import pandas as pd
     try:
-        df = pd.read_csv(StringIO(csv_text), header=[0, 1])
+        return pd.read_csv(StringIO(csv_text), header=[0, 1])
     except Exception as e:
         logger.error("Ошибка при чтении CSV для группы %s: %s", group_code, e)
-        return []
+        return None
 
-    col_day, col_time, col_week = df.columns[:3]
-    days = df[col_day].ffill()
-    times = _clean_series(df[col_time])
-    weeks = _clean_series(df[col_week])
 
-    start_idx = next(
+def _find_group_column(df: "pd.DataFrame", group_code: str):
+    return next(
         (i for i, col in enumerate(df.columns) if group_code in str(col[0])),
         None,
     )
-    if start_idx is None:
-        logger.warning("Группа %s не найдена в таблице", group_code)
-        return []
 
+
+def _extract_group(df: "pd.DataFrame", start_idx: int, group_code: str, days, times, weeks) -> List[Lesson]:
     try:
         col_subj = df.columns[start_idx]
         col_build = df.columns[start_idx + 1]
@@ -71,17 +92,73 @@ def parse_schedule(csv_text: str, group_code: str) -> List[Dict]:
             days, times, weeks, subj, build, room1, room2, type_, teach
     ):
         if s and t:
-            out.append({
-                "group": group_code,
-                "day": _clean_value(d).strip().capitalize(),
-                "time": _clean_value(t),
-                "week_type": _clean_value(w),
-                "subject": _clean_value(s),
-                "building": _clean_value(b),
-                "room1": _clean_value(r1),
-                "room2": _clean_value(r2),
-                "type": _clean_value(ty),
-                "teacher": _clean_value(te),
-            })
+            out.append(Lesson.make(
+                group_code,
+                _clean_value(d).strip().capitalize(),
+                _clean_value(t),
+                _clean_value(w),
+                _clean_value(s),
+                _clean_value(b),
+                _clean_value(r1),
+                _clean_value(r2),
+                _clean_value(ty),
+                _clean_value(te),
+            ))
+
+    return out
+
+
+def _common_columns(df: "pd.DataFrame"):
+    col_day, col_time, col_week = df.columns[:3]
+    days = df[col_day].ffill()
+    times = _clean_series(df[col_time])
+    weeks = _clean_series(df[col_week])
+    return days, times, weeks
+
+
+def parse_schedule(csv_text: str, group_code: str) -> List[Lesson]:
+    if not csv_text:
+        logger.warning("Получен пустой CSV для группы %s", group_code)
+        return []
+
+    df = _read_frame(csv_text, group_code)
+    if df is None:
+        return []
+
+    days, times, weeks = _common_columns(df)
+
+    start_idx = _find_group_column(df, group_code)
+    if start_idx is None:
+        logger.warning("Группа %s не найдена в таблице", group_code)
+        return []
+
+    return _extract_group(df, start_idx, group_code, days, times, weeks)
+
+
+def parse_sheet(csv_text: str, engine: str | None = None) -> Dict[str, List[Lesson]]:
+    """Разбирает весь лист за один проход: код группы -> список занятий.
+
+    Результат для каждой группы совпадает с parse_schedule(csv_text, group).
+    engine: "pandas" или "csv" (без pandas); по умолчанию cfg.parser_engine.
+    """
+    if (engine or cfg.parser_engine) == "csv":
+        return parse_sheet_csv(csv_text)
+
+    if not csv_text:
+        return {}
+
+    df = _read_frame(csv_text, "*")
+    if df is None:
+        return {}
+
+    days, times, weeks = _common_columns(df)
+
+    out: Dict[str, List[Lesson]] = {}
+    for col in df.columns:
+        for code in GROUP_CODE_RE.findall(str(col[0])):
+            if len(code) != 7 or code in out:
+                continue
+            start_idx = _find_group_column(df, code)
+            out[code] = _extract_group(df, start_idx, code, days, times, weeks)
 
     return out
@@ -0,0 +1,56 @@
+import logging
+from collections import Counter, OrderedDict
+from typing import Hashable, Iterable, List, Optional
+
+from app.services.config import cfg
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    """LRU-кэш готовых HTML-сообщений с расписанием.
+
+    Ключ начинается с кода группы и содержит отпечаток её расписания:
+    после обновления данных записи неизменившихся групп остаются верными,
+    а записи изменившихся больше не находятся — invalidate_groups() лишь
+    освобождает занятую ими память.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._popularity: Counter = Counter()
+
+    def get(self, key: Hashable) -> Optional[str]:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: str) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def invalidate_groups(self, groups: Iterable[str]) -> int:
+        groups = set(groups)
+        stale = [key for key in self._items if key[0] in groups]
+        for key in stale:
+            del self._items[key]
+        return len(stale)
+
+    def note_group(self, group: str) -> None:
+        self._popularity[group] += 1
+
+    def top_groups(self, n: int) -> List[str]:
+        return [g for g, _ in self._popularity.most_common(n)]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+RENDER_CACHE = RenderCache(cfg.render_cache_size)
@@ -0,0 +1,168 @@
+"""Скомпилированный снимок расписания: индекс групп и разобранные листы в одном файле.
+
+Формат (little-endian):
+
+    заголовок  MAGIC(8) | схема u16 | резерв u16 | длина данных u64 | sha256 данных (32)
+    данные     длина манифеста u32 | манифест JSON | массивы кодов LessonColumns подряд
+
+Манифест хранит отпечаток разборщика (parser.parser_tag: движок, версия
+разбора, поля Lesson), а по каждому листу — sha256/размер/mtime исходного
+CSV, группы из заголовка (для GROUP_INDEX) и словарь строк LessonColumns;
+массив кодов читается из файла как есть, без разбора CSV. Файл пишется
+через .tmp и replace; битый, чужой схемы или собранный другим разборщиком
+снимок не загружается (SnapshotError).
+"""
+import hashlib
+import json
+import struct
+import sys
+import time
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.services.lessons import LessonColumns
+
+MAGIC = b"KPFUSNAP"
+SCHEMA_VERSION = 2
+_HEADER = struct.Struct("<8sHHQ32s")
+_U32 = struct.Struct("<I")
+
+
+class SnapshotError(Exception):
+    """Снимок отсутствует, повреждён или записан другой версией схемы."""
+
+
+@dataclass
+class SheetEntry:
+    sha256: str
+    size: int
+    mtime_ns: int
+    groups: List[str]  # группы из заголовка листа
+    columns: Optional[LessonColumns]  # None — не загружены (в памяти приложения не хранятся)
+
+
+@dataclass
+class Snapshot:
+    sheets: Dict[str, SheetEntry] = field(default_factory=dict)
+    created_at: float = 0.0
+    parser: str = ""
+    schema: int = SCHEMA_VERSION
+    checksum: str = ""
+    size: int = 0
+
+
+def file_fingerprint(path: Path) -> tuple:
+    """(sha256, размер, mtime_ns) исходного листа."""
+    st = path.stat()
+    return hashlib.sha256(path.read_bytes()).hexdigest(), st.st_size, st.st_mtime_ns
+
+
+def is_fresh(entry: SheetEntry, path: Path) -> bool:
+    """Совпадает ли лист на диске с тем, из которого собран снимок.
+
+    Сначала сравниваются размер и mtime; если mtime другой (файл
+    перезаписан тем же содержимым), решает sha256.
+    """
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return False
+    if st.st_size != entry.size:
+        return False
+    if st.st_mtime_ns == entry.mtime_ns:
+        return True
+    return hashlib.sha256(path.read_bytes()).hexdigest() == entry.sha256
+
+
+def _codes_le(codes: array) -> bytes:
+    if sys.byteorder == "little":
+        return codes.tobytes()
+    swapped = array(codes.typecode, codes)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def write_snapshot(path: Path, sheets: Dict[str, SheetEntry], parser: str) -> int:
+    """Атомарно записывает снимок; parser — parser_tag разборщика. Возвращает размер файла в байтах."""
+    manifest = {"created_at": time.time(), "parser": parser, "sheets": {}}
+    blobs: List[bytes] = []
+    offset = 0
+    for name in sorted(sheets):
+        entry = sheets[name]
+        blob = _codes_le(entry.columns.codes)
+        manifest["sheets"][name] = {
+            "sha256": entry.sha256,
+            "size": entry.size,
+            "mtime_ns": entry.mtime_ns,
+            "groups": entry.groups,
+            "strings": entry.columns.strings,
+            "ranges": entry.columns.groups,
+            "typecode": entry.columns.codes.typecode,
+            "offset": offset,
+            "length": len(blob),
+        }
+        blobs.append(blob)
+        offset += len(blob)
+
+    head = json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    payload = b"".join([_U32.pack(len(head)), head, *blobs])
+    header = _HEADER.pack(MAGIC, SCHEMA_VERSION, 0, len(payload), hashlib.sha256(payload).digest())
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(payload)
+    tmp.replace(path)
+    return len(header) + len(payload)
+
+
+def read_snapshot(path: Path, verify: bool = True, parser: Optional[str] = None) -> Snapshot:
+    """Читает снимок. verify=False пропускает проверку sha256 (только для inspect).
+
+    parser — ожидаемый parser_tag: снимок другого разборщика отклоняется.
+    """
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        raise SnapshotError(f"нет файла {path}") from None
+    if len(data) < _HEADER.size:
+        raise SnapshotError("файл короче заголовка")
+
+    magic, schema, _, length, digest = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("не снимок расписания")
+    if schema != SCHEMA_VERSION:
+        raise SnapshotError(f"схема {schema}, ожидается {SCHEMA_VERSION}")
+    payload = memoryview(data)[_HEADER.size:]
+    if len(payload) != length:
+        raise SnapshotError(f"длина данных {len(payload)}, в заголовке {length}")
+    if verify and hashlib.sha256(payload).digest() != digest:
+        raise SnapshotError("не совпадает контрольная сумма")
+
+    (head_len,) = _U32.unpack_from(payload)
+    try:
+        manifest = json.loads(bytes(payload[_U32.size:_U32.size + head_len]))
+    except ValueError as e:
+        raise SnapshotError(f"повреждён манифест: {e}") from None
+    if parser is not None and manifest["parser"] != parser:
+        raise SnapshotError(f"собран разборщиком {manifest['parser']}, ожидается {parser}")
+    blobs = payload[_U32.size + head_len:]
+
+    snapshot = Snapshot(
+        created_at=manifest["created_at"], parser=manifest["parser"], schema=schema,
+        checksum=digest.hex(), size=len(data),
+    )
+    for name, m in manifest["sheets"].items():
+        codes = array(m["typecode"])
+        codes.frombytes(blobs[m["offset"]:m["offset"] + m["length"]])
+        if sys.byteorder != "little":
+            codes.byteswap()
+        ranges = {group: (start, stop) for group, (start, stop) in m["ranges"].items()}
+        snapshot.sheets[name] = SheetEntry(
+            sha256=m["sha256"], size=m["size"], mtime_ns=m["mtime_ns"], groups=m["groups"],
+            columns=LessonColumns(m["strings"], codes, ranges),
+        )
+    return snapshot
@@ -0,0 +1,79 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from app.services.changes import CHANGE_FEED, diff_stores, fingerprint
+from app.services.lessons import Lesson
+from app.services.timetable import DayTable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ScheduleStore:
+    """Готовые списки занятий по группам, собранные при обновлении CSV."""
+    version: int = 0
+    groups: Dict[str, List[Lesson]] = field(default_factory=dict)
+    tables: Dict[str, DayTable] = field(default_factory=dict)
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    built_at: float = field(default_factory=time.time)
+
+    def get(self, group_code: str) -> Optional[List[Lesson]]:
+        return self.groups.get(group_code)
+
+    def table(self, group_code: str) -> Optional[DayTable]:
+        return self.tables.get(group_code)
+
+    def fingerprint(self, group_code: str) -> Optional[str]:
+        return self.fingerprints.get(group_code)
+
+    def __contains__(self, group_code: str) -> bool:
+        return group_code in self.groups
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+
+_STORE = ScheduleStore()
+_SUBSCRIBERS: List[Callable[[ScheduleStore], None]] = []
+
+
+def get_store() -> ScheduleStore:
+    return _STORE
+
+
+def subscribe(callback: Callable[[ScheduleStore], None]) -> None:
+    """Регистрирует обработчик, вызываемый после публикации новой версии."""
+    _SUBSCRIBERS.append(callback)
+
+
+def publish(groups: Dict[str, List[Lesson]]) -> ScheduleStore:
+    """Атомарно подменяет текущее хранилище новым.
+
+    Сначала в CHANGE_FEED уходят изменения по группам (кроме первой
+    публикации), затем вызываются подписчики хранилища.
+    """
+    global _STORE
+    old = _STORE
+    # Списки занятий неизменившихся листов переиспользуются — их таблицы и отпечатки тоже
+    same = {group for group, lessons in groups.items() if old.groups.get(group) is lessons}
+    tables = {
+        group: old.tables[group] if group in same else DayTable(lessons)
+        for group, lessons in groups.items()
+    }
+    prints = {
+        group: old.fingerprints[group] if group in same else fingerprint(lessons)
+        for group, lessons in groups.items()
+    }
+    store = ScheduleStore(version=old.version + 1, groups=groups, tables=tables, fingerprints=prints)
+    _STORE = store
+    logger.info("Опубликовано расписание v%d: %d групп", store.version, len(store))
+    if old.version:
+        CHANGE_FEED.emit(store.version, diff_stores(old.groups, old.fingerprints, groups, prints))
+    for callback in _SUBSCRIBERS:
+        try:
+            callback(store)
+        except Exception as e:
+            logger.exception("Ошибка подписчика расписания: %s", e)
+    return store
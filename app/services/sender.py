@@ -0,0 +1,256 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.middlewares.user_state import TokenBucket
+from app.services.config import cfg
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BULK = 1
+
+MESSAGE_LIMIT = 4096
+
+
+@dataclass
+class _Job:
+    chat_id: int
+    text: str
+    priority: int
+    kwargs: Dict[str, Any]
+    coalesce: bool
+    futures: List[asyncio.Future] = field(default_factory=list)
+    attempts: int = 0
+
+
+class SendScheduler:
+    """Очередь исходящих сообщений с лимитами Telegram.
+
+    - глобальный лимит global_rate сообщений/с;
+    - лимит на чат per_chat_rate сообщений/с с запасом per_chat_burst;
+    - порядок сообщений внутри чата сохраняется;
+    - при 429 чат (и вся очередь) ждёт Retry-After и сообщение повторяется;
+    - подряд идущие сообщения одного чата с coalesce=True и одинаковыми
+      параметрами склеиваются, пока помещаются в 4096 символов;
+    - чаты с интерактивным ответом в голове очереди обслуживаются раньше BULK.
+    """
+
+    def __init__(
+            self,
+            global_rate: float = 25.0,
+            per_chat_rate: float = 1.0,
+            per_chat_burst: float = 3.0,
+            workers: int = 8,
+            max_retries: int = 3,
+    ):
+        self.global_rate = global_rate
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.workers = workers
+        self.max_retries = max_retries
+
+        self._bot: Optional[Bot] = None
+        self._tasks: List[asyncio.Task] = []
+        self._chats: Dict[int, Deque[_Job]] = {}
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._scheduled: set = set()
+        self._ready: List[Tuple[int, int, int]] = []  # (приоритет, seq, chat_id)
+        self._ready_event = asyncio.Event()
+        self._seq = itertools.count()
+        self._global = TokenBucket(global_rate, time.monotonic())
+        self._global_lock = asyncio.Lock()
+        self._paused_until = 0.0
+
+    @classmethod
+    def from_config(cls) -> "SendScheduler":
+        return cls(
+            global_rate=cfg.send_global_rate,
+            per_chat_rate=cfg.send_per_chat_rate,
+            per_chat_burst=cfg.send_per_chat_burst,
+            workers=cfg.send_workers,
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._bot is not None
+
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._bot = None
+
+    def submit(
+            self,
+            chat_id: int,
+            text: str,
+            priority: int = INTERACTIVE,
+            coalesce: bool = False,
+            **kwargs: Any,
+    ) -> asyncio.Future:
+        """Ставит сообщение в очередь; future завершится результатом send_message."""
+        if not self.running:
+            raise RuntimeError("SendScheduler не запущен")
+        fut = asyncio.get_running_loop().create_future()
+        fut.add_done_callback(_consume_exception)
+        job = _Job(chat_id, text, priority, kwargs, coalesce, [fut])
+        self._chats.setdefault(chat_id, deque()).append(job)
+        if chat_id not in self._scheduled:
+            self._schedule(chat_id)
+        return fut
+
+    async def send(self, chat_id: int, text: str, priority: int = INTERACTIVE, **kwargs: Any):
+        return await self.submit(chat_id, text, priority=priority, **kwargs)
+
+    def pending(self) -> int:
+        return sum(len(q) for q in self._chats.values())
+
+    def _schedule(self, chat_id: int, delay: float = 0.0) -> None:
+        self._scheduled.add(chat_id)
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._push, chat_id)
+        else:
+            self._push(chat_id)
+
+    def _push(self, chat_id: int) -> None:
+        q = self._chats.get(chat_id)
+        if not q:
+            self._scheduled.discard(chat_id)
+            self._chats.pop(chat_id, None)
+            # Корзина чата больше не нужна, когда успеет полностью наполниться
+            asyncio.get_running_loop().call_later(
+                self.per_chat_burst / self.per_chat_rate, self._forget, chat_id,
+            )
+            return
+        heapq.heappush(self._ready, (q[0].priority, next(self._seq), chat_id))
+        self._ready_event.set()
+
+    async def _next_chat(self) -> int:
+        while not self._ready:
+            self._ready_event.clear()
+            await self._ready_event.wait()
+        return heapq.heappop(self._ready)[2]
+
+    async def _take_global(self) -> None:
+        async with self._global_lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self._global.take(self.global_rate, self.global_rate, now):
+                    return
+                await asyncio.sleep((1.0 - self._global.tokens) / self.global_rate)
+
+    def _forget(self, chat_id: int) -> None:
+        if chat_id not in self._chats:
+            self._chat_buckets.pop(chat_id, None)
+
+    def _chat_wait(self, chat_id: int) -> float:
+        now = time.monotonic()
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_burst, now)
+        if bucket.take(self.per_chat_rate, self.per_chat_burst, now):
+            return 0.0
+        return (1.0 - bucket.tokens) / self.per_chat_rate
+
+    def _pop_job(self, chat_id: int) -> _Job:
+        q = self._chats[chat_id]
+        job = q.popleft()
+        while job.coalesce and q and q[0].coalesce and q[0].kwargs == job.kwargs:
+            nxt = q[0]
+            if len(job.text) + 2 + len(nxt.text) > MESSAGE_LIMIT:
+                break
+            q.popleft()
+            job.text = job.text + "\n\n" + nxt.text
+            job.futures.extend(nxt.futures)
+            job.priority = min(job.priority, nxt.priority)
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._next_chat()
+            wait = self._chat_wait(chat_id)
+            if wait > 0:
+                self._schedule(chat_id, wait)
+                continue
+
+            await self._take_global()
+            job = self._pop_job(chat_id)
+            delay = 0.0
+            try:
+                result = await self._bot.send_message(job.chat_id, job.text, **job.kwargs)
+            except TelegramRetryAfter as e:
+                job.attempts += 1
+                delay = float(e.retry_after)
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                logger.warning("429 для чата %s: повтор через %.1f с", chat_id, delay)
+                if job.attempts <= self.max_retries:
+                    self._chats[chat_id].appendleft(job)
+                else:
+                    self._resolve(job, exc=e)
+            except asyncio.CancelledError:
+                self._chats[chat_id].appendleft(job)
+                raise
+            except Exception as e:
+                logger.error("Ошибка отправки в чат %s: %s", chat_id, e)
+                self._resolve(job, exc=e)
+            else:
+                self._resolve(job, result=result)
+
+            self._schedule(chat_id, delay)
+
+    @staticmethod
+    def _resolve(job: _Job, result: Any = None, exc: Optional[BaseException] = None) -> None:
+        for fut in job.futures:
+            if fut.done():
+                continue
+            if exc is not None:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(result)
+
+
+def _consume_exception(fut: asyncio.Future) -> None:
+    # Ошибка уже залогирована воркером; не даём asyncio ругаться на неполученное исключение
+    if not fut.cancelled():
+        fut.exception()
+
+
+SENDER = SendScheduler.from_config()
+
+
+async def answer(
+        message: types.Message,
+        text: str,
+        priority: int = INTERACTIVE,
+        coalesce: bool = False,
+        wait: bool = True,
+        **kwargs: Any,
+):
+    """message.answer через очередь SENDER (или напрямую, если она не запущена).
+
+    wait=False — не дожидаться отправки (обработчик сразу освобождает
+    блокировку SingleFlightMiddleware).
+    """
+    if not SENDER.running:
+        return await message.answer(text, **kwargs)
+    fut = SENDER.submit(message.chat.id, text, priority=priority, coalesce=coalesce, **kwargs)
+    if wait:
+        return await fut
+    return None
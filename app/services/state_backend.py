@@ -0,0 +1,276 @@
+"""Хранилище общего состояния бота: в памяти процесса или в Redis.
+
+С MemoryBackend бот работает как раньше — одним процессом. RedisBackend
+позволяет запустить несколько реплик с одним токеном: группа пользователя,
+подписки на рассылку, корзины антифлуда и блокировки single-flight
+становятся общими, а
+обновление CSV выполняет только реплика-лидер и публикует листы для остальных.
+"""
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.middlewares.user_state import UserStateTable
+from app.services.config import cfg
+from app.services.subscriptions import SUBSCRIPTIONS, RedisSubscriptionStore, SubscriptionStore
+from app.services.user_store import USER_GROUPS
+
+logger = logging.getLogger(__name__)
+
+# Снимок листов: версия и {имя файла: (sha256, содержимое)}
+Snapshot = Tuple[int, Dict[str, Tuple[str, bytes]]]
+
+
+class StateBackend(ABC):
+    # True — состояние общее для нескольких реплик (нужна публикация снимков)
+    shared: bool = False
+    # Подписки на рассылку и её журнал (SubscriptionStore или RedisSubscriptionStore)
+    subscriptions = SUBSCRIPTIONS
+
+    @abstractmethod
+    async def get_user_group(self, user_id: int) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set_user_group(self, user_id: int, group: str) -> None:
+        ...
+
+    @abstractmethod
+    async def users_in_groups(self, groups: Iterable[str]) -> Dict[str, List[int]]:
+        """Пользователи, выбравшие одну из групп: группа -> user_id."""
+
+    @abstractmethod
+    async def take_token(self, user_id: int, name: str, rate: float, burst: float) -> bool:
+        """Атомарно забирает токен из корзины (user_id, name)."""
+
+    @abstractmethod
+    async def try_lock(self, user_id: int) -> Optional[object]:
+        """Неблокирующий захват блокировки пользователя; None — уже занята."""
+
+    @abstractmethod
+    async def unlock(self, user_id: int, token: object) -> None:
+        ...
+
+    @abstractmethod
+    async def acquire_leadership(self) -> bool:
+        """Захватывает или продлевает лидерство; True — эта реплика лидер."""
+
+    @abstractmethod
+    async def publish_snapshot(self, sheets: Dict[str, Tuple[str, bytes]]) -> int:
+        """Публикует изменившиеся листы, возвращает новую версию снимка."""
+
+    @abstractmethod
+    async def snapshot_version(self) -> int:
+        """Текущая версия опубликованного снимка (0 — снимков не было)."""
+
+    @abstractmethod
+    async def fetch_snapshot(self, since_version: int, known: Dict[str, str]) -> Optional[Snapshot]:
+        """Листы, отличающиеся от known (имя -> sha256), если версия новее since_version."""
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBackend(StateBackend):
+    """Состояние в памяти процесса (одна реплика)."""
+
+    def __init__(self, state: Optional[UserStateTable] = None, subscriptions: Optional[SubscriptionStore] = None):
+        self.state = state or UserStateTable(max_users=cfg.user_state_max, ttl=cfg.user_state_ttl)
+        self.subscriptions = subscriptions or SUBSCRIPTIONS
+
+    async def get_user_group(self, user_id: int) -> Optional[str]:
+        return await USER_GROUPS.get(user_id)
+
+    async def set_user_group(self, user_id: int, group: str) -> None:
+        await USER_GROUPS.set(user_id, group)
+
+    async def users_in_groups(self, groups: Iterable[str]) -> Dict[str, List[int]]:
+        return await USER_GROUPS.users_in_groups(groups)
+
+    async def take_token(self, user_id: int, name: str, rate: float, burst: float) -> bool:
+        now = time.monotonic()
+        return self.state.get(user_id, now).bucket(name, burst, now).take(rate, burst, now)
+
+    async def try_lock(self, user_id: int) -> Optional[object]:
+        lock = self.state.get(user_id).lock
+        if lock.locked():
+            return None
+        await lock.acquire()
+        return lock
+
+    async def unlock(self, user_id: int, token: object) -> None:
+        token.release()
+
+    async def acquire_leadership(self) -> bool:
+        return True
+
+    async def publish_snapshot(self, sheets: Dict[str, Tuple[str, bytes]]) -> int:
+        return 0
+
+    async def snapshot_version(self) -> int:
+        return 0
+
+    async def fetch_snapshot(self, since_version: int, known: Dict[str, str]) -> Optional[Snapshot]:
+        return None
+
+
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(b[1]) or burst
+local updated = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + (now - updated) * rate)
+local ok = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    ok = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], ttl)
+return ok
+"""
+
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_RENEW_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) and 1 or 0
+"""
+
+
+class RedisBackend(StateBackend):
+    """Общее состояние реплик в Redis (redis.asyncio)."""
+
+    shared = True
+
+    def __init__(
+            self,
+            url: str = "",
+            prefix: str = "kpfu:",
+            lock_ttl: float = 30.0,
+            leader_ttl: float = 60.0,
+            client=None,
+    ):
+        """client — готовый клиент redis.asyncio (например, fakeredis в тестах) вместо url."""
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url)
+
+        self.redis = client
+        self.prefix = prefix
+        self.lock_ttl_ms = int(lock_ttl * 1000)
+        self.leader_ttl_ms = int(leader_ttl * 1000)
+        self.replica_id = uuid.uuid4().hex
+        self._token_bucket = self.redis.register_script(_TOKEN_BUCKET_LUA)
+        self._release = self.redis.register_script(_RELEASE_LUA)
+        self._renew = self.redis.register_script(_RENEW_LUA)
+        self.subscriptions = RedisSubscriptionStore(self.redis, prefix)
+
+    def _key(self, *parts) -> str:
+        return self.prefix + ":".join(str(p) for p in parts)
+
+    async def get_user_group(self, user_id: int) -> Optional[str]:
+        value = await self.redis.hget(self._key("user_groups"), str(user_id))
+        return value.decode() if value else None
+
+    async def set_user_group(self, user_id: int, group: str) -> None:
+        await self.redis.hset(self._key("user_groups"), str(user_id), group)
+
+    async def users_in_groups(self, groups: Iterable[str]) -> Dict[str, List[int]]:
+        wanted = set(groups)
+        out: Dict[str, List[int]] = {}
+        async for user_id, group in self.redis.hscan_iter(self._key("user_groups"), count=1000):
+            group = group.decode()
+            if group in wanted:
+                out.setdefault(group, []).append(int(user_id))
+        return out
+
+    async def take_token(self, user_id: int, name: str, rate: float, burst: float) -> bool:
+        ttl_ms = int(burst / rate * 1000) + 1000
+        ok = await self._token_bucket(keys=[self._key("bucket", name, user_id)], args=[rate, burst, ttl_ms])
+        return bool(ok)
+
+    async def try_lock(self, user_id: int) -> Optional[object]:
+        token = uuid.uuid4().hex
+        ok = await self.redis.set(self._key("lock", user_id), token, nx=True, px=self.lock_ttl_ms)
+        return token if ok else None
+
+    async def unlock(self, user_id: int, token: object) -> None:
+        await self._release(keys=[self._key("lock", user_id)], args=[token])
+
+    async def acquire_leadership(self) -> bool:
+        ok = await self._renew(keys=[self._key("leader")], args=[self.replica_id, self.leader_ttl_ms])
+        return bool(ok)
+
+    async def publish_snapshot(self, sheets: Dict[str, Tuple[str, bytes]]) -> int:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for name, (sha, data) in sheets.items():
+                pipe.hset(self._key("snapshot", "sha"), name, sha)
+                pipe.hset(self._key("snapshot", "data"), name, data)
+            pipe.incr(self._key("snapshot", "version"))
+            results = await pipe.execute()
+        return int(results[-1])
+
+    async def snapshot_version(self) -> int:
+        return int(await self.redis.get(self._key("snapshot", "version")) or 0)
+
+    async def fetch_snapshot(self, since_version: int, known: Dict[str, str]) -> Optional[Snapshot]:
+        version = await self.snapshot_version()
+        if version <= since_version:
+            return None
+        shas = await self.redis.hgetall(self._key("snapshot", "sha"))
+        changed = {k.decode(): v.decode() for k, v in shas.items() if known.get(k.decode()) != v.decode()}
+        sheets: Dict[str, Tuple[str, bytes]] = {}
+        if changed:
+            names = list(changed)
+            blobs = await self.redis.hmget(self._key("snapshot", "data"), names)
+            for name, blob in zip(names, blobs):
+                if blob is not None:
+                    sheets[name] = (changed[name], blob)
+        return version, sheets
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+_BACKEND: Optional[StateBackend] = None
+
+
+def get_backend() -> StateBackend:
+    global _BACKEND
+    if _BACKEND is None:
+        _BACKEND = MemoryBackend()
+    return _BACKEND
+
+
+async def init_backend() -> StateBackend:
+    """Создаёт хранилище по STATE_BACKEND (memory или redis)."""
+    global _BACKEND
+    if cfg.state_backend == "redis":
+        _BACKEND = RedisBackend(cfg.redis_url, prefix=cfg.redis_prefix, leader_ttl=cfg.leader_ttl)
+        await _BACKEND.redis.ping()
+        logger.info("Общее состояние: Redis (%s), реплика %s", cfg.redis_url, _BACKEND.replica_id)
+    else:
+        _BACKEND = MemoryBackend()
+        logger.info("Общее состояние: память процесса")
+    return _BACKEND
+
+
+async def close_backend() -> None:
+    global _BACKEND
+    if _BACKEND is not None:
+        await _BACKEND.close()
+        _BACKEND = None
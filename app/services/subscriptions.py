@@ -0,0 +1,404 @@
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.services.config import cfg
+from app.services.executors import run_io
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 0
+SENT = 1
+RETRY = 2
+
+# Сколько раз за день пытаться доставить рассылку одному подписчику
+MAX_ATTEMPTS = 3
+
+
+class SubscriptionStore:
+    """Подписки на утреннее расписание и журнал рассылок в SQLite.
+
+    deliveries — прогресс рассылки (дата, время, пользователь). Запись
+    QUEUED создаётся до постановки сообщения в очередь, SENT — после
+    отправки, RETRY — после ошибки отправки. RETRY повторяются, пока не
+    исчерпан MAX_ATTEMPTS. QUEUED, оставшиеся от упавшего процесса,
+    повторяются при старте: сообщение могло уйти до падения, поэтому для
+    них доставка «хотя бы один раз», для остальных — ровно один.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS subscriptions ("
+                " user_id INTEGER PRIMARY KEY,"
+                " group_code TEXT NOT NULL,"
+                " send_at TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS subscriptions_send_at ON subscriptions (send_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS deliveries ("
+                " run_date TEXT NOT NULL,"
+                " send_at TEXT NOT NULL,"
+                " user_id INTEGER NOT NULL,"
+                " status INTEGER NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (run_date, send_at, user_id))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS subscription_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(deliveries)")}
+            if "attempts" not in columns:
+                conn.execute("ALTER TABLE deliveries ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def subscribe_sync(self, user_id: int, group_code: str, send_at: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO subscriptions (user_id, group_code, send_at, created_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET"
+                " group_code = excluded.group_code, send_at = excluded.send_at",
+                (user_id, group_code, send_at, time.time()),
+            )
+            conn.commit()
+
+    def set_group_sync(self, user_id: int, group_code: str) -> None:
+        """Пользователь выбрал другую группу — рассылка пойдёт по новой.
+
+        Вызывается на каждый запрос расписания, поэтому пишет в базу только
+        для подписчика, сменившего группу.
+        """
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT group_code FROM subscriptions WHERE user_id = ?", (user_id,)).fetchone()
+            if row is None or row[0] == group_code:
+                return
+            conn.execute("UPDATE subscriptions SET group_code = ? WHERE user_id = ?", (group_code, user_id))
+            conn.commit()
+
+    def unsubscribe_sync(self, user_id: int) -> bool:
+        with self._lock:
+            conn = self._connect()
+            cur = conn.execute("DELETE FROM subscriptions WHERE user_id = ?", (user_id,))
+            conn.commit()
+        return cur.rowcount > 0
+
+    def get_sync(self, user_id: int) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT group_code, send_at FROM subscriptions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def due_times_sync(self, after: str, upto: str) -> List[str]:
+        """Времена рассылок в полуинтервале (after, upto]; строки "HH:MM"."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT DISTINCT send_at FROM subscriptions WHERE send_at > ? AND send_at <= ? ORDER BY send_at",
+                (after, upto),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def started_runs_sync(self, run_date: str, upto: str) -> List[str]:
+        """Рассылки за день, которые уже начинались (для продолжения после рестарта)."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT DISTINCT send_at FROM deliveries WHERE run_date = ? AND send_at <= ? ORDER BY send_at",
+                (run_date, upto),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def retry_runs_sync(self, run_date: str, upto: str) -> List[str]:
+        """Рассылки за день с неудачными отправками, у которых ещё остались попытки."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT DISTINCT send_at FROM deliveries WHERE run_date = ? AND send_at <= ?"
+                " AND status = ? AND attempts < ? ORDER BY send_at",
+                (run_date, upto, RETRY, MAX_ATTEMPTS),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def pending_sync(self, run_date: str, send_at: str, resend: Tuple[int, ...] = ()) -> Dict[str, List[int]]:
+        """Подписчики рассылки без записи в журнале, сгруппированные по группе.
+
+        resend — статусы записей, которые тоже нужно отправить заново
+        (пока не исчерпан MAX_ATTEMPTS).
+        """
+        marks = ",".join("?" * len(resend)) or "NULL"
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT s.group_code, s.user_id FROM subscriptions s"
+                " LEFT JOIN deliveries d ON d.run_date = ? AND d.send_at = s.send_at AND d.user_id = s.user_id"
+                f" WHERE s.send_at = ? AND (d.user_id IS NULL OR (d.status IN ({marks}) AND d.attempts < ?))"
+                " ORDER BY s.group_code, s.user_id",
+                (run_date, send_at, *resend, MAX_ATTEMPTS),
+            ).fetchall()
+        out: Dict[str, List[int]] = {}
+        for group_code, user_id in rows:
+            out.setdefault(group_code, []).append(user_id)
+        return out
+
+    def mark_sync(self, run_date: str, send_at: str, user_ids: List[int], status: int) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            # Каждая постановка в очередь (QUEUED) — ещё одна попытка
+            conn.executemany(
+                "INSERT INTO deliveries (run_date, send_at, user_id, status, updated_at, attempts)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(run_date, send_at, user_id) DO UPDATE SET"
+                " status = excluded.status, updated_at = excluded.updated_at,"
+                " attempts = deliveries.attempts + excluded.attempts",
+                [(run_date, send_at, uid, status, now, int(status == QUEUED)) for uid in user_ids],
+            )
+            conn.commit()
+
+    def release_sync(self, run_date: str, send_at: str, user_ids: List[int]) -> None:
+        """Неотправленные помечаются RETRY — subscription_task повторит их в следующую минуту."""
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "UPDATE deliveries SET status = ?, updated_at = ?"
+                " WHERE run_date = ? AND send_at = ? AND user_id = ? AND status = ?",
+                [(RETRY, time.time(), run_date, send_at, uid, QUEUED) for uid in user_ids],
+            )
+            conn.commit()
+
+    def last_run_sync(self) -> Optional[str]:
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM subscription_state WHERE key = 'last_run'").fetchone()
+        return row[0] if row else None
+
+    def set_last_run_sync(self, marker: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO subscription_state (key, value) VALUES ('last_run', ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (marker,),
+            )
+            conn.commit()
+
+    def prune_sync(self, before_date: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM deliveries WHERE run_date < ?", (before_date,))
+            conn.commit()
+
+    async def subscribe(self, user_id: int, group_code: str, send_at: str) -> None:
+        await run_io(self.subscribe_sync, user_id, group_code, send_at)
+
+    async def set_group(self, user_id: int, group_code: str) -> None:
+        await run_io(self.set_group_sync, user_id, group_code)
+
+    async def unsubscribe(self, user_id: int) -> bool:
+        return await run_io(self.unsubscribe_sync, user_id)
+
+    async def get(self, user_id: int) -> Optional[Tuple[str, str]]:
+        return await run_io(self.get_sync, user_id)
+
+    async def due_times(self, after: str, upto: str) -> List[str]:
+        return await run_io(self.due_times_sync, after, upto)
+
+    async def started_runs(self, run_date: str, upto: str) -> List[str]:
+        return await run_io(self.started_runs_sync, run_date, upto)
+
+    async def retry_runs(self, run_date: str, upto: str) -> List[str]:
+        return await run_io(self.retry_runs_sync, run_date, upto)
+
+    async def pending(self, run_date: str, send_at: str, resend: Tuple[int, ...] = ()) -> Dict[str, List[int]]:
+        return await run_io(self.pending_sync, run_date, send_at, resend)
+
+    async def mark(self, run_date: str, send_at: str, user_ids: List[int], status: int) -> None:
+        if user_ids:
+            await run_io(self.mark_sync, run_date, send_at, user_ids, status)
+
+    async def release(self, run_date: str, send_at: str, user_ids: List[int]) -> None:
+        if user_ids:
+            await run_io(self.release_sync, run_date, send_at, user_ids)
+
+    async def last_run(self) -> Optional[str]:
+        """Отметка «YYYY-MM-DD HH:MM» последней обработанной минуты рассылки."""
+        return await run_io(self.last_run_sync)
+
+    async def set_last_run(self, marker: str) -> None:
+        await run_io(self.set_last_run_sync, marker)
+
+    async def prune(self, before_date: str) -> None:
+        await run_io(self.prune_sync, before_date)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class RedisSubscriptionStore:
+    """Подписки и журнал рассылок в Redis — общие для всех реплик.
+
+    Тот же интерфейс, что у SubscriptionStore. Ключи (после prefix):
+    subs — user_id -> "группа|время"; subs:at:<время> — подписчики
+    времени; subs:times — времена с подписчиками; subs:last — отметка
+    последней обработанной минуты; subs:deliv:<дата>:<время> — user_id ->
+    "статус:попытки"; subs:runs:<дата> — начатые за день рассылки.
+    Журнал пишет только лидер, записи живут DELIVERY_TTL.
+    """
+
+    DELIVERY_TTL = 3 * 86_400
+
+    def __init__(self, redis, prefix: str = "kpfu:"):
+        self.redis = redis
+        self.prefix = prefix
+
+    def _key(self, *parts) -> str:
+        return self.prefix + ":".join(str(p) for p in parts)
+
+    async def subscribe(self, user_id: int, group_code: str, send_at: str) -> None:
+        old = await self.get(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if old is not None and old[1] != send_at:
+                pipe.srem(self._key("subs", "at", old[1]), user_id)
+            pipe.hset(self._key("subs"), str(user_id), f"{group_code}|{send_at}")
+            pipe.sadd(self._key("subs", "at", send_at), user_id)
+            pipe.sadd(self._key("subs", "times"), send_at)
+            await pipe.execute()
+
+    async def set_group(self, user_id: int, group_code: str) -> None:
+        """Пользователь выбрал другую группу — рассылка пойдёт по новой."""
+        current = await self.get(user_id)
+        if current is not None and current[0] != group_code:
+            await self.redis.hset(self._key("subs"), str(user_id), f"{group_code}|{current[1]}")
+
+    async def unsubscribe(self, user_id: int) -> bool:
+        current = await self.get(user_id)
+        if current is None:
+            return False
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(self._key("subs"), str(user_id))
+            pipe.srem(self._key("subs", "at", current[1]), user_id)
+            pipe.scard(self._key("subs", "at", current[1]))
+            left = (await pipe.execute())[-1]
+        if not left:
+            await self.redis.srem(self._key("subs", "times"), current[1])
+        return True
+
+    async def get(self, user_id: int) -> Optional[Tuple[str, str]]:
+        value = await self.redis.hget(self._key("subs"), str(user_id))
+        if not value:
+            return None
+        group_code, send_at = value.decode().rsplit("|", 1)
+        return group_code, send_at
+
+    async def due_times(self, after: str, upto: str) -> List[str]:
+        times = (t.decode() for t in await self.redis.smembers(self._key("subs", "times")))
+        return sorted(t for t in times if after < t <= upto)
+
+    async def started_runs(self, run_date: str, upto: str) -> List[str]:
+        runs = (t.decode() for t in await self.redis.smembers(self._key("subs", "runs", run_date)))
+        return sorted(t for t in runs if t <= upto)
+
+    async def _journal(self, run_date: str, send_at: str) -> Dict[int, Tuple[int, int]]:
+        raw = await self.redis.hgetall(self._key("subs", "deliv", run_date, send_at))
+        out = {}
+        for user_id, value in raw.items():
+            status, attempts = value.decode().split(":")
+            out[int(user_id)] = (int(status), int(attempts))
+        return out
+
+    async def retry_runs(self, run_date: str, upto: str) -> List[str]:
+        out = []
+        for send_at in await self.started_runs(run_date, upto):
+            journal = await self._journal(run_date, send_at)
+            if any(st == RETRY and n < MAX_ATTEMPTS for st, n in journal.values()):
+                out.append(send_at)
+        return out
+
+    async def pending(self, run_date: str, send_at: str, resend: Tuple[int, ...] = ()) -> Dict[str, List[int]]:
+        user_ids = sorted(int(u) for u in await self.redis.smembers(self._key("subs", "at", send_at)))
+        if not user_ids:
+            return {}
+        values = await self.redis.hmget(self._key("subs"), [str(u) for u in user_ids])
+        journal = await self._journal(run_date, send_at)
+        rows = []
+        for user_id, value in zip(user_ids, values):
+            if not value:
+                continue
+            group_code, at = value.decode().rsplit("|", 1)
+            if at != send_at:
+                continue
+            entry = journal.get(user_id)
+            if entry is None or (entry[0] in resend and entry[1] < MAX_ATTEMPTS):
+                rows.append((group_code, user_id))
+        out: Dict[str, List[int]] = {}
+        for group_code, user_id in sorted(rows):
+            out.setdefault(group_code, []).append(user_id)
+        return out
+
+    async def _update(self, run_date: str, send_at: str, user_ids: List[int], change) -> None:
+        key = self._key("subs", "deliv", run_date, send_at)
+        current = await self.redis.hmget(key, [str(u) for u in user_ids])
+        mapping = {}
+        for user_id, value in zip(user_ids, current):
+            entry = tuple(int(x) for x in value.decode().split(":")) if value else None
+            new = change(entry)
+            if new is not None:
+                mapping[str(user_id)] = f"{new[0]}:{new[1]}"
+        if not mapping:
+            return
+        runs = self._key("subs", "runs", run_date)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=mapping)
+            pipe.sadd(runs, send_at)
+            pipe.expire(key, self.DELIVERY_TTL)
+            pipe.expire(runs, self.DELIVERY_TTL)
+            await pipe.execute()
+
+    async def mark(self, run_date: str, send_at: str, user_ids: List[int], status: int) -> None:
+        if user_ids:
+            # Каждая постановка в очередь (QUEUED) — ещё одна попытка
+            await self._update(
+                run_date, send_at, user_ids,
+                lambda entry: (status, (entry[1] if entry else 0) + int(status == QUEUED)),
+            )
+
+    async def release(self, run_date: str, send_at: str, user_ids: List[int]) -> None:
+        if user_ids:
+            await self._update(
+                run_date, send_at, user_ids,
+                lambda entry: (RETRY, entry[1]) if entry and entry[0] == QUEUED else None,
+            )
+
+    async def last_run(self) -> Optional[str]:
+        value = await self.redis.get(self._key("subs", "last"))
+        return value.decode() if value else None
+
+    async def set_last_run(self, marker: str) -> None:
+        await self.redis.set(self._key("subs", "last"), marker)
+
+    async def prune(self, before_date: str) -> None:
+        # Журнал удаляет сам Redis по DELIVERY_TTL
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+SUBSCRIPTIONS = SubscriptionStore(cfg.users_db)
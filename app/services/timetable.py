@@ -0,0 +1,141 @@
+"""Расписание группы, заранее разложенное по дням и чётности недели.
+
+DayTable строится один раз при публикации данных: на каждый день три
+готовых вида (верхняя неделя, нижняя, все занятия), внутри вида занятия
+отсортированы по времени начала. «Сегодня», «завтра» и недельные виды —
+выборка готового кортежа без просмотра всех занятий группы.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.services.config import cfg
+from app.services.lessons import Lesson
+
+DAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье"]
+DAY_INDEX = {d.lower(): i for i, d in enumerate(DAYS)}
+
+UPPER = "в"
+LOWER = "н"
+
+# Звонки: начала пар и длительность пары в минутах
+SLOT_STARTS = ("08:30", "10:10", "11:50", "13:35", "15:15", "16:55", "18:35", "20:15")
+PAIR_MINUTES = 90
+
+# Слова запроса для дня: относительные и названия дней недели с сокращениями
+RELATIVE_DAYS = {"сегодня": 0, "завтра": 1, "послезавтра": 2}
+WEEKDAY_WORDS = {
+    "пн": 0, "понедельник": 0, "вт": 1, "вторник": 1, "ср": 2, "среда": 2,
+    "чт": 3, "четверг": 3, "пт": 4, "пятница": 4, "сб": 5, "суббота": 5, "вс": 6, "воскресенье": 6,
+}
+
+
+def time_to_minutes(time_str: str | float | None) -> int:
+    if not time_str or not isinstance(time_str, str):
+        time_str = str(time_str or "").strip()
+    if not time_str or time_str.lower() in ("nan", "none", ""):
+        return 0
+    try:
+        hours, minutes = map(int, time_str.split(":"))
+        return hours * 60 + minutes
+    except (ValueError, AttributeError):
+        return 0
+
+
+_SLOT_MINUTES = tuple(time_to_minutes(t) for t in SLOT_STARTS)
+
+
+def lesson_slots(time_str: str) -> List[int]:
+    """Номера пар, которые пересекает занятие, начинающееся в time_str."""
+    start = time_to_minutes(time_str)
+    if not start:
+        return []
+    end = start + PAIR_MINUTES
+    return [i for i, s in enumerate(_SLOT_MINUTES) if s < end and start < s + PAIR_MINUTES]
+
+
+def slot_at(minutes: int) -> Optional[int]:
+    """Пара, идущая в момент minutes, а на перемене — следующая; None — пары закончились."""
+    for i, s in enumerate(_SLOT_MINUTES):
+        if minutes < s + PAIR_MINUTES:
+            return i
+    return None
+
+
+def resolve_day(word: str, today: date) -> Optional[date]:
+    """Дата по слову запроса: «сегодня», «завтра», «пт» — ближайшая пятница начиная с today."""
+    word = word.strip().lower()
+    if word in RELATIVE_DAYS:
+        return today + timedelta(days=RELATIVE_DAYS[word])
+    if word in WEEKDAY_WORDS:
+        return today + timedelta(days=(WEEKDAY_WORDS[word] - today.weekday()) % 7)
+    return None
+
+
+def norm_week(x: str) -> str:
+    x = (x or "").strip().lower()
+    return UPPER if x.startswith("в") else (LOWER if x.startswith("н") else x)
+
+
+def week_type(target_date: Optional[date] = None, start_date: Optional[date] = None) -> str:
+    """Чётность недели: "в" для чётного числа недель от начала семестра, иначе "н"."""
+    d = target_date or date.today()
+    weeks_passed = (d - (start_date or cfg.semester_start)).days // 7
+    return UPPER if weeks_passed % 2 == 0 else LOWER
+
+
+def seconds_until_next_refresh(now: Optional[datetime] = None) -> float:
+    """Секунды до ближайшего времени из REFRESH_AT (в часовом поясе cfg.tz)."""
+    tz = ZoneInfo(cfg.tz)
+    now = now or datetime.now(tz)
+    targets = []
+    for hhmm in cfg.refresh_at:
+        h, m = map(int, hhmm.split(":"))
+        targets.append(datetime.combine(now.date(), time(h, m), tzinfo=tz))
+        targets.append(datetime.combine(now.date() + timedelta(days=1), time(h, m), tzinfo=tz))
+    future = min(t for t in targets if t > now)
+    return (future - now).total_seconds()
+
+
+def seconds_until_midnight(now: Optional[datetime] = None) -> float:
+    now = now or datetime.now(ZoneInfo(cfg.tz))
+    midnight = datetime.combine(now.date() + timedelta(days=1), time(0, 0), tzinfo=now.tzinfo)
+    return (midnight - now).total_seconds()
+
+
+def _sorted(lessons: Iterable[Lesson]) -> Tuple[Lesson, ...]:
+    return tuple(sorted(lessons, key=lambda l: time_to_minutes(l.time)))
+
+
+def _day_views(lessons: Tuple[Lesson, ...]) -> Dict[Optional[str], Tuple[Lesson, ...]]:
+    views: Dict[Optional[str], Tuple[Lesson, ...]] = {None: lessons}
+    for wt in (UPPER, LOWER):
+        view = tuple(l for l in lessons if not l.week_type or norm_week(l.week_type) == wt)
+        # День без деления на недели — один кортеж на все три вида
+        views[wt] = lessons if len(view) == len(lessons) else view
+    return views
+
+
+class DayTable:
+    """Занятия группы по дням: готовые виды для выдачи, отсортированные по времени."""
+
+    __slots__ = ("_views",)
+
+    def __init__(self, lessons: Iterable[Lesson]):
+        by_day: List[List[Lesson]] = [[] for _ in DAYS]
+        for lesson in lessons:
+            i = DAY_INDEX.get(lesson.day.strip().lower())
+            if i is not None:
+                by_day[i].append(lesson)
+
+        # Вид "в"/"н" — занятия этой недели и без указания недели; None — все занятия дня
+        self._views: Tuple[Dict[Optional[str], Tuple[Lesson, ...]], ...] = tuple(
+            _day_views(_sorted(day)) for day in by_day
+        )
+
+    def day(self, day_name: str, wt: Optional[str] = None) -> Tuple[Lesson, ...]:
+        """Занятия дня; wt="в"/"н" — с фильтром по чётности, None — все."""
+        i = DAY_INDEX.get(day_name.strip().lower())
+        if i is None:
+            return ()
+        return self._views[i][wt]
@@ -0,0 +1,103 @@
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from app.services.config import cfg
+from app.services.executors import run_io
+
+logger = logging.getLogger(__name__)
+
+
+class UserGroupStore:
+    """Выбранная пользователем группа в локальном SQLite-файле.
+
+    Переживает перезапуск: после рестарта пользователю не нужно заново
+    вводить номер группы. Обращения к БД выполняются в пуле потоков.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_groups ("
+                " user_id INTEGER PRIMARY KEY,"
+                " group_code TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get_sync(self, user_id: int) -> Optional[str]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT group_code FROM user_groups WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_sync(self, user_id: int, group_code: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO user_groups (user_id, group_code, updated_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET"
+                " group_code = excluded.group_code, updated_at = excluded.updated_at",
+                (user_id, group_code, time.time()),
+            )
+            conn.commit()
+
+    def users_in_groups_sync(self, groups: List[str]) -> Dict[str, List[int]]:
+        out: Dict[str, List[int]] = {}
+        with self._lock:
+            conn = self._connect()
+            # Порциями: у SQLite ограничено число параметров запроса
+            for i in range(0, len(groups), 500):
+                chunk = groups[i:i + 500]
+                rows = conn.execute(
+                    "SELECT group_code, user_id FROM user_groups WHERE group_code IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    chunk,
+                ).fetchall()
+                for group_code, user_id in rows:
+                    out.setdefault(group_code, []).append(user_id)
+        return out
+
+    async def users_in_groups(self, groups: Iterable[str]) -> Dict[str, List[int]]:
+        try:
+            return await run_io(self.users_in_groups_sync, list(groups))
+        except sqlite3.Error as e:
+            logger.error("Ошибка выборки пользователей групп: %s", e)
+            return {}
+
+    async def get(self, user_id: int) -> Optional[str]:
+        try:
+            return await run_io(self.get_sync, user_id)
+        except sqlite3.Error as e:
+            logger.error("Ошибка чтения группы пользователя %s: %s", user_id, e)
+            return None
+
+    async def set(self, user_id: int, group_code: str) -> None:
+        try:
+            await run_io(self.set_sync, user_id, group_code)
+        except sqlite3.Error as e:
+            logger.error("Ошибка сохранения группы пользователя %s: %s", user_id, e)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+USER_GROUPS = UserGroupStore(cfg.users_db)
@@ -0,0 +1,139 @@
+import asyncio
+import hmac
+import logging
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from app.services import csv_cache, schedule_store
+from app.services.config import cfg
+from app.services.metrics import metrics_handler
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+async def health_check(request: web.Request) -> web.Response:
+    """Liveness: процесс жив и цикл событий отвечает."""
+    return web.Response(text="OK")
+
+
+async def ready_check(request: web.Request) -> web.Response:
+    """Readiness: расписание загружено. В ответе — возраст данных по каждому GID.
+
+    503, пока ScheduleStore пуст (холодный старт без листов на диске).
+    """
+    store = schedule_store.get_store()
+    max_age = cfg.sheet_max_age_hours * 3600
+    sheets = {
+        str(gid): {"age_sec": None if age is None else round(age), "stale": age is None or age > max_age}
+        for gid, age in csv_cache.sheet_ages().items()
+    }
+    ready = len(store) > 0
+    body = {"ready": ready, "version": store.version, "groups": len(store), "sheets": sheets}
+    return web.json_response(body, status=200 if ready else 503)
+
+
+def create_app() -> web.Application:
+    """Общее aiohttp-приложение: /health, /ready, /metrics, webhook и будущие эндпоинты."""
+    app = web.Application()
+    app.router.add_get("/health", health_check)
+    app.router.add_get("/ready", ready_check)
+    app.router.add_get("/metrics", metrics_handler)
+    return app
+
+
+async def start_app(app: web.Application, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info("HTTP-сервер слушает %s:%d", host, port)
+    return runner
+
+
+class WebhookProcessor:
+    """Приём обновлений Telegram через webhook.
+
+    Обработчик запроса только проверяет секрет, разбирает JSON и кладёт
+    Update в ограниченную очередь, сразу отвечая 200. Обработку ведут
+    workers задач в том же цикле событий. Если очередь переполнена или
+    началась остановка, отвечаем 503 — Telegram повторит доставку позже
+    (уже подтверждённое 200 обновление он повторять не будет).
+    """
+
+    def __init__(
+            self,
+            dp: Dispatcher,
+            bot: Bot,
+            secret: str = "",
+            workers: int = 16,
+            queue_size: int = 1000,
+    ):
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    def register(self, app: web.Application, path: str) -> None:
+        app.router.add_post(path, self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret:
+            got = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(got, self.secret):
+                return web.Response(status=401)
+        if self._stopping:
+            return web.Response(status=503)
+
+        try:
+            data = await request.json()
+            update = Update.model_validate(data, context={"bot": self.bot})
+        except Exception as e:
+            logger.warning("Некорректное обновление webhook: %s", e)
+            return web.Response(status=400)
+
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            logger.warning("Очередь webhook переполнена, update_id=%s отклонён", update.update_id)
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _worker(self) -> None:
+        while True:
+            update = await self._queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.exception("Ошибка обработки update_id=%s: %s", update.update_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        await self.bot.set_webhook(
+            url=cfg.webhook_url.rstrip("/") + cfg.webhook_path,
+            secret_token=self.secret or None,
+            max_connections=cfg.webhook_max_connections,
+            allowed_updates=self.dp.resolve_used_update_types(),
+        )
+        logger.info("Webhook установлен: %s%s", cfg.webhook_url.rstrip("/"), cfg.webhook_path)
+
+    async def stop(self, timeout: Optional[float] = 10.0) -> None:
+        # Новые обновления больше не подтверждаем: их не успеем обработать
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Не дождались обработки %d обновлений", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,85 @@
+"""Память и скорость: словари занятий против Lesson и LessonColumns.
+
+Запуск: python -m benchmarks.bench_lessons [--sheets 6] [--groups 40]
+"""
+import argparse
+import pickle
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from app.handlers.schedule_buttons import format_day_schedule
+from app.services.lessons import Lesson, LessonColumns
+from app.services.parser import parse_sheet
+from benchmarks.kpfu_sheet import generate_sheet, group_codes
+
+
+def _unshared(s: str) -> str:
+    # Отдельный объект строки на каждую ячейку — как в прежних словарях из парсера
+    return (s + ".")[:-1]
+
+
+def _as_dicts(groups: Dict[str, List[Lesson]]) -> Dict[str, List[dict]]:
+    return {
+        g: [{k: _unshared(v) for k, v in zip(Lesson._fields, les)} for les in lessons]
+        for g, lessons in groups.items()
+    }
+
+
+def _traced(build: Callable[[], object]):
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def _per_call(fn: Callable[[], object], number: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - t0) / number
+
+
+def run(sheets: int, groups_per_sheet: int) -> None:
+    codes = group_codes(sheets * groups_per_sheet)
+    texts = [
+        generate_sheet(codes[i * groups_per_sheet:(i + 1) * groups_per_sheet], seed=i)
+        for i in range(sheets)
+    ]
+    parsed = {}
+    for text in texts:
+        parsed.update(parse_sheet(text, engine="csv"))
+    n = sum(len(v) for v in parsed.values())
+    print(f"{len(parsed)} групп, {n} занятий")
+
+    dicts, dict_bytes = _traced(lambda: _as_dicts(parsed))
+    lessons, lesson_bytes = _traced(lambda: {g: [Lesson.from_dict(d) for d in v] for g, v in dicts.items()})
+    columns, column_bytes = _traced(lambda: LessonColumns.from_groups(lessons))
+    print(f"dict:          {dict_bytes / 1e6:7.2f} MB  pickle {len(pickle.dumps(dicts)) / 1e3:8.0f} KB")
+    print(f"Lesson:        {lesson_bytes / 1e6:7.2f} MB  pickle {len(pickle.dumps(lessons)) / 1e3:8.0f} KB")
+    print(f"LessonColumns: {column_bytes / 1e6:7.2f} MB  pickle {len(pickle.dumps(columns)) / 1e3:8.0f} KB")
+
+    group = next(iter(lessons))
+    old = dicts[group]
+    new = lessons[group]
+
+    def old_filter():
+        return [l for l in old if l.get("day", "").strip().lower() == "среда"]
+
+    print(f"filter dict:   {_per_call(old_filter, 20000) * 1e6:7.2f} µs")
+    def new_filter(day_name="среда"):
+        return [l for l in new if l.day.strip().lower() == day_name]
+
+    print(f"filter Lesson: {_per_call(new_filter, 20000) * 1e6:7.2f} µs")
+    day = new_filter("понедельник")
+    print(f"format Lesson: {_per_call(lambda: format_day_schedule(day, 'Понедельник'), 5000) * 1e6:7.2f} µs")
+    print(f"columns -> Lesson (все группы): {_per_call(columns.to_groups, 5) * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Сравнение представлений занятий")
+    ap.add_argument("--sheets", type=int, default=6)
+    ap.add_argument("--groups", type=int, default=40, help="групп на лист")
+    args = ap.parse_args()
+    run(args.sheets, args.groups)
@@ -0,0 +1,37 @@
+"""Микробенчмарк стоимости инструментирования одного обновления.
+
+Одно обновление на горячем пути: таймер обработчика (Histogram.time),
+счётчик кэша и, при промахе, таймер format_day_schedule.
+
+Запуск: python -m benchmarks.bench_metrics
+"""
+import timeit
+
+from app.services import metrics
+
+
+def _update():
+    with metrics.HANDLER_SECONDS.labels("today").time():
+        metrics.USER_CACHE_HIT.inc()
+        metrics.RENDER_HIT.inc()
+
+
+def _update_prebound(timer=metrics.HANDLER_SECONDS.labels("today")):
+    with timer.time():
+        metrics.USER_CACHE_HIT.inc()
+        metrics.RENDER_HIT.inc()
+
+
+def _baseline():
+    pass
+
+
+def run(number: int = 200_000) -> None:
+    base = min(timeit.repeat(_baseline, number=number, repeat=5)) / number
+    for name, fn in (("labels() на каждый вызов", _update), ("заранее связанная метка", _update_prebound)):
+        t = min(timeit.repeat(fn, number=number, repeat=5)) / number
+        print(f"{name:<28} {(t - base) * 1e9:8.0f} ns/обновление")
+
+
+if __name__ == "__main__":
+    run()
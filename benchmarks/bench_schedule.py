@@ -0,0 +1,186 @@
+"""Бенчмарки разбора и отрисовки расписания на синтетических листах.
+
+Запуск:
+    python -m benchmarks.bench_schedule [--groups 40] [--sheets 6] [--out results.json]
+    python -m benchmarks.bench_schedule --compare old.json new.json
+
+Результаты (секунды на вызов: min/median/mean) сохраняются в JSON вместе с
+коммитом и параметрами, чтобы сравнивать прогоны между коммитами.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+_TMP = Path(tempfile.mkdtemp(prefix="kpfu-bench-"))
+# До импорта app: cfg читает окружение при импорте
+os.environ.setdefault("CACHE_DIR", str(_TMP / "csv"))
+os.environ.setdefault("USERS_DB", str(_TMP / "users.sqlite3"))
+os.environ.setdefault("CPU_WORKERS", "0")
+
+from app.handlers import schedule, schedule_buttons  # noqa: E402
+from app.services import csv_cache, schedule_store  # noqa: E402
+from app.services.lessons import Lesson  # noqa: E402
+from app.services.parser import parse_schedule, parse_sheet  # noqa: E402
+from app.services.timetable import norm_week  # noqa: E402
+from benchmarks.kpfu_sheet import write_sheets  # noqa: E402
+
+
+def _measure(fn: Callable[[], object], repeat: int, number: int) -> Dict[str, float]:
+    fn()  # прогрев
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def _filter_day(lessons: List[Lesson], day_name: str) -> List[Lesson]:
+    # Прежний путь до DayTable: проход по всем занятиям группы
+    target_day = day_name.strip().lower()
+    return [lesson for lesson in lessons if lesson.day.strip().lower() == target_day]
+
+
+def _filter_week(lessons: List[Lesson], target_date: date) -> List[Lesson]:
+    wt = schedule_buttons.get_current_week_type(target_date=target_date)
+    return [l for l in lessons if not l.week_type or norm_week(l.week_type) == wt]
+
+
+class _FakeMessage:
+    """Минимальная замена aiogram Message для cmd_schedule: ответы никуда не уходят."""
+
+    def __init__(self, text: str, user_id: int):
+        self.text = text
+        self.from_user = SimpleNamespace(id=user_id)
+        self.chat = SimpleNamespace(id=user_id)
+        self.sent: List[str] = []
+
+    async def answer(self, text: str, **kwargs):
+        self.sent.append(text)
+        return self
+
+    async def edit_text(self, text: str, **kwargs):
+        self.sent.append(text)
+        return self
+
+    async def delete(self):
+        return True
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(sheets: int, groups: int, rows: int, messy: float, repeat: int) -> Dict:
+    paths = write_sheets(Path(os.environ["CACHE_DIR"]), sheets, groups, rows, messy)
+    sheet_text = paths[0].read_text(encoding="utf-8")
+    group = next(iter(parse_sheet(sheet_text, engine="csv")))
+
+    loop = asyncio.new_event_loop()
+    results: Dict[str, Dict[str, float]] = {}
+
+    def bench(name: str, fn: Callable[[], object], number: int = 1) -> None:
+        results[name] = _measure(fn, repeat, number)
+        print(f"{name:<32} {results[name]['median'] * 1e3:10.3f} ms")
+
+    bench("parse_schedule[pandas]", lambda: parse_schedule(sheet_text, group))
+    bench("parse_sheet[pandas]", lambda: parse_sheet(sheet_text, engine="pandas"))
+    bench("parse_sheet[csv]", lambda: parse_sheet(sheet_text, engine="csv"))
+    names = [p.name for p in paths]
+    bench("build_group_index", lambda: loop.run_until_complete(csv_cache._update_group_index(names)))
+
+    loop.run_until_complete(csv_cache._rebuild_store())
+    lessons = schedule_store.get_store().get(group)
+    day_lessons = _filter_day(lessons, "Понедельник")
+    target = date.today()
+
+    bench("filter_lessons_by_day", lambda: _filter_day(lessons, "Среда"), 1000)
+    bench("filter_by_week", lambda: _filter_week(lessons, target), 1000)
+    table = schedule_store.get_store().table(group)
+    bench("day_table[day, week]", lambda: table.day("Среда", "в"), 1000)
+    bench("format_day_schedule", lambda: schedule_buttons.format_day_schedule(day_lessons, "Понедельник"), 1000)
+    bench(
+        "format_day_schedule[week]",
+        lambda: schedule_buttons.format_day_schedule(day_lessons, "Понедельник", show_week_per_lesson=True),
+        1000,
+    )
+
+    codes = list(csv_cache.GROUP_INDEX)
+
+    def cmd_schedule() -> None:
+        for i, code in enumerate(codes[:50]):
+            loop.run_until_complete(schedule.cmd_schedule(_FakeMessage(code, user_id=i)))
+
+    bench("cmd_schedule x50", cmd_schedule)
+    loop.close()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "params": {"sheets": sheets, "groups": groups, "rows": rows, "messy": messy, "repeat": repeat},
+            "sheet_bytes": len(sheet_text.encode("utf-8")),
+        },
+        "results": results,
+    }
+
+
+def compare(old_path: Path, new_path: Path) -> None:
+    old = json.loads(old_path.read_text(encoding="utf-8"))
+    new = json.loads(new_path.read_text(encoding="utf-8"))
+    print(f"{'benchmark':<32} {old['meta']['commit'] or 'old':>10} {new['meta']['commit'] or 'new':>10}   ratio")
+    for name, res in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            print(f"{name:<32} {'—':>10} {res['median'] * 1e3:10.3f}")
+            continue
+        ratio = res["median"] / before["median"] if before["median"] else float("inf")
+        print(f"{name:<32} {before['median'] * 1e3:10.3f} {res['median'] * 1e3:10.3f}   {ratio:5.2f}x")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Бенчмарки разбора и отрисовки расписания")
+    ap.add_argument("--sheets", type=int, default=6)
+    ap.add_argument("--groups", type=int, default=40, help="групп на лист")
+    ap.add_argument("--rows", type=int, default=8, help="строк на день")
+    ap.add_argument("--messy", type=float, default=0.1)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out", type=Path, help="куда сохранить JSON с результатами")
+    ap.add_argument("--compare", type=Path, nargs=2, metavar=("OLD", "NEW"))
+    args = ap.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args.sheets, args.groups, args.rows, args.messy, args.repeat)
+    if args.out:
+        args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Результаты: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
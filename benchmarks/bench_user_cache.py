@@ -0,0 +1,88 @@
+"""Память USER_SCHEDULE_CACHE: копия расписания на пользователя против кода группы.
+
+«До» — как было раньше: в кэше на каждого пользователя (группа, список
+занятий-словарей), разобранный отдельно для него. «После» — в кэше только
+код группы, занятия один раз лежат в общем ScheduleStore.
+
+Запуск: python -m benchmarks.bench_user_cache [--users 50000] [--groups 300]
+"""
+import argparse
+import asyncio
+import gc
+import tracemalloc
+from typing import Dict, List
+
+from aiocache import Cache
+
+from app.services import schedule_store
+from app.services.lessons import Lesson
+from app.services.parser import parse_sheet
+from benchmarks.kpfu_sheet import generate_sheet, group_codes
+
+GROUPS_PER_SHEET = 50
+
+
+def _lessons(n_groups: int) -> Dict[str, List[Lesson]]:
+    groups: Dict[str, List[Lesson]] = {}
+    codes = group_codes(n_groups)
+    for i in range(0, n_groups, GROUPS_PER_SHEET):
+        text = generate_sheet(codes[i:i + GROUPS_PER_SHEET], rows_per_day=8, fill=0.8, seed=i)
+        groups.update(parse_sheet(text, engine="csv"))
+    return groups
+
+
+def _copy(value: str) -> str:
+    # Новый объект строки, как после отдельного разбора CSV для пользователя
+    return value.encode("utf-8").decode("utf-8")
+
+
+def _as_dicts(lessons: List[Lesson]) -> List[Dict[str, str]]:
+    return [{k: _copy(v) for k, v in lesson._asdict().items()} for lesson in lessons]
+
+
+async def _measure(fill) -> float:
+    gc.collect()
+    tracemalloc.start()
+    cache = Cache(Cache.MEMORY, ttl=259_200)
+    await fill(cache)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await cache.clear()
+    return current / 1e6
+
+
+async def run(n_users: int, n_groups: int) -> None:
+    groups = _lessons(n_groups)
+    codes = sorted(groups)
+    per_group = sum(len(v) for v in groups.values()) / len(groups)
+    print(f"{n_users} пользователей, {len(groups)} групп, в среднем {per_group:.0f} занятий на группу")
+
+    async def before(cache):
+        for user_id in range(n_users):
+            group = codes[user_id % len(codes)]
+            await cache.set(f"schedule:{user_id}", (group, _as_dicts(groups[group])))
+
+    async def after(cache):
+        schedule_store.publish(groups)
+        for user_id in range(n_users):
+            await cache.set(f"schedule:{user_id}", codes[user_id % len(codes)])
+
+    # В «после» учитываются DayTable и отпечатки ScheduleStore; сами списки
+    # Lesson разобраны до замеров и не входят ни в один из них
+    mb_before = await _measure(before)
+    mb_after = await _measure(after)
+    print(f"до:    {mb_before:8.1f} MB  (копия занятий на пользователя)")
+    print(f"после: {mb_after:8.1f} MB  (код группы + общий ScheduleStore)")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Память USER_SCHEDULE_CACHE до и после")
+    ap.add_argument("--users", type=int, default=50_000)
+    ap.add_argument("--groups", type=int, default=300)
+    args = ap.parse_args()
+    asyncio.run(run(args.users, args.groups))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Микробенчмарк UserStateTable: время на обновление и память на миллионах пользователей.
+
+Запуск: python -m benchmarks.bench_user_state [--users 2000000] [--max-users 100000]
+"""
+import argparse
+import time
+import tracemalloc
+
+from app.middlewares.user_state import UserStateTable
+
+
+def run(n_users: int = 2_000_000, max_users: int = 100_000) -> None:
+    table = UserStateTable(max_users=max_users, ttl=600.0)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    step = n_users // 10
+    for i in range(n_users):
+        now = i * 0.001
+        table.get(i, now).bucket("message", 3.0, now).take(1 / 1.2, 3.0, now)
+        if (i + 1) % step == 0:
+            cur, _ = tracemalloc.get_traced_memory()
+            print(f"{i + 1:>10} users: tracked={len(table):>7} mem={cur / 1e6:7.1f} MB")
+    elapsed = time.perf_counter() - t0
+    tracemalloc.stop()
+    print(f"{elapsed / n_users * 1e9:.0f} ns per update (с tracemalloc)")
+
+    table = UserStateTable(max_users=max_users, ttl=600.0)
+    t0 = time.perf_counter()
+    for i in range(n_users):
+        now = i * 0.001
+        table.get(i, now).bucket("message", 3.0, now).take(1 / 1.2, 3.0, now)
+    elapsed = time.perf_counter() - t0
+    print(f"{elapsed / n_users * 1e9:.0f} ns per update")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Время обновления и память UserStateTable")
+    ap.add_argument("--users", type=int, default=2_000_000)
+    ap.add_argument("--max-users", type=int, default=100_000, help="предел отслеживаемых пользователей")
+    args = ap.parse_args()
+    run(args.users, args.max_users)
+
+
+if __name__ == "__main__":
+    main()
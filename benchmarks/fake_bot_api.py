@@ -0,0 +1,162 @@
+"""Локальная замена Telegram Bot API для нагрузочных тестов.
+
+Поддерживает getMe, getUpdates (long polling), sendMessage, editMessageText,
+deleteMessage; остальные методы отвечают {"ok": true, "result": true}.
+Задержка ответа и доля 429 настраиваются. Бот направляется сюда через
+TELEGRAM_API_URL=http://127.0.0.1:<port>.
+
+Запуск отдельно: python -m benchmarks.fake_bot_api [--port 8081] [--latency 0.05] [--rate-429 0.01]
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from aiohttp import web
+
+BOT_ID = 123456
+BOT_TOKEN = f"{BOT_ID}:AAFakeTokenForLoadTestingOnly000000000"
+
+# (chat_id, text, время отправки по time.monotonic())
+OutgoingCallback = Callable[[int, str, float], None]
+
+
+class FakeBotAPI:
+    def __init__(
+            self,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            rate_429: float = 0.0,
+            retry_after: int = 1,
+            seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._updates: List[Dict] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self._subscribers: List[OutgoingCallback] = []
+        self.calls: Dict[str, int] = {}
+        self.throttled = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        app.router.add_get("/bot{token}/{method}", self._handle)
+        return app
+
+    def on_outgoing(self, callback: OutgoingCallback) -> None:
+        self._subscribers.append(callback)
+
+    def push_text(self, user_id: int, text: str) -> int:
+        """Кладёт в очередь входящее текстовое сообщение пользователя."""
+        update_id = next(self._update_ids)
+        user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+        self._updates.append({
+            "update_id": update_id,
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": user,
+                "text": text,
+            },
+        })
+        self._new_updates.set()
+        return update_id
+
+    def pending(self) -> int:
+        return len(self._updates)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = dict(await request.post()) if request.can_read_body else {}
+        params.update(request.query)
+
+        if method == "getUpdates":
+            return self._ok(await self._get_updates(params))
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._rng.uniform(0, self.jitter))
+
+        if method in ("sendMessage", "editMessageText", "deleteMessage") and self._rng.random() < self.rate_429:
+            self.throttled += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+
+        if method == "getMe":
+            return self._ok({"id": BOT_ID, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"})
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(params.get("chat_id", 0))
+            text = str(params.get("text", ""))
+            now = time.monotonic()
+            for callback in self._subscribers:
+                callback(chat_id, text, now)
+            return self._ok({
+                "message_id": int(params.get("message_id") or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": BOT_ID, "is_bot": True, "first_name": "FakeBot"},
+                "text": text,
+            })
+        return self._ok(True)
+
+    async def _get_updates(self, params: Dict) -> List[Dict]:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        # Подтверждённые (update_id < offset) обновления больше не нужны
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    @staticmethod
+    def _ok(result) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+
+async def start_fake_api(api: FakeBotAPI, host: str = "127.0.0.1", port: int = 8081) -> web.AppRunner:
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    api = FakeBotAPI(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429)
+    await start_fake_api(api, args.host, args.port)
+    print(f"Fake Bot API: http://{args.host}:{args.port}  BOT_TOKEN={BOT_TOKEN}")
+    await asyncio.Event().wait()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Локальная замена Telegram Bot API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--latency", type=float, default=0.0, help="задержка ответа, с")
+    ap.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, с")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="доля ответов 429")
+    try:
+        asyncio.run(_serve(ap.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
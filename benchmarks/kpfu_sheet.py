@@ -0,0 +1,140 @@
+"""Генератор синтетических листов расписания КФУ.
+
+Формат как у выгрузки Google Sheets, которую ждёт parse_schedule:
+две строки заголовка (коды групп, затем подписи колонок), первые три
+колонки — день, время, неделя; на каждую группу 8 колонок: предмет,
+здание, ауд. 1, ауд. 2, тип, две служебные и преподаватель. День указан
+только в первой строке дня (pandas протягивает его вниз).
+
+Запуск: python -m benchmarks.kpfu_sheet <каталог> [--sheets N] [--groups N] ...
+"""
+import argparse
+import csv
+import io
+import random
+from pathlib import Path
+from typing import List, Optional
+
+DAYS = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+TIMES = ["08:30", "10:10", "11:50", "13:35", "15:15", "16:55", "18:35", "20:15"]
+WEEKS = ["в", "н", "верхняя", "нижняя", ""]
+SUBJECTS = [
+    "Математический анализ", "Алгебра и геометрия", "Программирование",
+    "Физическая культура", "Иностранный язык", "История России",
+    "Дискретная математика", "Базы данных", "Операционные системы",
+]
+TYPES = ["лекция", "практика", "лаб. работа", "семинар"]
+BUILDINGS = ["Главное здание", "2 здание", "Здание ИВМиИТ", "УНИКС"]
+SURNAMES = [
+    "Иванов", "Петрова", "Сидоров", "Кузнецова", "Смирнов", "Попова",
+    "Васильев", "Соколова", "Михайлов", "Новикова", "Фёдоров", "Морозова",
+]
+
+NBSP = "\u00a0"
+
+
+def group_codes(n: int, first: int = 8251100) -> List[str]:
+    return [str(first + i) for i in range(n)]
+
+
+def _teacher(rng: random.Random, messy: float) -> str:
+    name = f"{rng.choice(SURNAMES)} {rng.choice('АБВГДЕИКМНОП')}.{rng.choice('АБВГДЕИКМНОП')}."
+    if rng.random() < messy:
+        # Неразрывные пробелы и несколько преподавателей через «;» или двойной пробел
+        name = name.replace(" ", NBSP)
+        if rng.random() < 0.5:
+            other = f"{rng.choice(SURNAMES)}{NBSP}{rng.choice('АБВГД')}.{rng.choice('АБВГД')}."
+            name += rng.choice(["; ", "  ", ", "]) + other
+    return name
+
+
+def _room(rng: random.Random, messy: float) -> str:
+    room = str(rng.randint(100, 1510))
+    if rng.random() < messy:
+        return rng.choice([room + ".0", "nan", " " + room + " "])
+    return room
+
+
+def generate_sheet(
+        groups: List[str],
+        rows_per_day: int = 8,
+        fill: float = 0.6,
+        messy: float = 0.1,
+        seed: Optional[int] = 0,
+) -> str:
+    """CSV-текст одного листа.
+
+    fill — доля заполненных пар, messy — доля «грязных» ячеек
+    (nan, "101.0", NBSP в фамилиях, лишние пробелы).
+    """
+    rng = random.Random(seed)
+    top = ["", "", ""]
+    sub = ["День", "Время", "Неделя"]
+    for code in groups:
+        top += [f"09-{code[2:5]} ({code})"] + [""] * 7
+        sub += ["Предмет", "Здание", "Ауд.", "Ауд. 2", "Тип", "", "", "Преподаватель"]
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(top)
+    writer.writerow(sub)
+    for day in DAYS:
+        for i in range(rows_per_day):
+            time = TIMES[i % len(TIMES)]
+            row = [day if i == 0 else "", time, rng.choice(WEEKS)]
+            for _ in groups:
+                if rng.random() >= fill:
+                    row += [""] * 8
+                    continue
+                row += [
+                    rng.choice(SUBJECTS),
+                    rng.choice(BUILDINGS),
+                    _room(rng, messy),
+                    _room(rng, messy) if rng.random() < 0.2 else "",
+                    rng.choice(TYPES),
+                    "",
+                    "nan" if rng.random() < messy else "",
+                    _teacher(rng, messy),
+                ]
+            writer.writerow(row)
+    return out.getvalue()
+
+
+def write_sheets(
+        directory: Path,
+        sheets: int = 6,
+        groups_per_sheet: int = 40,
+        rows_per_day: int = 8,
+        messy: float = 0.1,
+        seed: int = 0,
+) -> List[Path]:
+    """Пишет листы gid_0.csv … gid_{N-1}.csv с непересекающимися группами."""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    codes = group_codes(sheets * groups_per_sheet)
+    for gid in range(sheets):
+        chunk = codes[gid * groups_per_sheet:(gid + 1) * groups_per_sheet]
+        path = directory / f"gid_{gid}.csv"
+        path.write_text(
+            generate_sheet(chunk, rows_per_day=rows_per_day, messy=messy, seed=seed + gid),
+            encoding="utf-8",
+        )
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("directory", type=Path)
+    ap.add_argument("--sheets", type=int, default=6)
+    ap.add_argument("--groups", type=int, default=40, help="групп на лист")
+    ap.add_argument("--rows", type=int, default=8, help="строк на день")
+    ap.add_argument("--messy", type=float, default=0.1)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    for path in write_sheets(args.directory, args.sheets, args.groups, args.rows, args.messy, args.seed):
+        print(f"{path} ({path.stat().st_size} байт)")
+
+
+if __name__ == "__main__":
+    main()
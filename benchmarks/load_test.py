@@ -0,0 +1,213 @@
+"""Сквозной нагрузочный тест бота на локальном Fake Bot API.
+
+Поднимает benchmarks.fake_bot_api, генерирует листы (benchmarks.kpfu_sheet),
+запускает настоящий бот (run.py) с TELEGRAM_API_URL на этот сервер и
+прогоняет N пользователей по сценарию: ввод группы → «📅 Сегодня» →
+недельные виды. Печатает пропускную способность, p50/p95/p99 по шагам и
+число отказов AntiFloodMiddleware / SingleFlightMiddleware.
+
+Запуск: python -m benchmarks.load_test --users 200 [--think 1.5] [--latency 0.05] [--rate-429 0.01] [--out report.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.fake_bot_api import BOT_TOKEN, FakeBotAPI, start_fake_api
+from benchmarks.kpfu_sheet import group_codes, write_sheets
+
+ANTIFLOOD_TEXT = "не нажимайте так часто"
+SINGLEFLIGHT_TEXT = "Обрабатываю предыдущий запрос"
+
+# Шаг сценария: (название, текст пользователя, признак последнего ответа шага)
+STEPS: List[Tuple[str, Optional[str], str]] = [
+    ("group", None, "найдена"),
+    ("today", "📅 Сегодня", ""),
+    ("week_current", "🔎 Текущая неделя", "Суббота"),
+    ("week_next", "➡️ Следующая неделя", "Суббота"),
+    ("week_all", "📚 Вся без фильтров", "Суббота"),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+class _Waiter:
+    def __init__(self, marker: str):
+        self.marker = marker
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class LoadDriver:
+    def __init__(self, api: FakeBotAPI, groups: List[str], think: float, timeout: float):
+        self.api = api
+        self.groups = groups
+        self.think = think
+        self.timeout = timeout
+        self._waiters: Dict[int, _Waiter] = {}
+        self.latencies: Dict[str, List[float]] = {name: [] for name, _, _ in STEPS}
+        self.outcomes: Dict[str, Dict[str, int]] = {
+            name: {"ok": 0, "antiflood": 0, "singleflight": 0, "timeout": 0} for name, _, _ in STEPS
+        }
+        self.messages = 0
+        api.on_outgoing(self._on_outgoing)
+
+    def _on_outgoing(self, chat_id: int, text: str, at: float) -> None:
+        self.messages += 1
+        waiter = self._waiters.get(chat_id)
+        if waiter is None or waiter.future.done():
+            return
+        if ANTIFLOOD_TEXT in text:
+            waiter.future.set_result(("antiflood", at))
+        elif SINGLEFLIGHT_TEXT in text:
+            waiter.future.set_result(("singleflight", at))
+        elif waiter.marker in text:
+            waiter.future.set_result(("ok", at))
+
+    async def _step(self, user_id: int, name: str, text: str, marker: str) -> None:
+        waiter = self._waiters[user_id] = _Waiter(marker)
+        sent = time.monotonic()
+        self.api.push_text(user_id, text)
+        try:
+            outcome, at = await asyncio.wait_for(waiter.future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.outcomes[name]["timeout"] += 1
+            return
+        finally:
+            self._waiters.pop(user_id, None)
+        self.outcomes[name][outcome] += 1
+        if outcome == "ok":
+            self.latencies[name].append(at - sent)
+
+    async def user(self, user_id: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        group = random.choice(self.groups)
+        for name, text, marker in STEPS:
+            await self._step(user_id, name, text or group, marker)
+            await asyncio.sleep(self.think * random.uniform(0.5, 1.5))
+
+    def report(self, elapsed: float) -> Dict:
+        steps = {}
+        for name, _, _ in STEPS:
+            lat = self.latencies[name]
+            steps[name] = {
+                **self.outcomes[name],
+                "p50": _percentile(lat, 50),
+                "p95": _percentile(lat, 95),
+                "p99": _percentile(lat, 99),
+                "mean": statistics.fmean(lat) if lat else 0.0,
+            }
+        total = sum(sum(o.values()) for o in self.outcomes.values())
+        return {
+            "elapsed": elapsed,
+            "updates": total,
+            "updates_per_sec": total / elapsed if elapsed else 0.0,
+            "messages_sent": self.messages,
+            "throttled_429": self.api.throttled,
+            "steps": steps,
+        }
+
+
+def _print_report(report: Dict) -> None:
+    print(
+        f"\n{report['updates']} обновлений за {report['elapsed']:.1f} с "
+        f"({report['updates_per_sec']:.1f}/с), отправлено {report['messages_sent']} сообщений, "
+        f"429: {report['throttled_429']}"
+    )
+    print(f"{'шаг':<14}{'ok':>6}{'flood':>7}{'single':>8}{'t/o':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, s in report["steps"].items():
+        print(
+            f"{name:<14}{s['ok']:>6}{s['antiflood']:>7}{s['singleflight']:>8}{s['timeout']:>6}"
+            f"{s['p50'] * 1e3:>9.1f}{s['p95'] * 1e3:>9.1f}{s['p99'] * 1e3:>9.1f}"
+        )
+
+
+async def _wait_ready(api: FakeBotAPI, timeout: float = 60.0) -> None:
+    # Бот готов, когда начал опрашивать getUpdates
+    deadline = time.monotonic() + timeout
+    while api.calls.get("getUpdates", 0) == 0:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Бот не начал опрос getUpdates")
+        await asyncio.sleep(0.1)
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    random.seed(args.seed)
+    api = FakeBotAPI(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429, seed=args.seed)
+    port = args.port or _free_port()
+    runner = await start_fake_api(api, port=port)
+
+    tmp = Path(tempfile.mkdtemp(prefix="kpfu-load-"))
+    write_sheets(tmp / "csv", sheets=args.sheets, groups_per_sheet=args.groups)
+    env = {
+        **os.environ,
+        "BOT_TOKEN": BOT_TOKEN,
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{port}",
+        "CACHE_DIR": str(tmp / "csv"),
+        "GIDS": ",".join(str(g) for g in range(args.sheets)),
+        "USERS_DB": str(tmp / "users.sqlite3"),
+        "LOG_FILE": str(tmp / "bot.log"),
+        "WEB_PORT": str(_free_port()),
+        "WEBHOOK_URL": "",
+        "STATE_BACKEND": "memory",
+    }
+    bot = await asyncio.create_subprocess_exec(
+        sys.executable, "run.py", env=env, cwd=Path(__file__).resolve().parent.parent,
+    )
+    try:
+        await _wait_ready(api)
+        driver = LoadDriver(api, group_codes(args.sheets * args.groups), args.think, args.timeout)
+        started = time.monotonic()
+        await asyncio.gather(*[
+            driver.user(10_000 + i, random.uniform(0, args.ramp)) for i in range(args.users)
+        ])
+        return driver.report(time.monotonic() - started)
+    finally:
+        bot.terminate()
+        await bot.wait()
+        await runner.cleanup()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Нагрузочный тест бота на Fake Bot API")
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--ramp", type=float, default=5.0, help="пользователи стартуют равномерно за это время, с")
+    ap.add_argument("--think", type=float, default=1.5, help="пауза между шагами пользователя, с")
+    ap.add_argument("--timeout", type=float, default=30.0, help="ожидание ответа на шаг, с")
+    ap.add_argument("--latency", type=float, default=0.03, help="задержка Fake Bot API, с")
+    ap.add_argument("--jitter", type=float, default=0.02)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--sheets", type=int, default=6)
+    ap.add_argument("--groups", type=int, default=40, help="групп на лист")
+    ap.add_argument("--port", type=int, default=0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", type=Path, help="куда сохранить JSON с отчётом")
+    args = ap.parse_args()
+
+    report = asyncio.run(run(args))
+    report["params"] = {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()}
+    _print_report(report)
+    if args.out:
+        args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
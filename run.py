@@ -1,9 +1,13 @@
 import asyncio
+import time
+
+_started_at = time.perf_counter()
+
 from app.main import main
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(main(started_at=_started_at))
     except (KeyboardInterrupt, SystemExit):
         print("❌ Бот остановлен.")
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""Скомпилированный снимок расписания: сборка и просмотр без запуска бота.
+
+    python snapshot.py build [--engine csv|pandas]
+    python snapshot.py inspect [ПУТЬ] [--groups]
+
+Пути берутся из .env (CACHE_DIR, SCHEDULE_SNAPSHOT), как у run.py.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.services import csv_cache
+from app.services.parser import parser_tag
+from app.services.schedule_snapshot import SnapshotError, is_fresh, read_snapshot
+
+
+def cmd_build(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    path, sheets, size = csv_cache.build_compiled_sync(args.engine)
+    print(f"{path}: {sheets} лист(ов), {size / 1024:.0f} КБ за {(time.perf_counter() - started) * 1000:.0f} мс")
+    return 0
+
+
+def cmd_inspect(args: argparse.Namespace) -> int:
+    path = args.path or csv_cache.snapshot_path()
+    started = time.perf_counter()
+    try:
+        snapshot = read_snapshot(path, verify=False)
+    except SnapshotError as e:
+        print(f"{path}: {e}", file=sys.stderr)
+        return 1
+    load_ms = (time.perf_counter() - started) * 1000
+    try:
+        read_snapshot(path)
+        checksum = "ok"
+    except SnapshotError as e:
+        checksum = str(e)
+
+    created = datetime.fromtimestamp(snapshot.created_at).isoformat(timespec="seconds")
+    print(f"{path}: {snapshot.size / 1024:.0f} КБ, схема {snapshot.schema}, собран {created}")
+    print(f"sha256 {snapshot.checksum} ({checksum}), чтение {load_ms:.1f} мс")
+    current = parser_tag()
+    print(f"разборщик {snapshot.parser} ({'совпадает' if snapshot.parser == current else 'текущий ' + current})")
+    print(f"{'лист':<24} {'групп':>6} {'занятий':>8} {'строк':>6} {'коды':>5}  CSV")
+    for name, entry in sorted(snapshot.sheets.items()):
+        csv_state = "актуален" if is_fresh(entry, csv_cache._cache_dir() / name) else "изменился"
+        print(
+            f"{name:<24} {len(entry.columns.groups):>6} {len(entry.columns):>8} "
+            f"{len(entry.columns.strings):>6} {entry.columns.codes.typecode:>5}  {csv_state}"
+        )
+        if args.groups:
+            print("    " + " ".join(sorted(entry.columns.groups)))
+    return 0 if checksum == "ok" else 1
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Скомпилированный снимок расписания")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="разобрать все CSV из CACHE_DIR и записать снимок")
+    build.add_argument("--engine", choices=("csv", "pandas"), default=None)
+    build.set_defaults(func=cmd_build)
+
+    inspect = sub.add_parser("inspect", help="показать содержимое снимка и проверить его")
+    inspect.add_argument("path", type=Path, nargs="?")
+    inspect.add_argument("--groups", action="store_true", help="перечислить группы листов")
+    inspect.set_defaults(func=cmd_inspect)
+
+    args = ap.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""Окружение тестов: конфиг читается при импорте app, поэтому задаём его до импорта."""
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="kpfu-tests-")
+os.environ.update({
+    "BOT_TOKEN": "123456:TEST",
+    "CACHE_DIR": os.path.join(_TMP, "csv"),
+    "USERS_DB": os.path.join(_TMP, "users.sqlite3"),
+    "LOG_FILE": os.path.join(_TMP, "bot.log"),
+    "CPU_WORKERS": "0",
+    "STATE_BACKEND": "memory",
+})
@@ -0,0 +1,103 @@
+"""Лента изменений: разница между версиями расписания и сброс кэша отрисовки."""
+import asyncio
+import dataclasses
+from types import SimpleNamespace
+
+import pytest
+
+from app import main
+from app.handlers import schedule_buttons
+from app.services import schedule_store
+from app.services.changes import CHANGE_FEED, diff_group, diff_stores, fingerprint
+from app.services.lessons import Lesson
+from app.services.render_cache import RENDER_CACHE
+
+
+def _lesson(group, day, time, subject, room="1108"):
+    return Lesson.make(group, day, time, "", subject, "УНИКС", room, "", "лекция", "Иванов И.И.")
+
+
+ALGEBRA = _lesson("09-111", "Понедельник", "08:30", "Алгебра")
+PHYSICS = _lesson("09-111", "Понедельник", "10:10", "Физика")
+
+
+def test_diff_group_added_removed_moved():
+    history = _lesson("09-111", "Вторник", "11:50", "История")
+    change = diff_group("09-111", [ALGEBRA, PHYSICS], [PHYSICS, history])
+    assert change.added == [history] and change.removed == [ALGEBRA] and change.changed == []
+
+    # Другая аудитория в том же слоте — изменение занятия
+    moved_room = ALGEBRA._replace(room1="1109")
+    change = diff_group("09-111", [ALGEBRA, PHYSICS], [moved_room, PHYSICS])
+    assert change.changed == [(ALGEBRA, moved_room)] and not change.added and not change.removed
+    assert change.summary() == "+0 −0 ~1"
+
+    # Перенос на другое время — удаление и добавление
+    moved_time = ALGEBRA._replace(time="13:35")
+    change = diff_group("09-111", [ALGEBRA, PHYSICS], [PHYSICS, moved_time])
+    assert change.added == [moved_time] and change.removed == [ALGEBRA]
+
+    # Порядок строк и повторы учитываются как мультимножество
+    assert diff_group("09-111", [ALGEBRA, PHYSICS], [PHYSICS, ALGEBRA]).summary() == "+0 −0 ~0"
+    assert diff_group("09-111", [ALGEBRA], [ALGEBRA, ALGEBRA]).added == [ALGEBRA]
+
+
+def test_diff_stores_compares_only_changed_fingerprints():
+    old = {"09-111": [ALGEBRA, PHYSICS], "09-222": [_lesson("09-222", "Среда", "08:30", "Химия")]}
+    new = {"09-111": [PHYSICS, ALGEBRA], "09-333": [_lesson("09-333", "Среда", "08:30", "Химия")]}
+    prints = lambda groups: {g: fingerprint(lessons) for g, lessons in groups.items()}
+    assert fingerprint([ALGEBRA, PHYSICS]) == fingerprint([PHYSICS, ALGEBRA])
+
+    changes = diff_stores(old, prints(old), new, prints(new))
+    assert [c.group for c in changes] == ["09-222", "09-333"]
+    assert changes[0].removed == old["09-222"] and not changes[0].added
+    assert changes[1].added == new["09-333"] and not changes[1].removed
+
+
+def _render(group):
+    store = schedule_store.get_store()
+    return schedule_buttons.render_day(
+        group, store.table(group), "Понедельник", fingerprint=store.fingerprint(group),
+    )
+
+
+def test_only_changed_groups_leave_render_cache():
+    other = _lesson("09-222", "Понедельник", "08:30", "Химия")
+    schedule_store.publish({"09-111": [ALGEBRA], "09-222": [other]})
+    RENDER_CACHE.clear()
+    _render("09-111")
+    _render("09-222")
+    assert len(RENDER_CACHE) == 2
+
+    schedule_store.publish({"09-111": [ALGEBRA, PHYSICS], "09-222": [other]})
+    version, changes = CHANGE_FEED.last()
+    assert version == schedule_store.get_store().version
+    assert [c.group for c in changes] == ["09-111"]
+
+    schedule_buttons.on_schedule_changes(version, changes)
+    assert [key[0] for key in RENDER_CACHE._items] == ["09-222"]
+    assert "Физика" in _render("09-111")
+
+
+@pytest.mark.parametrize("leader", [False, True])
+def test_notify_changes_only_on_leader(monkeypatch, leader):
+    notified = []
+
+    async def notify(changes):
+        notified.append(changes)
+
+    monkeypatch.setattr(main, "cfg", dataclasses.replace(main.cfg, notify_changes=True))
+    monkeypatch.setattr(main, "SENDER", SimpleNamespace(running=True))
+    monkeypatch.setattr(schedule_buttons, "notify_changed_groups", notify)
+    changes = [diff_group("09-111", [ALGEBRA], [])]
+
+    async def scenario():
+        main._IS_LEADER.clear()
+        if leader:
+            main._IS_LEADER.set()
+        main._notify_changes(2, changes)
+        await asyncio.gather(*main._BACKGROUND)
+        main._IS_LEADER.clear()
+
+    asyncio.run(scenario())
+    assert notified == ([changes] if leader else [])
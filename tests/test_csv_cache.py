@@ -0,0 +1,124 @@
+"""Старт с диска: разбор CSV, скомпилированный снимок и повторная загрузка из него."""
+import asyncio
+
+import pytest
+
+from app.services import csv_cache, parser, schedule_store
+from app.services.schedule_snapshot import SnapshotError, read_snapshot
+from benchmarks.kpfu_sheet import write_sheets
+
+
+@pytest.fixture
+def sheets(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+    return write_sheets(tmp_path, sheets=3, groups_per_sheet=5, rows_per_day=4)
+
+
+def _load():
+    asyncio.run(csv_cache.load_cached())
+    return dict(schedule_store.get_store().groups)
+
+
+def test_snapshot_round_trip_keeps_one_resident_form(sheets, monkeypatch):
+    parsed = _load()
+    assert len(parsed) == 15
+    snapshot = read_snapshot(csv_cache.snapshot_path())
+    assert sorted(snapshot.sheets) == [p.name for p in sheets]
+
+    # Второй старт берёт листы из снимка, CSV не разбираются
+    async def no_parse(names):
+        assert not names
+        return {}
+
+    monkeypatch.setattr(csv_cache, "_parse_sheets", no_parse)
+    assert _load() == parsed
+    # Колоночная форма не остаётся в памяти рядом со списками Lesson
+    assert all(entry.columns is None for entry in csv_cache._COMPILED.values())
+
+
+def test_changed_sheet_is_reparsed(sheets):
+    _load()
+    sheets[1].write_text(sheets[1].read_text(encoding="utf-8").replace("Базы данных", "Теория графов"), encoding="utf-8")
+    groups = _load()
+    assert any(lesson.subject == "Теория графов" for lessons in groups.values() for lesson in lessons)
+    assert read_snapshot(csv_cache.snapshot_path()).sheets[sheets[1].name].size == sheets[1].stat().st_size
+
+
+def test_snapshot_from_other_parser_is_rejected(sheets, monkeypatch):
+    _load()
+    parsed = []
+    real_parse = csv_cache._parse_sheets
+
+    async def count_parse(names):
+        parsed.extend(names)
+        return await real_parse(names)
+
+    monkeypatch.setattr(csv_cache, "_parse_sheets", count_parse)
+    monkeypatch.setattr(parser, "PARSER_VERSION", parser.PARSER_VERSION + 1)
+    _load()
+    assert sorted(parsed) == [p.name for p in sheets]
+    assert read_snapshot(csv_cache.snapshot_path()).parser == parser.parser_tag()
+
+    with pytest.raises(SnapshotError):
+        read_snapshot(csv_cache.snapshot_path(), parser=parser.parser_tag("pandas"))
+
+
+class SharedBackend:
+    shared = True
+
+    def __init__(self):
+        self.version_checks = 0
+
+    async def snapshot_version(self):
+        self.version_checks += 1
+        return 0
+
+
+def test_background_refresh_waits_for_leadership(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(csv_cache, "get_backend", SharedBackend)
+    monkeypatch.setattr(csv_cache, "_SHEET_CHECKED", {})
+    refreshed = []
+
+    async def refresh_all(gids=None):
+        refreshed.append(gids)
+        return {}
+
+    monkeypatch.setattr(csv_cache, "refresh_all", refresh_all)
+
+    async def scenario():
+        assert await csv_cache.ensure_startup_cache(background=True) is None
+        leader = asyncio.Event()
+        task = await csv_cache.ensure_startup_cache(background=True, leader=leader)
+        await asyncio.sleep(0.01)
+        assert refreshed == []
+        leader.set()
+        await task
+
+    asyncio.run(scenario())
+    assert len(refreshed) == 1 and refreshed[0]
+
+
+def test_refresh_and_snapshot_sync_do_not_overlap(monkeypatch):
+    backend = SharedBackend()
+    monkeypatch.setattr(csv_cache, "get_backend", lambda: backend)
+    monkeypatch.setattr(csv_cache, "_DATA_LOCK", asyncio.Lock())
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def download_all(gids=None):
+            await release.wait()
+            return {}
+
+        monkeypatch.setattr(csv_cache, "download_all", download_all)
+        refresh = asyncio.create_task(csv_cache.refresh_all())
+        await asyncio.sleep(0.01)
+        sync = asyncio.create_task(csv_cache.sync_snapshot())
+        await asyncio.sleep(0.01)
+        assert backend.version_checks == 0
+        release.set()
+        await asyncio.gather(refresh, sync)
+
+    asyncio.run(scenario())
+    assert backend.version_checks == 1
@@ -0,0 +1,89 @@
+"""Поиск группы: префикс, опечатки на расстоянии Дамерау-Левенштейна, разбор ввода."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.handlers import schedule as handlers
+from app.services import csv_cache, schedule_store
+from app.services.group_search import GroupSearchIndex, query_digits
+from app.services.lessons import Lesson
+
+CODES = ["8251160", "8251161", "8251162", "8251170", "8252101", "0925001"]
+
+
+@pytest.fixture
+def index():
+    return GroupSearchIndex(CODES)
+
+
+def test_query_digits():
+    assert query_digits("8251160") == "8251160"
+    assert query_digits(" 825 11 60 ") == "8251160"
+    # Формат «09-825»: берётся часть после дефиса
+    assert query_digits("09-825") == "825"
+    assert query_digits("гр. 09-8251160") == "8251160"
+    assert query_digits("09-") == "09"
+    assert query_digits("") == query_digits(None) == ""
+
+
+def test_exact_and_prefix(index):
+    assert index.search("8251160").exact == "8251160"
+    assert index.prefix("825116") == ["8251160", "8251161", "8251162"]
+    assert index.prefix("82511", limit=2) == ["8251160", "8251161"]
+    assert index.search("82511").candidates == ["8251160", "8251161", "8251162", "8251170"]
+    # Единственный код с таким началом — сразу найден
+    assert index.search("82521").exact == "8252101"
+    assert index.search("09-82521").exact == "8252101"
+    assert index.search("abc") == index.search("")
+    assert not index.search("777").candidates
+
+
+def test_nearest_neighbours(index):
+    # Перестановка соседних цифр
+    assert index.nearest("8251106") == ["8251160"]
+    assert index.search("8251106").candidates == ["8251160"]
+    # Пропущенная цифра
+    assert index.nearest("825160") == ["8251160"]
+    assert index.search("825170").exact == "8251170"
+    # Лишняя цифра и замена
+    assert index.nearest("82511600") == ["8251160"]
+    assert index.nearest("8251163") == ["8251160", "8251161", "8251162"]
+    # Две правки — только если на расстоянии 1 ничего нет
+    assert index.nearest("8252110") == ["8252101"]
+    assert index.nearest("1111111") == []
+
+
+class FakeMessage:
+    def __init__(self, text, user_id=1):
+        self.text = text
+        self.from_user = SimpleNamespace(id=user_id)
+        self.chat = SimpleNamespace(id=user_id)
+        self.replies = []
+
+    async def answer(self, text, **kwargs):
+        self.replies.append(text)
+
+
+def test_schedule_accepts_single_candidate(monkeypatch):
+    monkeypatch.setattr(csv_cache, "GROUP_SEARCH", GroupSearchIndex(CODES))
+    schedule_store.publish({"8252101": [
+        Lesson.make("8252101", "Понедельник", "08:30", "", "Алгебра", "УНИКС", "1108", "", "лекция", "Иванов И.И."),
+    ]})
+    remembered = []
+
+    async def remember(user_id, group):
+        remembered.append((user_id, group))
+
+    monkeypatch.setattr(handlers, "remember_user_group", remember)
+
+    message = FakeMessage("09-82521")
+    asyncio.run(handlers.cmd_schedule(message))
+    assert remembered == [(1, "8252101")]
+    assert "8252101</b> найдена" in message.replies[-1]
+
+    # Опечатка в полном коде не принимается молча — предлагается вариант
+    message = FakeMessage("/schedule 8252110")
+    asyncio.run(handlers.cmd_schedule(message))
+    assert message.replies == ["🔎 Точного совпадения нет. Возможно, вы имели в виду:"]
+    assert remembered == [(1, "8252101")]
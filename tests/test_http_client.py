@@ -0,0 +1,229 @@
+"""HttpClient, download_csv и download_gid против локального aiohttp-сервера."""
+import asyncio
+import hashlib
+import json
+
+from aiohttp import web
+
+from app.services import csv_cache, google_csv
+from app.services.http_client import HttpClient
+
+BODY = ("День,Время,Неделя\n" * 2000).encode("utf-8")
+
+
+class FlakyServer:
+    """Отвечает по сценарию: fail[path] — сколько первых запросов испортить."""
+
+    def __init__(self):
+        self.fail = {}
+        self.hits = {}
+        self.active = 0
+        self.peak = 0
+        self.etag = "v1"  # None — сервер не отдаёт ETag и не отвечает 304
+        self.conditional = []  # If-None-Match запросов /sheet
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/status/{code}", self._status)
+        app.router.add_get("/truncated", self._truncated)
+        app.router.add_get("/slow", self._slow)
+        app.router.add_get("/sheet", self._sheet)
+        return app
+
+    def _hit(self, path: str) -> bool:
+        """True, если этот запрос должен завершиться ошибкой."""
+        n = self.hits[path] = self.hits.get(path, 0) + 1
+        return n <= self.fail.get(path, 0)
+
+    async def _status(self, request: web.Request) -> web.Response:
+        code = int(request.match_info["code"])
+        if self._hit(request.path):
+            return web.Response(status=code, headers={"Retry-After": "0"} if code == 429 else None)
+        return web.Response(body=BODY)
+
+    async def _truncated(self, request: web.Request) -> web.StreamResponse:
+        if not self._hit(request.path):
+            return web.Response(body=BODY)
+        # Обещаем всё тело, отдаём часть и рвём соединение
+        resp = web.StreamResponse(headers={"Content-Length": str(len(BODY))})
+        await resp.prepare(request)
+        await resp.write(BODY[:1000])
+        request.transport.close()
+        return resp
+
+    async def _sheet(self, request: web.Request) -> web.Response:
+        got = request.headers.get("If-None-Match")
+        self.conditional.append(got)
+        if self.etag is None:
+            return web.Response(body=BODY)
+        if got == self.etag:
+            return web.Response(status=304, headers={"ETag": self.etag})
+        return web.Response(body=BODY, headers={"ETag": self.etag})
+
+    async def _slow(self, request: web.Request) -> web.Response:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.05)
+        self.active -= 1
+        return web.Response(body=b"ok")
+
+
+async def _with_server(server: FlakyServer, scenario, **client_kw):
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    client = HttpClient(**{"backoff": 0.01, "retries": 3, **client_kw})
+    try:
+        return await scenario(client, base)
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+async def _read_body(resp):
+    return resp.status, await resp.read()
+
+
+def test_retries_429_and_5xx():
+    server = FlakyServer()
+    server.fail = {"/status/429": 2, "/status/503": 3, "/status/500": 10}
+
+    async def scenario(client, base):
+        return [await client.fetch(f"{base}/status/{code}", _read_body) for code in (429, 503, 500)]
+
+    results = asyncio.run(_with_server(server, scenario))
+    assert results[0] == (200, BODY)
+    assert results[1] == (200, BODY)
+    # Попытки кончились — отдаётся последний ответ
+    assert results[2][0] == 500
+    assert server.hits == {"/status/429": 3, "/status/503": 4, "/status/500": 4}
+
+
+def test_body_read_is_retried():
+    server = FlakyServer()
+    server.fail = {"/truncated": 2}
+
+    async def scenario(client, base):
+        return await client.fetch(f"{base}/truncated", _read_body)
+
+    assert asyncio.run(_with_server(server, scenario)) == (200, BODY)
+    assert server.hits["/truncated"] == 3
+
+
+def test_per_host_cap():
+    server = FlakyServer()
+
+    async def scenario(client, base):
+        await asyncio.gather(*(client.fetch(f"{base}/slow", _read_body) for _ in range(12)))
+
+    asyncio.run(_with_server(server, scenario, per_host=3))
+    assert server.hits == {} and server.peak == 3
+
+
+def test_backoff_bounds():
+    client = HttpClient(backoff=0.5, backoff_max=4.0)
+    assert client._delay(0, "2") == 2.0
+    assert client._delay(0, "120") == 4.0
+    for attempt in range(8):
+        assert 0 <= client._delay(attempt, "soon") <= min(4.0, 0.5 * 2 ** attempt)
+
+
+def test_download_csv_rewrites_file_after_broken_body(tmp_path, monkeypatch):
+    server = FlakyServer()
+    server.fail = {"/truncated": 1}
+    dest = tmp_path / "gid_0.csv"
+
+    async def scenario(client, base):
+        monkeypatch.setattr(google_csv, "BASE_URL", base + "/truncated?id={id}&gid={gid}")
+        monkeypatch.setattr(google_csv, "get_client", lambda: client)
+        return await google_csv.download_csv("sheet", 0, dest)
+
+    result = asyncio.run(_with_server(server, scenario))
+    assert result.ok and result.size == len(BODY)
+    assert result.sha256 == hashlib.sha256(BODY).hexdigest()
+    assert dest.read_bytes() == BODY
+
+
+def _download(server, dest, monkeypatch, **kwargs):
+    async def scenario(client, base):
+        monkeypatch.setattr(google_csv, "BASE_URL", base + "/status/200?id={id}&gid={gid}")
+        monkeypatch.setattr(google_csv, "get_client", lambda: client)
+        return await google_csv.download_csv("sheet", 0, dest, **kwargs)
+
+    return asyncio.run(_with_server(server, scenario))
+
+
+def test_download_csv_sha_matches_file(tmp_path, monkeypatch):
+    # Мелкие чанки: хэш собирается из многих кусков потока
+    monkeypatch.setattr(google_csv, "CHUNK_SIZE", 1000)
+    dest = tmp_path / "gid_0.csv.tmp"
+    result = _download(FlakyServer(), dest, monkeypatch, max_bytes=len(BODY))
+    data = dest.read_bytes()
+    assert result.ok and result.size == len(data) == len(BODY)
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+
+
+def test_download_csv_over_limit_removes_partial_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(google_csv, "CHUNK_SIZE", 1000)
+    server = FlakyServer()
+    dest = tmp_path / "gid_0.csv.tmp"
+    calls = []
+    real_run_io = google_csv.run_io
+
+    async def spy_run_io(fn, *args):
+        calls.append(fn.__name__)
+        return await real_run_io(fn, *args)
+
+    monkeypatch.setattr(google_csv, "run_io", spy_run_io)
+    result = _download(server, dest, monkeypatch, max_bytes=len(BODY) // 2)
+    assert not result.ok and not result.not_modified
+    # Часть тела успела записаться — недокачанный файл удалён
+    assert calls.count("write") > 1 and calls[-2:] == ["close", "unlink"]
+    assert not dest.exists()
+    # Превышение лимита не повторяется
+    assert server.hits == {"/status/200": 1}
+
+
+def _download_twice(server, tmp_path, monkeypatch):
+    """Два download_gid подряд: до второго лист на сервере не меняется."""
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+
+    async def no_rebuild(names):
+        raise AssertionError(f"лишняя пересборка: {names}")
+
+    async def scenario(client, base):
+        monkeypatch.setattr(google_csv, "BASE_URL", base + "/sheet?id={id}&gid={gid}")
+        monkeypatch.setattr(google_csv, "get_client", lambda: client)
+        first = await csv_cache.download_gid(0)
+        stat = (tmp_path / "gid_0.csv").stat()
+        meta = json.loads((tmp_path / "gid_0.meta.json").read_text(encoding="utf-8"))
+        monkeypatch.setattr(csv_cache, "_rebuild_store", no_rebuild)
+        second = await csv_cache.refresh_all([0])
+        return first, second[0], stat, meta
+
+    first, second, stat, meta = asyncio.run(_with_server(server, scenario))
+    assert first == csv_cache.CHANGED and second == csv_cache.UNCHANGED
+    path = tmp_path / "gid_0.csv"
+    # Файл не переписывался, временного не осталось
+    assert path.read_bytes() == BODY and path.stat().st_mtime_ns == stat.st_mtime_ns
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["gid_0.csv", "gid_0.meta.json"]
+    new_meta = json.loads((tmp_path / "gid_0.meta.json").read_text(encoding="utf-8"))
+    assert new_meta["sha256"] == meta["sha256"] == hashlib.sha256(BODY).hexdigest()
+    assert new_meta["checked_at"] >= meta["checked_at"]
+    return meta, new_meta
+
+
+def test_download_gid_same_sha_is_unchanged(tmp_path, monkeypatch):
+    server = FlakyServer()
+    server.etag = None
+    _download_twice(server, tmp_path, monkeypatch)
+    assert server.conditional == [None, None]
+
+
+def test_download_gid_not_modified(tmp_path, monkeypatch):
+    server = FlakyServer()
+    meta, new_meta = _download_twice(server, tmp_path, monkeypatch)
+    assert server.conditional == [None, "v1"]
+    assert meta["etag"] == new_meta["etag"] == "v1"
@@ -0,0 +1,65 @@
+"""Inline-режим: набор статей группы и выбор статьи по слову дня."""
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from app.handlers import inline
+from app.services import schedule_store
+from app.services.group_search import GroupMatch
+from app.services.lessons import Lesson
+from app.services.timetable import DayTable
+
+WEDNESDAY = date(2026, 10, 14)
+GROUP = "8251160"
+
+
+@pytest.fixture
+def table():
+    return DayTable([
+        Lesson.make(GROUP, "Среда", "10:10", "", "Физика", "УНИКС", "1108", "", "лекция", "Иванов И.И."),
+        Lesson.make(GROUP, "Понедельник", "08:30", "", "Алгебра", "УНИКС", "1108", "", "лекция", "Иванов И.И."),
+    ])
+
+
+def test_build_articles(table):
+    articles = inline._build_articles(GROUP, table, "fp", WEDNESDAY)
+    assert [a.title for a in articles] == [
+        f"{GROUP}: сегодня", f"{GROUP}: завтра",
+        *(f"{GROUP}: {d}" for d in ("понедельник", "вторник", "среда", "четверг", "пятница", "суббота")),
+    ]
+    assert len({a.id for a in articles}) == len(articles)
+    assert articles[0].description == "Среда, 14.10: пар 1, с 10:10"
+    assert articles[1].description == "Четверг, 15.10: занятий нет"
+    # Прошедшие дни недели — уже следующей недели, сегодняшний — сегодня
+    assert articles[2].description == "Понедельник, 19.10: пар 1, с 08:30"
+    assert articles[3].description.startswith("Вторник, 20.10")
+    assert articles[4].description.startswith("Среда, 14.10")
+    assert articles[7].description.startswith("Суббота, 17.10")
+
+
+def test_pick(table):
+    articles = inline._build_articles(GROUP, table, "fp", WEDNESDAY)
+    pick = lambda *words: inline._pick(articles, list(words), WEDNESDAY)
+    assert pick() == articles
+    assert pick("сегодня") == pick("ср") == [articles[0]]
+    assert pick("завтра") == pick("четверг") == [articles[1]]
+    assert pick("пн") == [articles[2]]
+    assert pick("расписание", "пт") == [articles[6]]
+    assert pick("вс") == []
+
+
+def test_inline_query_uses_schedule_timezone(table, monkeypatch):
+    schedule_store.publish({GROUP: list(table.day("Среда")) + list(table.day("Понедельник"))})
+    inline.ARTICLES.clear()
+    monkeypatch.setattr(inline, "search_group", lambda text: GroupMatch(exact=GROUP))
+    monkeypatch.setattr(inline, "_today", lambda: WEDNESDAY)
+    answered = []
+
+    class Query(SimpleNamespace):
+        async def answer(self, results, **kwargs):
+            answered.extend(results)
+
+    asyncio.run(inline.inline_schedule(Query(query=f"{GROUP} завтра")))
+    assert [a.description for a in answered] == ["Четверг, 15.10: занятий нет"]
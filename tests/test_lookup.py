@@ -0,0 +1,224 @@
+"""Обратные индексы: поиск преподавателей и аудиторий, маски занятости, /teacher, /room, /freerooms."""
+import asyncio
+import random
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.handlers import lookup as handlers
+from app.services.lessons import Lesson
+from app.services.lookup import LookupIndex, _lesson_mask, slot_bit
+from app.services.timetable import (
+    DAYS, LOWER, PAIR_MINUTES, SLOT_STARTS, UPPER, norm_week, resolve_day, time_to_minutes,
+)
+
+BUILDINGS = ("УНИКС", "Главное здание", "Физфак")
+TIMES = SLOT_STARTS + ("09:00", "13:00", "20:00", "21:00", "")
+WEEKS = ("", "в", "н", "верхняя", "нижняя")
+
+
+def _random_groups(seed, n=400):
+    rng = random.Random(seed)
+    groups = {}
+    for i in range(n):
+        group = f"09-{rng.randint(100, 120)}"
+        groups.setdefault(group, []).append(Lesson.make(
+            group, rng.choice(DAYS[:6] + ["Праздник"]), rng.choice(TIMES), rng.choice(WEEKS),
+            f"Предмет {i}", rng.choice(BUILDINGS), str(rng.randint(100, 130)),
+            rng.choice(["", str(rng.randint(100, 130))]), "лекция", "Иванов И.И.",
+        ))
+    return groups
+
+
+def _busy(lesson, day, slot, parity):
+    """Прямая проверка: занятие идёт в ячейке (день, пара, чётность)."""
+    if lesson.day.strip().lower() != DAYS[day].lower():
+        return False
+    start = time_to_minutes(lesson.time)
+    slot_start = time_to_minutes(SLOT_STARTS[slot])
+    if not start or not (start < slot_start + PAIR_MINUTES and slot_start < start + PAIR_MINUTES):
+        return False
+    week = norm_week(lesson.week_type)
+    return week == parity or week not in (UPPER, LOWER)
+
+
+def _brute_free(groups, building, day, slot, parity):
+    rooms = {}
+    for lessons in groups.values():
+        for lesson in lessons:
+            if lesson.building != building:
+                continue
+            for number in {lesson.room1, lesson.room2} - {""}:
+                rooms[number] = rooms.get(number, False) or _busy(lesson, day, slot, parity)
+    return {number for number, busy in rooms.items() if not busy}
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_free_rooms_match_brute_force(seed):
+    groups = _random_groups(seed)
+    index = LookupIndex(groups)
+    for building in BUILDINGS:
+        for day in range(6):
+            for slot in range(len(SLOT_STARTS)):
+                for parity in (UPPER, LOWER):
+                    free = index.free_rooms(building, day, slot, parity)
+                    assert set(free) == _brute_free(groups, building, day, slot, parity), (building, day, slot, parity)
+                    assert free == sorted(free, key=int)
+
+
+def test_lesson_mask_slot_boundaries_and_parity():
+    def mask(time, week="", day="Вторник"):
+        return _lesson_mask(Lesson.make("09-111", day, time, week, "", "", "", "", "", ""))
+
+    both = slot_bit(1, 1, UPPER) | slot_bit(1, 1, LOWER)
+    assert mask("10:10") == both
+    assert mask("10:10", "н") == slot_bit(1, 1, LOWER)
+    assert mask("10:10", "Верх.") == slot_bit(1, 1, UPPER)
+    # Занятие не по звонкам занимает обе пары, которые пересекает
+    assert mask("09:00", "в") == slot_bit(1, 0, UPPER) | slot_bit(1, 1, UPPER)
+    # Конец пары 11:40 — следующая пара с 11:50 свободна
+    assert not mask("10:10") & slot_bit(1, 2, UPPER)
+    assert mask("") == mask("10:10", day="Праздник") == 0
+
+
+def test_resolve_day():
+    monday = date(2026, 10, 12)
+    assert resolve_day("сегодня", monday) == monday
+    assert resolve_day("Завтра", monday) == date(2026, 10, 13)
+    assert resolve_day("послезавтра", monday) == date(2026, 10, 14)
+    assert resolve_day("пт", monday) == date(2026, 10, 16)
+    assert resolve_day("понедельник", monday) == monday
+    assert resolve_day("вс", date(2026, 10, 14)) == date(2026, 10, 18)
+    assert resolve_day("УНИКС", monday) is None
+
+
+class FakeMessage:
+    def __init__(self, text, user_id=1):
+        self.text = text
+        self.from_user = SimpleNamespace(id=user_id)
+        self.replies = []
+
+    async def answer(self, text, **kwargs):
+        self.replies.append((text, kwargs))
+
+
+@pytest.fixture
+def index(monkeypatch):
+    groups = {"09-111": [
+        Lesson.make("09-111", "Вторник", "10:10", "", "Физика", "УНИКС", "1108", "", "лекция", "Иванов И.И."),
+        Lesson.make("09-111", "Вторник", "08:30", "", "Алгебра", "Главное здание", "101", "", "лекция", "Петров П.П."),
+        Lesson.make("09-111", "Среда", "08:30", "", "Химия", "Главное здание", "102", "", "лекция", "Петров П.П."),
+        Lesson.make("09-111", "Среда", "10:10", "", "Оптика", "УНИКС", "1109", "", "лекция", "Сидоров С.С."),
+        Lesson.make("09-111", "Суббота", "20:15", "", "Логика", "Главное здание", "1108", "", "семинар", "Иванова А.А."),
+    ]}
+    index = LookupIndex(groups)
+    monkeypatch.setattr(handlers, "get_lookup", lambda: index)
+    # Понедельник, 09:00
+    monkeypatch.setattr(handlers, "_now", lambda: datetime(2026, 10, 12, 9, 0))
+    return index
+
+
+def _freerooms(text):
+    message = FakeMessage(text)
+    asyncio.run(handlers.cmd_freerooms(message))
+    assert len(message.replies) == 1
+    return message.replies[0]
+
+
+def test_freerooms_building_day_and_time(index):
+    text, _ = _freerooms("/freerooms УНИКС завтра 10:10")
+    assert "Вторник, 13.10" in text and "пара 10:10–11:40" in text
+    assert "1109" in text and "1108" not in text
+
+    # Здание из нескольких слов, день недели без времени — первая пара
+    text, _ = _freerooms("/freerooms главное здание ср")
+    assert "Главное здание" in text and "Среда, 14.10" in text and "пара 08:30" in text
+    assert "101" in text and "102" not in text
+
+    # Без дня — сегодня, текущая пара
+    text, _ = _freerooms("/freerooms уникс")
+    assert "Понедельник, 12.10" in text and "пара 08:30" in text
+
+
+def test_freerooms_usage_and_choices(index):
+    text, _ = _freerooms("/freerooms завтра 10:10")
+    assert text.startswith("Использование") and "УНИКС" in text
+
+    # «н» подходит к обоим зданиям — выбор с сохранённым хвостом запроса
+    _, kwargs = _freerooms("/freerooms н пт 13:35")
+    buttons = [b.text for row in kwargs["reply_markup"].keyboard for b in row]
+    assert buttons == ["/freerooms Главное здание пт 13:35", "/freerooms УНИКС пт 13:35"]
+
+    text, _ = _freerooms("/freerooms УНИКС вс")
+    assert "пар нет" in text
+    text, _ = _freerooms("/freerooms Химфак")
+    assert "не найдено" in text
+
+
+def test_find_teachers(index):
+    assert index.find_teachers("Иванов И.И.") == ["иванов и.и."]
+    # Регистр, «ё» и пробелы между инициалами не важны
+    assert index.find_teachers("ИВАНОВ И. И.") == ["иванов и.и."]
+    assert index.find_teachers("петр") == ["петров п.п."]
+    assert index.find_teachers("иванов") == ["иванов и.и.", "иванова а.а."]
+    assert index.find_teachers("иванов", limit=1) == ["иванов и.и."]
+    assert index.find_teachers("Кузнецов") == index.find_teachers("  ") == []
+    assert index.teacher_name("иванова а.а.") == "Иванова А.А."
+
+
+def test_find_rooms(index):
+    assert index.find_rooms("1108") == [("Главное здание", "1108"), ("УНИКС", "1108")]
+    assert index.find_rooms(" 1108 ", "уникс") == [("УНИКС", "1108")]
+    assert index.find_rooms("1108", "глав") == [("Главное здание", "1108")]
+    assert index.find_rooms("1108", "Физфак") == []
+    assert index.find_rooms("999") == []
+
+
+def _reply(handler, text):
+    message = FakeMessage(text)
+    asyncio.run(handler(message))
+    assert len(message.replies) == 1
+    return message.replies[0]
+
+
+def _buttons(kwargs):
+    return [b.text for row in kwargs["reply_markup"].keyboard for b in row]
+
+
+def test_teacher_command(index, monkeypatch):
+    # Вторник, 10:30 — идёт вторая пара
+    monkeypatch.setattr(handlers, "_now", lambda: datetime(2026, 10, 13, 10, 30))
+    text, _ = _reply(handlers.cmd_teacher, "/teacher петр")
+    assert "Петров П.П." in text and "Алгебра" in text
+
+    text, _ = _reply(handlers.cmd_teacher, "/teacher ивАнов и.и.")
+    assert "Иванов И.И." in text and "Физика" in text
+
+    # Неоднозначная фамилия — список кандидатов кнопками
+    text, kwargs = _reply(handlers.cmd_teacher, "/teacher Иванов")
+    assert "несколько преподавателей" in text
+    assert _buttons(kwargs) == ["/teacher Иванов И.И.", "/teacher Иванова А.А."]
+
+    text, _ = _reply(handlers.cmd_teacher, "/teacher Кузнецов")
+    assert "не найден" in text
+    text, _ = _reply(handlers.cmd_teacher, "/teacher")
+    assert text.startswith("Использование")
+
+
+def test_room_command(index, monkeypatch):
+    monkeypatch.setattr(handlers, "_now", lambda: datetime(2026, 10, 13, 10, 30))
+    # Номер есть в двух зданиях — выбор здания
+    text, kwargs = _reply(handlers.cmd_room, "/room 1108")
+    assert "нескольких зданиях" in text
+    assert _buttons(kwargs) == ["/room 1108 Главное здание", "/room 1108 УНИКС"]
+
+    text, _ = _reply(handlers.cmd_room, "/room 1108 уникс")
+    assert "УНИКС, ауд. 1108" in text and "Физика" in text and "Иванов И.И." in text
+
+    # Номер в одном здании — здание можно не указывать
+    text, _ = _reply(handlers.cmd_room, "/room 101")
+    assert "Главное здание, ауд. 101" in text and "Алгебра" in text
+
+    text, _ = _reply(handlers.cmd_room, "/room 1108 Физфак")
+    assert "не найдена" in text
@@ -0,0 +1,39 @@
+"""parse_sheet_csv (без pandas) даёт те же занятия, что и parse_schedule на pandas."""
+import pytest
+
+from app.services.csv_parser import parse_sheet_csv
+from app.services.parser import parse_schedule, parse_sheet
+from benchmarks.kpfu_sheet import generate_sheet, group_codes
+
+pytest.importorskip("pandas")
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("messy,fill", [(0.0, 0.6), (0.3, 0.6), (0.5, 0.1), (0.2, 1.0)])
+def test_csv_engine_matches_pandas(seed, messy, fill):
+    groups = group_codes(12, first=8251100 + seed * 100)
+    text = generate_sheet(groups, rows_per_day=6, fill=fill, messy=messy, seed=seed)
+
+    fast = parse_sheet_csv(text)
+    assert sorted(fast) == sorted(groups)
+    assert fast == parse_sheet(text, engine="pandas")
+    for group in groups:
+        assert fast[group] == parse_schedule(text, group), group
+
+
+def test_numeric_rooms_without_gaps_stay_integers():
+    # Колонка без пропусков pandas читает как int: "101", а не "101.0"
+    groups = group_codes(1)
+    text = generate_sheet(groups, rows_per_day=2, fill=1.0, messy=0.0, seed=1)
+    lessons = parse_sheet_csv(text)[groups[0]]
+    assert lessons == parse_schedule(text, groups[0])
+    assert all(not lesson.room1.endswith(".0") for lesson in lessons)
+
+
+def test_empty_and_truncated_sheets():
+    assert parse_sheet_csv("") == parse_sheet("", engine="pandas") == {}
+    groups = group_codes(2)
+    text = generate_sheet(groups, rows_per_day=2, messy=0.0, seed=3)
+    # Последняя группа обрезана: колонок меньше восьми
+    truncated = "\n".join(",".join(line.split(",")[:-3]) for line in text.splitlines()) + "\n"
+    assert parse_sheet_csv(truncated) == parse_sheet(truncated, engine="pandas")
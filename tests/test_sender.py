@@ -0,0 +1,135 @@
+"""SendScheduler против локальной замены Bot API (benchmarks/fake_bot_api.py)."""
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from app.handlers import schedule, start
+from app.services import sender as sender_module
+from app.services.group_search import GroupMatch
+from app.services.sender import BULK, INTERACTIVE, SendScheduler
+from benchmarks.fake_bot_api import BOT_TOKEN, FakeBotAPI, start_fake_api
+
+
+class _Scripted(random.Random):
+    """random() по списку: значение 0.0 даёт 429 при rate_429 > 0, дальше — без 429."""
+
+    def __init__(self, values):
+        super().__init__(0)
+        self.values = list(values)
+
+    def random(self):
+        return self.values.pop(0) if self.values else 1.0
+
+
+async def _run(api: FakeBotAPI, scenario):
+    runner = await start_fake_api(api, port=0)
+    port = runner.addresses[0][1]
+    bot = Bot(BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}")))
+    delivered = []
+    api.on_outgoing(lambda chat_id, text, at: delivered.append((chat_id, text, at)))
+    try:
+        return await scenario(bot, delivered)
+    finally:
+        await bot.session.close()
+        await runner.cleanup()
+
+
+def test_retry_after_and_per_chat_order():
+    api = FakeBotAPI(rate_429=0.5, retry_after=1)
+    # Второй и пятый запросы sendMessage получают 429
+    api._rng = _Scripted([1.0, 0.0, 1.0, 1.0, 0.0])
+
+    async def scenario(bot, delivered):
+        sender = SendScheduler(global_rate=1000, per_chat_rate=1000, per_chat_burst=1000, workers=4)
+        sender.start(bot)
+        started = time.monotonic()
+        futures = [
+            sender.submit(chat_id, f"{chat_id}:{i}", priority=BULK)
+            for i in range(5) for chat_id in (1, 2, 3)
+        ]
+        await asyncio.wait_for(asyncio.gather(*futures), timeout=15)
+        await sender.stop()
+        return time.monotonic() - started, delivered
+
+    elapsed, delivered = asyncio.run(_run(api, scenario))
+    assert api.throttled == 2
+    # Retry-After останавливает всю очередь минимум на секунду
+    assert elapsed >= 1.0
+    assert len(delivered) == 15
+    for chat_id in (1, 2, 3):
+        texts = [text for c, text, _ in delivered if c == chat_id]
+        assert texts == [f"{chat_id}:{i}" for i in range(5)]
+
+
+def test_interactive_goes_before_bulk():
+    api = FakeBotAPI()
+
+    async def scenario(bot, delivered):
+        sender = SendScheduler(global_rate=1000, per_chat_rate=1000, per_chat_burst=1000, workers=1)
+        sender.start(bot)
+        futures = [sender.submit(chat_id, "рассылка", priority=BULK) for chat_id in range(100, 120)]
+        futures.append(sender.submit(7, "ответ", priority=INTERACTIVE))
+        await asyncio.wait_for(asyncio.gather(*futures), timeout=15)
+        await sender.stop()
+        return delivered
+
+    delivered = asyncio.run(_run(api, scenario))
+    assert delivered[0][:2] == (7, "ответ")
+    assert len(delivered) == 21
+
+
+def test_coalesced_day_blocks_stay_in_order():
+    api = FakeBotAPI()
+
+    async def scenario(bot, delivered):
+        sender = SendScheduler(global_rate=1000, per_chat_rate=1000, per_chat_burst=1000, workers=2)
+        sender.start(bot)
+        futures = [sender.submit(5, f"день {i}", coalesce=True) for i in range(6)]
+        await asyncio.wait_for(asyncio.gather(*futures), timeout=15)
+        await sender.stop()
+        return delivered
+
+    delivered = asyncio.run(_run(api, scenario))
+    text = "\n\n".join(t for _, t, _ in delivered)
+    assert text == "\n\n".join(f"день {i}" for i in range(6))
+    assert len(delivered) < 6
+
+
+def test_handlers_reply_through_scheduler(monkeypatch):
+    submitted = []
+
+    class Queue:
+        running = True
+
+        def submit(self, chat_id, text, priority=INTERACTIVE, coalesce=False, **kwargs):
+            submitted.append((chat_id, text, priority))
+            fut = asyncio.get_running_loop().create_future()
+            fut.set_result(None)
+            return fut
+
+    class Message:
+        def __init__(self, text):
+            self.text = text
+            self.chat = self.from_user = SimpleNamespace(id=42)
+
+        async def answer(self, *args, **kwargs):
+            raise AssertionError("ответ мимо SENDER")
+
+    monkeypatch.setattr(sender_module, "SENDER", Queue())
+    monkeypatch.setattr(schedule, "search_group", lambda text: GroupMatch())
+
+    async def scenario():
+        await start.cmd_start(Message("/start"))
+        await start.handle_schedule_button(Message("📅 Расписание"))
+        await schedule.cmd_schedule(Message("/schedule"))
+        await schedule.cmd_schedule(Message("/schedule 0000000"))
+
+    asyncio.run(scenario())
+    assert [chat_id for chat_id, _, _ in submitted] == [42] * 4
+    assert {priority for _, _, priority in submitted} == {INTERACTIVE}
+    assert "не найдена" in submitted[-1][1]
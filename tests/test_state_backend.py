@@ -0,0 +1,151 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.services.state_backend import RedisBackend
+from app.services.subscriptions import SUBSCRIPTIONS
+
+
+def _backends(n=2, **kwargs):
+    server = fakeredis.FakeServer()
+    return [RedisBackend(client=fakeredis.FakeAsyncRedis(server=server), **kwargs) for _ in range(n)]
+
+
+def test_lock_is_exclusive_across_replicas():
+    async def scenario():
+        a, b = _backends()
+        token = await a.try_lock(1)
+        assert token is not None
+        assert await b.try_lock(1) is None
+        assert await b.try_lock(2) is not None
+
+        # Чужой токен не снимает блокировку
+        await b.unlock(1, "not-the-owner")
+        assert await b.try_lock(1) is None
+
+        await a.unlock(1, token)
+        assert await b.try_lock(1) is not None
+
+    asyncio.run(scenario())
+
+
+def test_lock_expires_after_ttl():
+    async def scenario():
+        a, b = _backends(lock_ttl=0.1)
+        assert await a.try_lock(1) is not None
+        await asyncio.sleep(0.2)
+        assert await b.try_lock(1) is not None
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_shared_between_replicas():
+    async def scenario():
+        a, b = _backends()
+        # burst=3: три токена на двоих, четвёртый — отказ
+        taken = [await a.take_token(1, "message", rate=0.001, burst=3),
+                 await b.take_token(1, "message", rate=0.001, burst=3),
+                 await a.take_token(1, "message", rate=0.001, burst=3)]
+        assert taken == [True, True, True]
+        assert await b.take_token(1, "message", rate=0.001, burst=3) is False
+        # Другой пользователь и другая корзина независимы
+        assert await b.take_token(2, "message", rate=0.001, burst=3) is True
+        assert await b.take_token(1, "callback", rate=0.001, burst=3) is True
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_refills():
+    async def scenario():
+        (a,) = _backends(1)
+        assert await a.take_token(1, "message", rate=20, burst=1) is True
+        assert await a.take_token(1, "message", rate=20, burst=1) is False
+        await asyncio.sleep(0.1)  # 20 токенов/с — за 0.1 с набирается больше одного
+        assert await a.take_token(1, "message", rate=20, burst=1) is True
+
+    asyncio.run(scenario())
+
+
+def test_leader_election_and_renewal():
+    async def scenario():
+        a, b = _backends(leader_ttl=0.3)
+        assert await a.acquire_leadership() is True
+        assert await b.acquire_leadership() is False
+
+        # Лидер продлевает аренду — ключ переживает исходный TTL
+        for _ in range(3):
+            await asyncio.sleep(0.15)
+            assert await a.acquire_leadership() is True
+            assert await b.acquire_leadership() is False
+
+        # Лидер перестал продлевать — после TTL лидерство переходит
+        await asyncio.sleep(0.4)
+        assert await b.acquire_leadership() is True
+        assert await a.acquire_leadership() is False
+
+    asyncio.run(scenario())
+
+
+def test_snapshot_version_and_fetch():
+    async def scenario():
+        leader, follower = _backends()
+        assert await follower.snapshot_version() == 0
+        version = await leader.publish_snapshot({"gid_0.csv": ("sha-a", b"a"), "gid_1.csv": ("sha-b", b"b")})
+        assert await follower.snapshot_version() == version
+
+        _, sheets = await follower.fetch_snapshot(0, {"gid_0.csv": "sha-a"})
+        assert sheets == {"gid_1.csv": ("sha-b", b"b")}
+        assert await follower.fetch_snapshot(version, {}) is None
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_user_group_cache_respects_shared_backend(monkeypatch, shared):
+    from app.handlers import schedule_buttons
+
+    class Backend:
+        def __init__(self):
+            self.shared = shared
+            self.groups = {}
+            self.subscriptions = SUBSCRIPTIONS
+
+        async def get_user_group(self, user_id):
+            return self.groups.get(user_id)
+
+        async def set_user_group(self, user_id, group):
+            self.groups[user_id] = group
+
+    backend = Backend()
+    monkeypatch.setattr(schedule_buttons, "get_backend", lambda: backend)
+
+    async def scenario():
+        await schedule_buttons.USER_SCHEDULE_CACHE.clear()
+        await schedule_buttons.remember_user_group(7, "8251160")
+        # Смена группы через другую реплику — прямо в общем хранилище
+        backend.groups[7] = "8251161"
+        return await schedule_buttons.get_user_group(7)
+
+    assert asyncio.run(scenario()) == ("8251161" if shared else "8251160")
+
+
+def test_sync_snapshot_skips_hashing_when_version_unchanged(monkeypatch):
+    from app.services import csv_cache
+
+    leader, follower = _backends()
+    monkeypatch.setattr(csv_cache, "get_backend", lambda: follower)
+    monkeypatch.setattr(csv_cache, "_SNAPSHOT_VERSION", 0)
+    hashed = []
+    monkeypatch.setattr(csv_cache, "_local_hashes", lambda: hashed.append(1) or {})
+
+    async def scenario():
+        assert await csv_cache.sync_snapshot() is False
+        assert hashed == []
+        await leader.publish_snapshot({})
+        await csv_cache.sync_snapshot()
+        assert hashed == [1]
+        assert await csv_cache.sync_snapshot() is False
+        assert hashed == [1]
+
+    asyncio.run(scenario())
@@ -0,0 +1,179 @@
+"""Журнал рассылки: повторы неудачных отправок, продолжение после падения, смена группы."""
+import asyncio
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from app.handlers import schedule_buttons
+from app.handlers import subscriptions as handlers
+from app.services import schedule_store, state_backend
+from app.services.lessons import Lesson
+from app.services.state_backend import MemoryBackend, RedisBackend
+from app.services.subscriptions import MAX_ATTEMPTS, QUEUED, RETRY, SENT, SubscriptionStore
+
+RUN_DATE = date(2026, 10, 12)  # понедельник
+DAY = RUN_DATE.isoformat()
+
+
+class FakeSender:
+    """SENDER, который сразу завершает отправку; fail — чаты, где отправка падает."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.sent = []
+
+    def submit(self, chat_id, text, priority=0, **kwargs):
+        fut = asyncio.get_running_loop().create_future()
+        if chat_id in self.fail:
+            fut.set_exception(RuntimeError("network"))
+        else:
+            self.sent.append((chat_id, text))
+            fut.set_result(True)
+        return fut
+
+
+def _publish():
+    schedule_store.publish({
+        g: [Lesson.make(g, "Понедельник", "08:30", "", subject, "УНИКС", "1108", "", "лекция", "Иванов И.И.")]
+        for g, subject in (("09-111", "Матанализ"), ("09-222", "Философия"))
+    })
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    subs = SubscriptionStore(str(tmp_path / "subs.sqlite3"))
+    monkeypatch.setattr(state_backend, "_BACKEND", MemoryBackend(subscriptions=subs))
+    _publish()
+    yield subs
+    subs.close()
+
+
+def _status(subs, user_id):
+    row = subs._connect().execute(
+        "SELECT status, attempts FROM deliveries WHERE run_date = ? AND send_at = ? AND user_id = ?",
+        (DAY, "07:30", user_id),
+    ).fetchone()
+    return tuple(row) if row else None
+
+
+def test_failed_send_is_retried(store, monkeypatch):
+    for uid in (1, 2):
+        store.subscribe_sync(uid, "09-111", "07:30")
+
+    sender = FakeSender(fail={2})
+    monkeypatch.setattr(handlers, "SENDER", sender)
+    assert asyncio.run(handlers.fan_out(RUN_DATE, "07:30")) == 1
+    assert _status(store, 1) == (SENT, 1)
+    assert _status(store, 2) == (RETRY, 1)
+    assert store.retry_runs_sync(DAY, "07:31") == ["07:30"]
+
+    sender.fail.clear()
+    assert asyncio.run(handlers.fan_out(RUN_DATE, "07:30", resend=(RETRY,))) == 1
+    assert [uid for uid, _ in sender.sent] == [1, 2]
+    assert _status(store, 2) == (SENT, 2)
+    assert store.retry_runs_sync(DAY, "07:31") == []
+
+
+def test_retries_stop_after_max_attempts(store, monkeypatch):
+    store.subscribe_sync(1, "09-111", "07:30")
+    monkeypatch.setattr(handlers, "SENDER", FakeSender(fail={1}))
+
+    asyncio.run(handlers.fan_out(RUN_DATE, "07:30"))
+    for _ in range(MAX_ATTEMPTS):
+        asyncio.run(handlers.fan_out(RUN_DATE, "07:30", resend=(RETRY,)))
+    assert _status(store, 1) == (RETRY, MAX_ATTEMPTS)
+    assert store.retry_runs_sync(DAY, "07:31") == []
+
+
+def test_resume_resends_stale_queued(store, monkeypatch):
+    for uid in (1, 2, 3):
+        store.subscribe_sync(uid, "09-111", "07:30")
+    # Процесс упал: 1 доставлен, 2 стоял в очереди SENDER, 3 ещё не брали
+    store.mark_sync(DAY, "07:30", [1, 2], QUEUED)
+    store.mark_sync(DAY, "07:30", [1], SENT)
+
+    sender = FakeSender()
+    monkeypatch.setattr(handlers, "SENDER", sender)
+    assert store.started_runs_sync(DAY, "07:31") == ["07:30"]
+    asyncio.run(handlers.fan_out(RUN_DATE, "07:30", resend=(QUEUED, RETRY)))
+    assert sorted(uid for uid, _ in sender.sent) == [2, 3]
+    assert {_status(store, uid)[0] for uid in (1, 2, 3)} == {SENT}
+
+
+def test_subscription_follows_group_change(store, monkeypatch):
+    store.subscribe_sync(1, "09-111", "07:30")
+    asyncio.run(schedule_buttons.remember_user_group(1, "09-222"))
+    assert store.pending_sync(DAY, "07:30") == {"09-222": [1]}
+
+    sender = FakeSender()
+    monkeypatch.setattr(handlers, "SENDER", sender)
+    asyncio.run(handlers.fan_out(RUN_DATE, "07:30"))
+    assert "Философия" in sender.sent[0][1]
+
+
+def test_group_change_writes_only_for_subscribers(store):
+    store.subscribe_sync(1, "09-111", "07:30")
+    changes = store._connect().total_changes
+    # Не подписан или группа та же — в базу ничего не пишется
+    asyncio.run(schedule_buttons.remember_user_group(2, "09-222"))
+    asyncio.run(schedule_buttons.remember_user_group(1, "09-111"))
+    assert store._connect().total_changes == changes
+    assert store.get_sync(2) is None
+
+    asyncio.run(schedule_buttons.remember_user_group(1, "09-222"))
+    assert store._connect().total_changes == changes + 1
+    assert store.get_sync(1) == ("09-222", "07:30")
+
+
+class FakeMessage:
+    def __init__(self, user_id, text):
+        self.text = text
+        self.from_user = SimpleNamespace(id=user_id)
+        self.replies = []
+
+    async def answer(self, text, **kwargs):
+        self.replies.append(text)
+
+
+def _at(hhmm):
+    hour, minute = map(int, hhmm.split(":"))
+    return datetime(RUN_DATE.year, RUN_DATE.month, RUN_DATE.day, hour, minute)
+
+
+def test_two_replicas_share_subscriptions_and_marker(monkeypatch):
+    server = fakeredis.FakeServer()
+    first, second = (RedisBackend(client=fakeredis.FakeAsyncRedis(server=server)) for _ in range(2))
+    sender = FakeSender()
+    monkeypatch.setattr(handlers, "SENDER", sender)
+    _publish()
+
+    def on(backend):
+        monkeypatch.setattr(state_backend, "_BACKEND", backend)
+
+    async def subscribe(backend, user_id, send_at):
+        on(backend)
+        await backend.set_user_group(user_id, "09-111")
+        await handlers.cmd_subscribe(FakeMessage(user_id, f"/subscribe {send_at}"))
+
+    async def scenario():
+        # Подписка через реплику-последователя, рассылает лидер
+        await subscribe(second, 1, "07:30")
+        on(first)
+        await handlers.run_due(_at("07:29"), resume=True)
+        await handlers.run_due(_at("07:30"))
+        assert [uid for uid, _ in sender.sent] == [1]
+
+        # Лидер пропал после 07:30; его время 07:32 наступает без лидера
+        await subscribe(first, 2, "07:32")
+        on(second)
+        await handlers.run_due(_at("07:34"), resume=True)
+        assert [uid for uid, _ in sender.sent] == [1, 2]
+        assert await second.subscriptions.last_run() == f"{DAY} 07:34"
+
+        # Повторный шаг нового лидера ничего не дублирует
+        await handlers.run_due(_at("07:35"))
+        assert len(sender.sent) == 2
+
+    asyncio.run(scenario())
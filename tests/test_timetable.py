@@ -0,0 +1,25 @@
+"""DayTable: виды дня по чётности недели."""
+from app.services.lessons import Lesson
+from app.services.timetable import LOWER, UPPER, DayTable
+
+
+def _lesson(day, time, week, subject):
+    return Lesson.make("09-111", day, time, week, subject, "", "", "", "", "")
+
+
+def test_views_by_week_parity():
+    table = DayTable([
+        _lesson("Вторник", "11:50", "н", "Физика"),
+        _lesson("Вторник", "08:30", "", "Алгебра"),
+        _lesson("Вторник", "10:10", "верхняя", "История"),
+        _lesson("Среда", "10:10", "", "Анализ"),
+        _lesson("Праздник", "10:10", "", "Нет такого дня"),
+    ])
+    subjects = lambda lessons: [l.subject for l in lessons]
+    assert subjects(table.day("Вторник", UPPER)) == ["Алгебра", "История"]
+    assert subjects(table.day("вторник", LOWER)) == ["Алгебра", "Физика"]
+    assert subjects(table.day("Вторник")) == ["Алгебра", "История", "Физика"]
+    assert table.day("Понедельник", UPPER) == ()
+    assert table.day("Праздник") == ()
+    # День без деления на недели — один кортеж на все виды
+    assert table.day("Среда", UPPER) is table.day("Среда", LOWER) is table.day("Среда")
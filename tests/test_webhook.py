@@ -0,0 +1,58 @@
+"""WebhookProcessor: во время остановки новые обновления не подтверждаются."""
+import asyncio
+
+import aiohttp
+from aiohttp import web
+
+from app.services.web import WebhookProcessor
+
+
+class FakeBot:
+    async def set_webhook(self, **kwargs):
+        pass
+
+
+class SlowDispatcher:
+    """feed_update ждёт release — очередь не успевает опустеть сама."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.handled = []
+
+    def resolve_used_update_types(self):
+        return ["message"]
+
+    async def feed_update(self, bot, update):
+        await self.release.wait()
+        self.handled.append(update.update_id)
+
+
+def test_update_during_shutdown_gets_503():
+    async def scenario():
+        dp = SlowDispatcher()
+        webhook = WebhookProcessor(dp, FakeBot(), workers=1)
+        app = web.Application()
+        webhook.register(app, "/webhook")
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{runner.addresses[0][1]}/webhook"
+        await webhook.start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(url, json={"update_id": 1}) as resp:
+                    assert resp.status == 200
+
+                stopping = asyncio.create_task(webhook.stop(timeout=5))
+                await asyncio.sleep(0)
+                async with session.post(url, json={"update_id": 2}) as resp:
+                    assert resp.status == 503
+
+                dp.release.set()
+                await stopping
+        finally:
+            await runner.cleanup()
+        return dp.handled
+
+    assert asyncio.run(scenario()) == [1]